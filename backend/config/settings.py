@@ -13,7 +13,9 @@ load_dotenv(BASE_DIR / ".env")
 DATA_DIR = BASE_DIR / "data"
 PROCESSED_DATA_DIR = DATA_DIR / "processed"
 RAW_DATA_DIR = DATA_DIR / "raw"
-VECTOR_STORE_DIR = DATA_DIR / "vector_store" / "chroma_db"
+VECTOR_STORE_ROOT = Path(os.getenv("VECTOR_STORE_ROOT", str(DATA_DIR / "vector_store")))
+# Lokasi index legacy (sebelum ada versi index blue/green).
+VECTOR_STORE_DIR = VECTOR_STORE_ROOT / "chroma_db"
 
 # Models
 EMBEDDING_MODEL = "jina-embeddings-v5-text-small"
@@ -22,6 +24,17 @@ GROQ_MODEL = "openai/gpt-oss-120b"  # Groq LLM model
 # Embedding
 EMBEDDING_BATCH_SIZE = 32 
 INGEST_BATCH_SIZE = 100  
+INGEST_PIPELINE_DEPTH = 2  # Jumlah chunk ter-embed yang boleh antre menunggu ditulis
+
+# Fallback embedding lokal (TF-IDF n-gram karakter ter-hash, dibangun saat ingest)
+LOCAL_EMBEDDING_DIM = 4096
+EMBEDDING_FALLBACK_ENABLED = os.getenv("EMBEDDING_FALLBACK_ENABLED", "true").lower() == "true"
+# Embedding query ke Jina yang melebihi budget ini dihitung gagal oleh circuit breaker
+EMBEDDING_LATENCY_BUDGET_MS = float(os.getenv("EMBEDDING_LATENCY_BUDGET_MS", "2000"))
+EMBEDDING_FAILURE_THRESHOLD = int(os.getenv("EMBEDDING_FAILURE_THRESHOLD", "3"))
+EMBEDDING_RECOVERY_SECONDS = float(os.getenv("EMBEDDING_RECOVERY_SECONDS", "30"))
+# Distance lokal (2 - 2*cosine) dikurangi offset ini supaya sebanding dengan SCORE_THRESHOLD
+LOCAL_EMBEDDING_SCORE_OFFSET = float(os.getenv("LOCAL_EMBEDDING_SCORE_OFFSET", "1.0"))
 
 # API Keys
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
@@ -41,19 +54,168 @@ ALLOWED_ORIGINS = [
     if origin.strip()
 ]
 
+# Admin API (reload index, dsb). Kosong = endpoint admin nonaktif.
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+# Index versioning / hot reload
+INDEX_VERSIONS_TO_KEEP = int(os.getenv("INDEX_VERSIONS_TO_KEEP", "3"))
+# Interval polling pointer CURRENT untuk hot reload otomatis (0 = nonaktif)
+INDEX_WATCH_INTERVAL_SECONDS = float(os.getenv("INDEX_WATCH_INTERVAL_SECONDS", "0"))
+INDEX_DRAIN_TIMEOUT_SECONDS = float(os.getenv("INDEX_DRAIN_TIMEOUT_SECONDS", "120"))
+
+# Job ingest lewat /admin/ingest: proses terpisah dengan prioritas CPU lebih rendah dari serving
+INGEST_JOB_NICE = int(os.getenv("INGEST_JOB_NICE", "10"))
+INGEST_JOB_HISTORY = 20  # Jumlah job terakhir yang statusnya disimpan
+INGEST_JOB_CANCEL_GRACE_SECONDS = float(os.getenv("INGEST_JOB_CANCEL_GRACE_SECONDS", "30"))
+
+# Sharding index per kota/region: satu collection Chroma per nilai kolom ini (kosong = satu collection)
+INDEX_SHARD_COLUMN = os.getenv("INDEX_SHARD_COLUMN", "Kota").strip()
+# Query yang menyebut kota/kabupaten hanya mencari di shard tersebut (tanpa sebutan = semua shard)
+SHARD_ROUTING_ENABLED = os.getenv("SHARD_ROUTING_ENABLED", "true").lower() == "true"
+SHARD_SEARCH_WORKERS = int(os.getenv("SHARD_SEARCH_WORKERS", "4"))
+# Alias tambahan untuk router, format "alias:Nilai Kolom,..." (mis. "kulonprogo:Kulon Progo")
+SHARD_ALIASES = {
+    alias.strip().lower(): value.strip()
+    for alias, _, value in (
+        item.partition(":") for item in os.getenv("SHARD_ALIASES", "").split(",") if ":" in item
+    )
+    if alias.strip() and value.strip()
+}
+# Nama region yang mencakup semua shard (mis. "coffee shop yogyakarta dekat ugm" juga
+# mencakup Sleman): sebutan ini tidak mempersempit pencarian.
+SHARD_REGION_TERMS = {
+    term.strip().lower()
+    for term in os.getenv(
+        "SHARD_REGION_TERMS", "yogyakarta,jogjakarta,yogya,jogja,jogya,djokja,diy"
+    ).split(",")
+    if term.strip()
+}
+
 # Retrieval
 TOP_K_RESULTS = 5 
 SCORE_THRESHOLD = 0.3  
+MMR_LAMBDA = 0.5  # Bobot relevansi vs diversity untuk Retriever.retrieve
+# Diversity MMR pada jalur threshold RAGService.ask (0 = nonaktif, urut score murni)
+RETRIEVAL_DIVERSITY = float(os.getenv("RETRIEVAL_DIVERSITY", "0.0"))
+
+# Hybrid retrieval: BM25 lokal digabung dengan hasil dense lewat Reciprocal Rank Fusion
+HYBRID_RETRIEVAL_ENABLED = os.getenv("HYBRID_RETRIEVAL_ENABLED", "true").lower() == "true"
+RRF_K = 60
+# Lexical-first: jawab dari hasil BM25 tanpa embedding jika semua kata query ter-cover
+LEXICAL_FIRST_ENABLED = os.getenv("LEXICAL_FIRST_ENABLED", "false").lower() == "true"
+LEXICAL_FIRST_MIN_COVERAGE = float(os.getenv("LEXICAL_FIRST_MIN_COVERAGE", "1.0"))
+LEXICAL_FIRST_MIN_WORDS = 2
+
+# Lookup nama tempat/handle Instagram sebelum embedding (match yakin = tanpa vector search)
+NAME_LOOKUP_ENABLED = os.getenv("NAME_LOOKUP_ENABLED", "true").lower() == "true"
+
+# Pre-classification lokal: tolak pertanyaan yang pasti di luar domain sebelum embedding/search
+PRE_CLASSIFIER_ENABLED = os.getenv("PRE_CLASSIFIER_ENABLED", "true").lower() == "true"
+
+# Session multi-turn (session_id di /api/chat)
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "5000"))
+SESSION_HISTORY_TURNS = 3  # Jumlah turn terakhir di ringkasan percakapan
+SESSION_SUMMARY_MAX_CHARS = 600
+# Porsi bobot kata pertanyaan lanjutan yang harus ada di kandidat lama supaya kandidat itu dipakai ulang.
+FOLLOW_UP_MIN_COVERAGE = float(os.getenv("FOLLOW_UP_MIN_COVERAGE", "0.5"))
+
+# Paging "lainnya" (result_token di /api/chat, POST /api/chat/more)
+RESULT_TOKEN_TTL_SECONDS = float(os.getenv("RESULT_TOKEN_TTL_SECONDS", "600"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "5000"))
+
+# Jawaban ekstraktif: pertanyaan daftar/info tempat dijawab dari metadata dokumen tanpa Groq
+# (answer_mode="auto"); answer_mode per request bisa memaksa atau melarangnya.
+EXTRACTIVE_ANSWERS_ENABLED = os.getenv("EXTRACTIVE_ANSWERS_ENABLED", "true").lower() == "true"
+EXTRACTIVE_EXCERPT_MAX_CHARS = 180
+
+# Admission control /api/chat: batas pipeline bersamaan + antrean terbatas, sisanya langsung 503.
+# Request yang antre menahan satu thread worker, jadi MAX_CONCURRENT + MAX_QUEUE harus di bawah
+# ukuran thread pool server (default AnyIO: 40).
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "24"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10"))
+
+# Flight recorder: trace per request untuk /admin/traces
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() == "true"
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "500"))
+TRACE_SLOWEST_N = int(os.getenv("TRACE_SLOWEST_N", "20"))
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")  # File JSONL; kosong = tidak diekspor
+# Teks pertanyaan asli di trace (opt-in); default hanya hash + panjang pertanyaan.
+TRACE_RECORD_QUESTIONS = os.getenv("TRACE_RECORD_QUESTIONS", "false").lower() == "true"
+
+# Profiling per request (opt-in): header X-Profile + X-Admin-Token di /api/chat, sampling, atau
+# `scripts/cli.py --profile`. Sampel CPU statistik + alokasi tracemalloc (request jadi lebih lambat).
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 0 = hanya lewat header
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "speedscope")  # speedscope | collapsed
+PROFILE_OUTPUT_DIR = Path(os.getenv("PROFILE_OUTPUT_DIR", str(DATA_DIR / "profiles")))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "2"))
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "25"))
+PROFILE_ALLOCATION_TOP_N = 200
+
+# Batch API (/api/chat/batch dan RAGService.ask_many)
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "50"))
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "4"))
+# Kuota batch terpisah dari kuota /api/chat, dihitung per pertanyaan unik.
+BATCH_QUESTIONS_PER_MINUTE = int(os.getenv("BATCH_QUESTIONS_PER_MINUTE", "600"))
+BATCH_DAILY_QUESTION_LIMIT = int(os.getenv("BATCH_DAILY_QUESTION_LIMIT", "20000"))
 
 # Generation
 MAX_TOKENS = 1024
 TEMPERATURE = 0.5
 API_TIMEOUT = 30.0 
 
+# Model cascade: tier model Groq dari yang kecil/cepat ke yang besar. Pertanyaan sederhana mulai
+# dari tier pertama dan naik tier jika jawabannya kurang meyakinkan atau gagal; tier yang kena
+# rate limit dilewati sementara.
+MODEL_CASCADE_ENABLED = os.getenv("MODEL_CASCADE_ENABLED", "true").lower() == "true"
+GROQ_MODEL_TIERS = [
+    model.strip()
+    for model in os.getenv("GROQ_MODEL_TIERS", f"llama-3.1-8b-instant,{GROQ_MODEL}").split(",")
+    if model.strip()
+]
+CASCADE_SIMPLE_MAX_DOCUMENTS = 3
+CASCADE_SIMPLE_MAX_CONTEXT_CHARS = 4000
+CASCADE_SIMPLE_MAX_QUESTION_WORDS = 12
+# Kata yang menandakan pertanyaan perbandingan/penalaran -> langsung tier terbesar
+CASCADE_COMPLEX_KEYWORDS = [
+    "banding",
+    "bandingkan",
+    "dibanding",
+    "dibandingkan",
+    "perbedaan",
+    "bedanya",
+    "versus",
+    "vs",
+    "kelebihan",
+    "kekurangan",
+    "lebih bagus",
+    "lebih enak",
+    "paling cocok",
+]
+CASCADE_MIN_ANSWER_CHARS = 80  # Jawaban tier kecil lebih pendek dari ini dianggap kurang yakin
+TIER_RATE_LIMIT_COOLDOWN_SECONDS = 10
+# max_tokens per request = dasar + per dokumen konteks, maksimal MAX_TOKENS
+MAX_TOKENS_BASE = 256
+MAX_TOKENS_PER_DOCUMENT = 160
+
 # Retry
 MAX_RETRIES = 3
 RETRY_DELAY = 2 
 
+# Connection pool HTTP upstream (Jina, Groq): satu pool per upstream, dipakai bersama semua
+# EmbeddingModel/Generator dalam satu proses. Batas koneksi sebaiknya >= jumlah thread yang
+# memanggil upstream bersamaan (shard search, batch, admission) supaya tidak antre pool.
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "32"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "32"))
+UPSTREAM_KEEPALIVE_SECONDS = float(os.getenv("UPSTREAM_KEEPALIVE_SECONDS", "120"))
+# HTTP/2 hanya jika paket h2 terpasang (httpx[http2]); tanpa h2 tetap HTTP/1.1
+UPSTREAM_HTTP2_ENABLED = os.getenv("UPSTREAM_HTTP2_ENABLED", "true").lower() == "true"
+# Koneksi yang dibuka ke tiap upstream saat service start (0 = tanpa warm-up)
+UPSTREAM_WARMUP_CONNECTIONS = int(os.getenv("UPSTREAM_WARMUP_CONNECTIONS", "2"))
+
 # System prompt
 SYSTEM_PROMPT = """Anda adalah asisten yang membantu memberikan informasi coffee shop di Yogyakarta.
 Berdasarkan informasi yang diberikan, berikan rekomendasi yang relevan, jelas, dan membantu.
@@ -93,3 +255,9 @@ Pertanyaan:
 {query}
 
 Jawaban:"""
+
+# Ringkasan percakapan sebelumnya (session multi-turn), diletakkan sebelum CONTEXT_PROMPT_TEMPLATE
+HISTORY_PROMPT_TEMPLATE = """Ringkasan percakapan sebelumnya (gunakan untuk memahami rujukan seperti "itu" atau "tadi"):
+{history}
+
+"""
@@ -0,0 +1,75 @@
+import threading
+import time
+from typing import Any, Dict
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker sederhana untuk dependency eksternal (mis. Jina API).
+
+    - `closed`: semua panggilan diteruskan.
+    - `open`: setelah `failure_threshold` kegagalan beruntun, panggilan
+      langsung dialihkan ke fallback selama `recovery_seconds`.
+    - `half_open`: setelah masa tunggu, satu panggilan percobaan diteruskan;
+      sukses menutup breaker, gagal membukanya lagi.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, recovery_seconds: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_seconds = recovery_seconds
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._total_failures = 0
+        self._total_fallbacks = 0
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow_request(self) -> bool:
+        """True jika panggilan boleh ke dependency, False jika harus pakai fallback."""
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.recovery_seconds:
+                self._state = "half_open"
+            if self._state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self._total_fallbacks += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = "closed"
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._total_failures += 1
+            self._consecutive_failures += 1
+            self._trial_in_flight = False
+            if self._state == "half_open" or self._consecutive_failures >= self.failure_threshold:
+                self._state = "open"
+                self._opened_at = time.monotonic()
+
+    def force_open(self) -> None:
+        """Buka breaker permanen (dependency memang tidak tersedia, mis. API key kosong)."""
+        with self._lock:
+            self._state = "open"
+            self._opened_at = float("inf")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "total_failures": self._total_failures,
+                "total_fallbacks": self._total_fallbacks,
+            }
@@ -0,0 +1,162 @@
+from array import array
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+# Kode kolom untuk baris yang tidak punya key metadata tersebut.
+_ABSENT = -1
+
+
+def _lookup_key(value: Any) -> Any:
+    # Tipe non-string ikut jadi key: True == 1 tapi harus tetap bool saat dibaca ulang.
+    return value if type(value) is str else (type(value), value)
+
+
+class DocumentStore:
+    """
+    Konten dan metadata semua dokumen index dalam bentuk kolom, dimuat sekali saat startup.
+
+    Baris (int) adalah id dokumen internal dan sama dengan baris matrix
+    embedding yang dipin retriever. Tiap key metadata disimpan sebagai satu
+    array kode int32 plus daftar nilai unik (dictionary encoding), jadi nilai
+    berulang seperti kota, kategori, atau jam operasional hanya ada satu
+    objek per nilai, bukan satu dict per dokumen.
+    """
+
+    def __init__(self) -> None:
+        self.ids: List[str] = []
+        self.contents: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._codes: Dict[str, array] = {}
+        self._values: Dict[str, List[Any]] = {}
+        # Nilai -> kode per kolom; hanya dibutuhkan saat menambah dokumen.
+        self._lookup: Optional[Dict[str, Dict[Any, int]]] = None
+
+    @classmethod
+    def build(
+        cls,
+        ids: Sequence[str],
+        contents: Sequence[str],
+        metadatas: Sequence[Optional[Mapping[str, Any]]],
+    ) -> "DocumentStore":
+        store = cls()
+        store.extend(ids, contents, metadatas)
+        # Untuk kolom unik (nama, source, id) lookup sebesar kolomnya sendiri: lepas setelah build.
+        store._lookup = None
+        return store
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._rows
+
+    def extend(
+        self,
+        ids: Iterable[str],
+        contents: Iterable[str],
+        metadatas: Iterable[Optional[Mapping[str, Any]]],
+    ) -> List[int]:
+        """
+        Tambahkan dokumen di akhir store; dokumen yang sudah ada dilewati.
+
+        Returns:
+            Baris dokumen yang baru ditambahkan.
+        """
+        if self._lookup is None:
+            self._lookup = {
+                key: {_lookup_key(value): code for code, value in enumerate(values)}
+                for key, values in self._values.items()
+            }
+        added: List[int] = []
+        for doc_id, content, metadata in zip(ids, contents, metadatas):
+            if doc_id in self._rows:
+                continue
+            row = len(self.ids)
+            self._rows[doc_id] = row
+            self.ids.append(doc_id)
+            self.contents.append(content or "")
+            for key, value in (metadata or {}).items():
+                if key not in self._codes:
+                    self._codes[key] = array("i", [_ABSENT]) * row
+                    self._values[key] = []
+                    self._lookup[key] = {}
+                self._codes[key].append(self._encode(key, value))
+            for codes in self._codes.values():
+                if len(codes) <= row:
+                    codes.append(_ABSENT)
+            added.append(row)
+        return added
+
+    def _encode(self, key: str, value: Any) -> int:
+        lookup_key = _lookup_key(value)
+        code = self._lookup[key].get(lookup_key)
+        if code is None:
+            code = self._lookup[key][lookup_key] = len(self._values[key])
+            self._values[key].append(value)
+        return code
+
+    def row_of(self, doc_id: str) -> Optional[int]:
+        return self._rows.get(doc_id)
+
+    def rows_of(self, ids: Iterable[str]) -> List[int]:
+        """Baris untuk id yang dikenal store (id lain dilewati), urutan dipertahankan."""
+        rows = self._rows
+        return [rows[doc_id] for doc_id in ids if doc_id in rows]
+
+    def value(self, row: int, key: str, default: Any = None) -> Any:
+        """Satu nilai metadata tanpa membuat dict metadata."""
+        codes = self._codes.get(key)
+        if codes is None:
+            return default
+        code = codes[row]
+        return default if code == _ABSENT else self._values[key][code]
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        """Dict metadata satu dokumen (dibuat baru setiap dipanggil)."""
+        metadata: Dict[str, Any] = {}
+        for key, codes in self._codes.items():
+            code = codes[row]
+            if code != _ABSENT:
+                metadata[key] = self._values[key][code]
+        return metadata
+
+    def document(self, row: int, score: float = 0.0) -> "ScoredDocument":
+        return ScoredDocument(self, row, score)
+
+
+class ScoredDocument:
+    """
+    Hasil retrieval: baris di `DocumentStore` plus score (distance; 0 untuk lookup/lexical).
+
+    Konten dan metadata tidak disalin; dibaca dari store saat dipakai.
+    """
+
+    __slots__ = ("store", "row", "score")
+
+    def __init__(self, store: DocumentStore, row: int, score: float = 0.0):
+        self.store = store
+        self.row = row
+        self.score = score
+
+    @property
+    def doc_id(self) -> str:
+        return self.store.ids[self.row]
+
+    @property
+    def content(self) -> str:
+        return self.store.contents[self.row]
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.store.metadata(self.row)
+
+    def meta(self, key: str, default: Any = None) -> Any:
+        """Satu nilai metadata (`doc.meta("source")`) tanpa membuat dict."""
+        store = self.store
+        codes = store._codes.get(key)
+        if codes is None:
+            return default
+        code = codes[self.row]
+        return default if code == _ABSENT else store._values[key][code]
+
+    def __repr__(self) -> str:
+        return f"ScoredDocument(id={self.doc_id!r}, score={self.score:.4f})"
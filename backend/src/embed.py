@@ -1,8 +1,6 @@
 import logging
 import time
-from typing import List
-
-import requests
+from typing import List, Optional
 
 from backend.config.settings import (
     API_TIMEOUT,
@@ -13,6 +11,8 @@ from backend.config.settings import (
     MAX_RETRIES,
     RETRY_DELAY,
 )
+from backend.src.tracing import add_event
+from backend.src.upstreams import JINA_UPSTREAM, upstreams
 
 logger = logging.getLogger(__name__)
 
@@ -34,28 +34,41 @@ class EmbeddingModel:
         if not self.api_key:
             raise ValueError("JINA_API_KEY tidak ditemukan. Silakan set di environment variables.")
 
-        self._session = requests.Session()
-        self._session.headers.update(
-            {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}",
-            }
-        )
+        # Pool koneksi dipakai bersama semua EmbeddingModel di proses ini (lihat upstreams.py).
+        self._client = upstreams.client(JINA_UPSTREAM)
+        self._headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        }
         print(f"Embedding provider aktif: Jina API ({self.model_name})")
 
-    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+    def _embed_batch(
+        self,
+        texts: List[str],
+        timeout: float = API_TIMEOUT,
+        max_retries: int = MAX_RETRIES,
+        deadline: Optional[float] = None,
+    ) -> List[List[float]]:
         payload = {
             "model": self.model_name,
             "input": texts,
         }
 
         last_error: Exception | None = None
-        for attempt in range(MAX_RETRIES):
+        for attempt in range(max_retries):
+            request_timeout = timeout
+            if deadline is not None:
+                # Tiap percobaan hanya boleh memakai sisa budget.
+                request_timeout = min(timeout, deadline - time.monotonic())
+                if request_timeout <= 0:
+                    last_error = last_error or TimeoutError("Budget waktu embedding habis.")
+                    break
             try:
-                response = self._session.post(
+                response = self._client.post(
                     self.api_url,
                     json=payload,
-                    timeout=API_TIMEOUT,
+                    headers=self._headers,
+                    timeout=request_timeout,
                 )
                 response.raise_for_status()
                 body = response.json()
@@ -71,17 +84,30 @@ class EmbeddingModel:
                 return [item["embedding"] for item in data]
             except Exception as exc:  # noqa: BLE001
                 last_error = exc
-                if attempt < MAX_RETRIES - 1:
-                    wait_time = RETRY_DELAY * (2**attempt)
+                wait_time = RETRY_DELAY * (2**attempt)
+                has_budget = True
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    has_budget = remaining > 0
+                    # Backoff dipotong supaya separuh sisa budget tetap ada untuk retry-nya.
+                    wait_time = max(0.0, min(wait_time, remaining / 2))
+                if attempt < max_retries - 1 and has_budget:
+                    add_event(
+                        "embed_retry",
+                        attempt=attempt + 1,
+                        error=type(exc).__name__,
+                        sleep_s=wait_time,
+                    )
                     logger.warning(
                         "Embedding API gagal (attempt %s/%s), retry in %s detik: %s",
                         attempt + 1,
-                        MAX_RETRIES,
+                        max_retries,
                         wait_time,
                         exc,
                     )
                     time.sleep(wait_time)
                 else:
+                    add_event("embed_failed", attempt=attempt + 1, error=type(exc).__name__)
                     break
 
         raise RuntimeError(f"Gagal mengambil embedding dari Jina API: {last_error}")
@@ -98,12 +124,22 @@ class EmbeddingModel:
         """
         return self._embed_batch([text])[0]
 
-    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+    def embed_texts(
+        self,
+        texts: List[str],
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        budget_seconds: Optional[float] = None,
+    ) -> List[List[float]]:
         """
         Embed beberapa teks sekaligus.
 
         Args:
             texts: List teks yang akan di-embed.
+            timeout: Timeout per request (default API_TIMEOUT).
+            max_retries: Jumlah percobaan per batch (default MAX_RETRIES).
+            budget_seconds: Batas waktu total semua batch termasuk retry dan
+                jeda backoff; retry yang tidak muat di budget dilewati.
 
         Returns:
             List vector embedding.
@@ -111,8 +147,16 @@ class EmbeddingModel:
         if not texts:
             return []
 
+        options = {}
+        if timeout is not None:
+            options["timeout"] = timeout
+        if max_retries is not None:
+            options["max_retries"] = max_retries
+        if budget_seconds is not None:
+            options["deadline"] = time.monotonic() + budget_seconds
+
         vectors: List[List[float]] = []
         for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
             batch = texts[i : i + EMBEDDING_BATCH_SIZE]
-            vectors.extend(self._embed_batch(batch))
+            vectors.extend(self._embed_batch(batch, **options))
         return vectors
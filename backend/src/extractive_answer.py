@@ -0,0 +1,160 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from backend.config.settings import CASCADE_COMPLEX_KEYWORDS, EXTRACTIVE_EXCERPT_MAX_CHARS
+from backend.src.document_store import ScoredDocument
+from backend.src.lexical_index import tokenize
+
+LISTING_INTENT = "listing"
+LOOKUP_INTENT = "lookup"
+
+# Permintaan daftar eksplisit ("daftar coffee shop 24 jam", "cafe apa saja di Sleman").
+LISTING_KEYWORDS = [
+    "daftar",
+    "list",
+    "apa saja",
+    "apa aja",
+    "mana saja",
+    "mana aja",
+    "sebutkan",
+]
+# Pertanyaan info satu tempat ("alamat Lyon's", "jam buka Kopi Klotok").
+LOOKUP_KEYWORDS = [
+    "jam buka",
+    "buka jam",
+    "jam berapa",
+    "alamat",
+    "alamatnya",
+    "lokasinya",
+    "dimana",
+    "di mana",
+    "instagram",
+    "ig",
+]
+# Pertanyaan ya/tidak ("apakah Lyon's buka 24 jam?", "ada wifi ga?") butuh jawaban, bukan daftar.
+YES_NO_KEYWORDS = ["apakah", "adakah", "ga", "gak", "gk", "nggak", "ngga", "enggak", "engga", "ndak"]
+# Pertanyaan yang butuh penalaran/penjelasan tetap lewat LLM.
+REASONING_KEYWORDS = [
+    "kenapa",
+    "mengapa",
+    "bagaimana",
+    "gimana",
+    "jelaskan",
+    "ceritakan",
+    "menurutmu",
+    "menurut kamu",
+    "saran",
+    "tips",
+    "worth",
+] + CASCADE_COMPLEX_KEYWORDS
+
+EXTRACTIVE_NOTE = (
+    "Disusun langsung dari data tempat. Cek jam buka dan detail terbaru "
+    "di akun Instagram masing-masing sebelum berkunjung."
+)
+
+
+def _keyword_pattern(keywords: List[str]) -> "re.Pattern[str]":
+    variants = sorted(set(keywords), key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(re.escape(keyword) for keyword in variants) + r")\b", re.IGNORECASE)
+
+
+_LISTING_RE = _keyword_pattern(LISTING_KEYWORDS)
+_LOOKUP_RE = _keyword_pattern(LOOKUP_KEYWORDS)
+_YES_NO_RE = _keyword_pattern(YES_NO_KEYWORDS)
+_REASONING_RE = _keyword_pattern(REASONING_KEYWORDS)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_SECTION = re.compile(r"^(Deskripsi|Opini):\s*$", re.MULTILINE)
+
+
+def detect_answer_intent(question: str) -> Optional[str]:
+    """
+    Deteksi pertanyaan yang jawabannya cukup berupa daftar tempat dari metadata.
+
+    Returns:
+        LOOKUP_INTENT (info satu tempat), LISTING_INTENT (daftar tempat),
+        atau None jika pertanyaan butuh penalaran LLM atau jawaban ya/tidak.
+    """
+    if _REASONING_RE.search(question) or _YES_NO_RE.search(question):
+        return None
+    if _LOOKUP_RE.search(question):
+        return LOOKUP_INTENT
+    if _LISTING_RE.search(question):
+        return LISTING_INTENT
+    return None
+
+
+def _sentences(content: str) -> List[str]:
+    """Kalimat dari bagian Deskripsi dan Opini dokumen (header metadata dilewati)."""
+    sections = _SECTION.split(content)
+    # split dengan group -> [header, "Deskripsi", isi, "Opini", isi]; ambil isinya saja.
+    bodies = sections[2::2] if len(sections) > 1 else [content]
+    sentences: List[str] = []
+    for body in bodies:
+        text = " ".join(body.split())
+        sentences.extend(sentence for sentence in _SENTENCE_END.split(text) if sentence)
+    return sentences
+
+
+def best_excerpt(content: str, question: str, max_chars: int = EXTRACTIVE_EXCERPT_MAX_CHARS) -> str:
+    """
+    Kalimat dokumen yang paling banyak memuat kata kunci pertanyaan.
+
+    Tanpa kata yang cocok, kalimat pertama deskripsi yang dipakai.
+    """
+    sentences = _sentences(content)
+    if not sentences:
+        return ""
+    query_terms = {term for term in tokenize(question) if "_" not in term}
+    best = max(
+        enumerate(sentences),
+        # Seri: kalimat yang lebih awal menang (biasanya ringkasan tempat).
+        key=lambda item: (len(query_terms.intersection(tokenize(item[1]))), -item[0]),
+    )[1]
+    if len(best) > max_chars:
+        best = best[:max_chars].rsplit(" ", 1)[0].rstrip(",;:") + "..."
+    return best
+
+
+def _place_title(metadata: Dict[str, Any]) -> str:
+    nama = " ".join((metadata.get("nama") or "").split())
+    source = " ".join((metadata.get("source") or "").split())
+    if nama and source and nama.lower() != source.lower():
+        return f"{nama} ({source})"
+    return nama or source or "Tempat tanpa nama"
+
+
+def _lookup_detail(metadata: Dict[str, Any]) -> str:
+    """Jam operasional dan akun Instagram dari metadata (bukan potongan deskripsi)."""
+    jam = " ".join((metadata.get("jam_operasional") or "").split())
+    source = " ".join((metadata.get("source") or "").split())
+    parts = [f"jam operasional {jam}" if jam else "jam operasional belum tercatat"]
+    if source:
+        parts.append(f"Instagram {source}")
+    return "; ".join(parts)
+
+
+def build_extractive_answer(question: str, documents: List[ScoredDocument], intent: str) -> str:
+    """
+    Jawaban Markdown langsung dari metadata dan potongan dokumen, tanpa LLM.
+
+    Formatnya sudah dalam bentuk akhir `normalize_markdown`: heading, satu
+    blank line, satu bullet per tempat (nama + lokasi), dan satu detail
+    terindentasi di bawahnya (normalizer hanya mengindentasi detail yang
+    tepat di bawah bullet). Lookup memakai jam operasional dan akun
+    Instagram dari metadata; listing memakai kalimat dokumen yang paling
+    relevan.
+    """
+    heading = "## Info Tempat" if intent == LOOKUP_INTENT else "## Rekomendasi Coffee Shop"
+    detail_label = "Catatan" if intent == LOOKUP_INTENT else "Alasan"
+    lines = [heading, ""]
+    for doc in documents:
+        metadata = doc.metadata
+        title = _place_title(metadata)
+        lokasi = " ".join((metadata.get("lokasi") or "").split())
+        lines.append(f"- {title} — {lokasi}" if lokasi else f"- {title}")
+        excerpt = _lookup_detail(metadata) if intent == LOOKUP_INTENT else best_excerpt(doc.content, question)
+        if excerpt:
+            lines.append(f"  {detail_label}: {excerpt}")
+    lines.extend(["", "## Catatan", "", f"- {EXTRACTIVE_NOTE}"])
+    return "\n".join(lines)
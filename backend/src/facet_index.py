@@ -0,0 +1,152 @@
+import ast
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+# Pemisah label multilabel di metadata Chroma (metadata hanya boleh skalar).
+FACET_VALUE_SEPARATOR = "|"
+
+FACET_KOTA = "kota"
+FACET_KATEGORI = "kategori"
+FACET_JAM = "jam"
+FACETS = (FACET_KOTA, FACET_KATEGORI, FACET_JAM)
+
+# Nilai facet jam dari flag jam operasional di CSV.
+JAM_24_JAM = "24 Jam"
+JAM_BUKA_MALAM = "Buka Malam"
+
+# Jumlah bit 1 per byte, untuk menghitung isi bitset tanpa unpack.
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint16)
+
+
+def parse_multilabel(value: Any) -> List[str]:
+    """
+    Label kategori dari kolom `Kategori Multilabel List` ("['Ngopi Santai', 'WFC Nyaman']").
+
+    Nilai yang bukan literal list dianggap satu label atau daftar dipisah koma.
+    """
+    if isinstance(value, (list, tuple)):
+        labels = value
+    else:
+        text = str(value or "").strip()
+        if not text:
+            return []
+        try:
+            parsed = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            parsed = text.split(",")
+        labels = parsed if isinstance(parsed, (list, tuple)) else [parsed]
+    return [str(label).strip() for label in labels if str(label).strip()]
+
+
+def facet_values(metadata: Mapping[str, Any]) -> Dict[str, List[str]]:
+    """Nilai facet satu dokumen dari metadata Chroma."""
+    kategori_list = metadata.get("kategori_list") or ""
+    kategori = [label for label in str(kategori_list).split(FACET_VALUE_SEPARATOR) if label]
+    if not kategori and metadata.get("kategori"):
+        # Index lama tanpa kategori multilabel: pakai kategori tunggal.
+        kategori = [str(metadata["kategori"])]
+    jam = []
+    if metadata.get("is_24h"):
+        jam.append(JAM_24_JAM)
+    if metadata.get("is_overnight") or metadata.get("is_24h"):
+        jam.append(JAM_BUKA_MALAM)
+    kota = [str(metadata["lokasi"])] if metadata.get("lokasi") else []
+    return {FACET_KOTA: kota, FACET_KATEGORI: kategori, FACET_JAM: jam}
+
+
+class FacetIndex:
+    """
+    Index facet in-memory: satu bitset (numpy uint8 ter-pack) per nilai facet.
+
+    Filter dalam satu facet digabung OR, antar facet AND, semuanya lewat
+    operasi bitwise atas array beberapa puluh byte, jadi browse dan hitung
+    facet tidak butuh Jina, Chroma, maupun Groq.
+    """
+
+    def __init__(self, ids: List[str], bitsets: Dict[str, Dict[str, np.ndarray]]):
+        self.ids = ids
+        self._bitsets = bitsets
+        self._rows: Dict[str, int] = {doc_id: row for row, doc_id in enumerate(ids)}
+        self._all = np.packbits(np.ones(len(ids), dtype=bool))
+
+    @classmethod
+    def build(cls, ids: Sequence[str], metadatas: Sequence[Mapping[str, Any]]) -> "FacetIndex":
+        members: Dict[str, Dict[str, np.ndarray]] = {facet: {} for facet in FACETS}
+        for row, metadata in enumerate(metadatas):
+            for facet, values in facet_values(metadata or {}).items():
+                for value in values:
+                    mask = members[facet].get(value)
+                    if mask is None:
+                        mask = members[facet][value] = np.zeros(len(ids), dtype=bool)
+                    mask[row] = True
+        bitsets = {
+            facet: {value: np.packbits(mask) for value, mask in sorted(values.items())}
+            for facet, values in members.items()
+        }
+        return cls(list(ids), bitsets)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def values(self) -> Dict[str, List[str]]:
+        return {facet: list(values) for facet, values in self._bitsets.items()}
+
+    def mask(self, filters: Optional[Mapping[str, Iterable[str]]] = None, skip: Optional[str] = None) -> np.ndarray:
+        """
+        Bitset dokumen yang lolos filter.
+
+        Args:
+            filters: {facet: [nilai, ...]}; facet kosong/tidak ada = tidak difilter.
+                Nilai yang tidak dikenal tidak match dokumen mana pun.
+            skip: Facet yang diabaikan (untuk hitungan facet disjunctive).
+
+        Raises:
+            ValueError: Jika nama facet tidak dikenal.
+        """
+        result = self._all.copy()
+        for facet, values in (filters or {}).items():
+            if facet not in self._bitsets:
+                raise ValueError(f"Facet tidak dikenal: {facet}")
+            values = list(values or [])
+            if facet == skip or not values:
+                continue
+            union = np.zeros_like(result)
+            for value in values:
+                bitset = self._bitsets[facet].get(value)
+                if bitset is not None:
+                    union |= bitset
+            result &= union
+        return result
+
+    @staticmethod
+    def count(mask: np.ndarray) -> int:
+        return int(_POPCOUNT[mask].sum())
+
+    def rows_for(self, mask: np.ndarray) -> np.ndarray:
+        """Baris dokumen di bitset (urutan `ids` saat build)."""
+        return np.flatnonzero(np.unpackbits(mask, count=len(self.ids)))
+
+    def ids_for(self, mask: np.ndarray) -> List[str]:
+        """Id dokumen di bitset, urut sesuai index."""
+        return [self.ids[row] for row in self.rows_for(mask)]
+
+    def allows(self, mask: np.ndarray, doc_id: str) -> bool:
+        row = self._rows.get(doc_id)
+        return row is not None and self.allows_row(mask, row)
+
+    def allows_row(self, mask: np.ndarray, row: int) -> bool:
+        return 0 <= row < len(self.ids) and bool(mask[row >> 3] & (0x80 >> (row & 7)))
+
+    def counts(self, filters: Optional[Mapping[str, Iterable[str]]] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Jumlah dokumen per nilai facet di bawah filter aktif.
+
+        Hitungan satu facet mengabaikan filter facet itu sendiri, sehingga
+        chip lain di facet yang sama tetap menunjukkan berapa hasil jika ikut dipilih.
+        """
+        counts: Dict[str, Dict[str, int]] = {}
+        for facet, values in self._bitsets.items():
+            base = self.mask(filters, skip=facet)
+            counts[facet] = {value: self.count(base & bitset) for value, bitset in values.items()}
+        return counts
@@ -1,102 +1,290 @@
+import re
+import threading
 import time
 import logging
 from groq import Groq
 from groq import APIError, RateLimitError
-from typing import Optional
-from backend.config.settings import GROQ_API_KEY, GROQ_MODEL, MAX_TOKENS, TEMPERATURE, SYSTEM_PROMPT, API_TIMEOUT, MAX_RETRIES, RETRY_DELAY, CONTEXT_PROMPT_TEMPLATE
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from backend.src.tracing import add_event, increment, set_attributes
+from backend.src.upstreams import GROQ_UPSTREAM, upstreams
+from backend.config.settings import (
+    GROQ_API_KEY,
+    GROQ_MODEL,
+    GROQ_MODEL_TIERS,
+    MODEL_CASCADE_ENABLED,
+    CASCADE_SIMPLE_MAX_DOCUMENTS,
+    CASCADE_SIMPLE_MAX_CONTEXT_CHARS,
+    CASCADE_SIMPLE_MAX_QUESTION_WORDS,
+    CASCADE_COMPLEX_KEYWORDS,
+    CASCADE_MIN_ANSWER_CHARS,
+    TIER_RATE_LIMIT_COOLDOWN_SECONDS,
+    MAX_TOKENS,
+    MAX_TOKENS_BASE,
+    MAX_TOKENS_PER_DOCUMENT,
+    TEMPERATURE,
+    SYSTEM_PROMPT,
+    API_TIMEOUT,
+    MAX_RETRIES,
+    RETRY_DELAY,
+    CONTEXT_PROMPT_TEMPLATE,
+    HISTORY_PROMPT_TEMPLATE,
+)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_COMPLEX_QUERY = re.compile(
+    r"\b(" + "|".join(re.escape(keyword) for keyword in CASCADE_COMPLEX_KEYWORDS) + r")\b",
+    re.IGNORECASE,
+)
+
 
 class Generator:
     """Menangani generate teks menggunakan Groq API"""
     
-    def __init__(self, api_key: str = None, model: str = GROQ_MODEL):
+    def __init__(self, api_key: str = None, model: str = GROQ_MODEL, tiers: Optional[List[str]] = None):
         """
         Inisialisasi generator dengan Groq
         
         Args:
             api_key: API key Groq
-            model: Nama model yang digunakan
+            model: Nama model yang digunakan (tier terbesar jika cascade nonaktif)
+            tiers: Urutan model dari kecil ke besar; default GROQ_MODEL_TIERS
+                jika MODEL_CASCADE_ENABLED, selain itu hanya `model`
         """
         self.api_key = api_key or GROQ_API_KEY
-        self.model = model
+        if tiers is None:
+            tiers = GROQ_MODEL_TIERS if MODEL_CASCADE_ENABLED else [model]
+        self.tiers = list(tiers) or [model]
+        # Model terbesar, dipakai generate_simple dan sebagai tier terakhir cascade.
+        self.model = self.tiers[-1]
         
         if not self.api_key:
             raise ValueError("GROQ_API_KEY tidak ditemukan. Silakan set di environment variables.")
         
-        # Initialize Groq client
-        self.client = Groq(api_key=self.api_key)
+        # Initialize Groq client (pool koneksi bersama, lihat upstreams.py)
+        self.client = Groq(api_key=self.api_key, http_client=upstreams.client(GROQ_UPSTREAM))
+
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {model_name: self._empty_stats() for model_name in self.tiers}
+        self._rate_limited_until: Dict[str, float] = {}
     
     def generate(
         self, 
         query: str, 
         context: str,
         system_prompt: str = SYSTEM_PROMPT,
-        max_tokens: int = MAX_TOKENS,
-        temperature: float = TEMPERATURE
+        max_tokens: Optional[int] = None,
+        temperature: float = TEMPERATURE,
+        history: Optional[str] = None,
+        document_count: Optional[int] = None,
+        reference_names: Optional[Sequence[str]] = None,
     ) -> str:
         """
-        Generate response menggunakan Groq dengan retry logic
+        Generate response menggunakan Groq dengan model cascade dan retry logic
         
         Args:
             query: Query dari user
             context: Konteks yang diambil dari vector store
             system_prompt: System prompt untuk model
-            max_tokens: Maksimal token yang di-generate
+            max_tokens: Maksimal token yang di-generate; default dihitung dari
+                jumlah dokumen konteks (lihat `max_tokens_for`)
             temperature: Temperature sampling
+            history: Ringkasan percakapan sebelumnya (session multi-turn)
+            document_count: Jumlah dokumen di konteks, untuk routing tier dan max_tokens
+            reference_names: Nama tempat/handle di konteks; jawaban tier kecil
+                yang tidak menyebut satu pun dianggap kurang yakin dan dieskalasi
             
         Returns:
             Teks response yang di-generate
         """
         user_message = CONTEXT_PROMPT_TEMPLATE.format(context=context, query=query)
-        
+        if history:
+            user_message = HISTORY_PROMPT_TEMPLATE.format(history=history) + user_message
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ]
+        if max_tokens is None:
+            max_tokens = self.max_tokens_for(document_count)
+        start_tier = self.select_tier(query, context, document_count, history)
+        set_attributes(start_model=self.tiers[start_tier], max_tokens=max_tokens)
+
+        last_error: Optional[Exception] = None
         for attempt in range(MAX_RETRIES):
-            try:
-                chat_completion = self.client.chat.completions.create(
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_message}
-                    ],
-                    model=self.model,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    timeout=API_TIMEOUT
-                )
-                
-                response = chat_completion.choices[0].message.content
+            fallback_answer: Optional[str] = None
+            for tier in self._tier_order(start_tier):
+                model = self.tiers[tier]
+                try:
+                    chat_completion = self._complete(model, messages, max_tokens, temperature)
+                except RateLimitError as e:
+                    last_error = e
+                    logger.warning(f"Rate limit model {model} (attempt {attempt + 1}/{MAX_RETRIES}), pindah tier: {e}")
+                    self._rate_limited_until[model] = time.monotonic() + TIER_RATE_LIMIT_COOLDOWN_SECONDS
+                    add_event("llm_tier_fallback", model=model, error="RateLimitError")
+                    continue
+                except APIError as e:
+                    last_error = e
+                    logger.error(f"Groq API error model {model} (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
+                    add_event("llm_tier_fallback", model=model, error=type(e).__name__)
+                    continue
+                except Exception as e:
+                    last_error = e
+                    logger.error(f"Unexpected error model {model} (attempt {attempt + 1}/{MAX_RETRIES}): {e}", exc_info=True)
+                    add_event("llm_tier_fallback", model=model, error=type(e).__name__)
+                    continue
+
+                response = chat_completion.choices[0].message.content or ""
+                finish_reason = getattr(chat_completion.choices[0], "finish_reason", None)
+                if tier < len(self.tiers) - 1 and self._low_confidence(response, finish_reason, reference_names):
+                    # Simpan sebagai cadangan kalau tier yang lebih besar ternyata gagal.
+                    fallback_answer = fallback_answer or response
+                    self._count(model, escalations=1)
+                    add_event("llm_escalate", model=model, finish_reason=finish_reason, answer_chars=len(response))
+                    continue
+                set_attributes(model=model)
                 return response
-                
-            except RateLimitError as e:
-                logger.warning(f"Rate limit exceeded (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
-                if attempt < MAX_RETRIES - 1:
-                    wait_time = RETRY_DELAY * (2 ** attempt)
-                    logger.info(f"Menunggu {wait_time} detik sebelum mencoba lagi...")
-                    time.sleep(wait_time)
-                else:
-                    return "Maaf, terlalu banyak permintaan. Silakan coba lagi nanti."
-                    
-            except APIError as e:
-                logger.error(f"Groq API error (attempt {attempt + 1}/{MAX_RETRIES}): {e}")
-                if attempt < MAX_RETRIES - 1:
-                    wait_time = RETRY_DELAY * (2 ** attempt)
-                    logger.info(f"Menunggu {wait_time} detik sebelum mencoba lagi...")
-                    time.sleep(wait_time)
-                else:
-                    return "Maaf, terjadi kesalahan pada API. Silakan coba lagi nanti."
-                    
-            except Exception as e:
-                logger.error(f"Unexpected error (attempt {attempt + 1}/{MAX_RETRIES}): {e}", exc_info=True)
-                if attempt < MAX_RETRIES - 1:
-                    wait_time = RETRY_DELAY * (2 ** attempt)
-                    logger.info(f"Menunggu {wait_time} detik sebelum mencoba lagi...")
-                    time.sleep(wait_time)
-                else:
-                    return f"Error: {str(e)}"
-        
+
+            if fallback_answer is not None:
+                set_attributes(model="fallback_low_confidence")
+                return fallback_answer
+
+            if attempt < MAX_RETRIES - 1:
+                wait_time = RETRY_DELAY * (2 ** attempt)
+                add_event("llm_retry", attempt=attempt + 1, error=type(last_error).__name__, sleep_s=wait_time)
+                logger.info(f"Semua tier gagal, menunggu {wait_time} detik sebelum mencoba lagi...")
+                time.sleep(wait_time)
+            else:
+                add_event("llm_failed", attempt=attempt + 1, error=type(last_error).__name__)
+
+        if isinstance(last_error, RateLimitError):
+            return "Maaf, terlalu banyak permintaan. Silakan coba lagi nanti."
+        if isinstance(last_error, APIError):
+            return "Maaf, terjadi kesalahan pada API. Silakan coba lagi nanti."
+        if last_error is not None:
+            return f"Error: {str(last_error)}"
         return "Maaf, gagal menghasilkan respons setelah beberapa percobaan."
+
+    @staticmethod
+    def max_tokens_for(document_count: Optional[int]) -> int:
+        """Batas token output sebanding jumlah dokumen yang perlu dibahas"""
+        if document_count is None:
+            return MAX_TOKENS
+        return min(MAX_TOKENS, MAX_TOKENS_BASE + MAX_TOKENS_PER_DOCUMENT * max(1, document_count))
+
+    def select_tier(
+        self,
+        query: str,
+        context: str,
+        document_count: Optional[int] = None,
+        history: Optional[str] = None,
+    ) -> int:
+        """
+        Pilih tier awal: 0 (model terkecil) untuk pertanyaan sederhana dengan
+        konteks pendek, tier terbesar untuk perbandingan atau konteks panjang.
+        """
+        if len(self.tiers) == 1:
+            return 0
+        is_simple = (
+            not history
+            and document_count is not None
+            and document_count <= CASCADE_SIMPLE_MAX_DOCUMENTS
+            and len(context) <= CASCADE_SIMPLE_MAX_CONTEXT_CHARS
+            and len(query.split()) <= CASCADE_SIMPLE_MAX_QUESTION_WORDS
+            and not _COMPLEX_QUERY.search(query)
+        )
+        return 0 if is_simple else len(self.tiers) - 1
+
+    def _tier_order(self, start_tier: int) -> List[int]:
+        """Tier awal lalu tier yang lebih besar, lalu yang lebih kecil (cadangan rate limit)"""
+        order = list(range(start_tier, len(self.tiers))) + list(range(start_tier - 1, -1, -1))
+        now = time.monotonic()
+        available = [tier for tier in order if self._rate_limited_until.get(self.tiers[tier], 0) <= now]
+        # Semua tier sedang cooldown: tetap coba sesuai urutan daripada langsung gagal.
+        return available or order
+
+    @staticmethod
+    def _low_confidence(
+        response: str,
+        finish_reason: Optional[str],
+        reference_names: Optional[Sequence[str]],
+    ) -> bool:
+        if finish_reason == "length" or len(response.strip()) < CASCADE_MIN_ANSWER_CHARS:
+            return True
+        names = [name.lower().lstrip("@") for name in reference_names or [] if name]
+        if names:
+            lowered = response.lower()
+            return not any(name in lowered for name in names)
+        return False
+
+    def _complete(self, model: str, messages: List[Dict[str, str]], max_tokens: int, temperature: float):
+        """Satu panggilan chat completion ke satu tier, plus pencatatan latency/token"""
+        started_at = time.perf_counter()
+        try:
+            chat_completion = self.client.chat.completions.create(
+                messages=messages,
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                timeout=API_TIMEOUT
+            )
+        except RateLimitError:
+            self._count(model, calls=1, rate_limited=1, latency_ms=(time.perf_counter() - started_at) * 1000)
+            raise
+        except Exception:
+            self._count(model, calls=1, errors=1, latency_ms=(time.perf_counter() - started_at) * 1000)
+            raise
+        latency_ms = (time.perf_counter() - started_at) * 1000
+        prompt_tokens, completion_tokens = self._record_usage(chat_completion, model)
+        self._count(
+            model,
+            calls=1,
+            latency_ms=latency_ms,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+        return chat_completion
+
+    @staticmethod
+    def _empty_stats() -> Dict[str, float]:
+        return {
+            "calls": 0,
+            "errors": 0,
+            "rate_limited": 0,
+            "escalations": 0,
+            "latency_ms": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+        }
+
+    def _count(self, model: str, **values: float) -> None:
+        with self._stats_lock:
+            stats = self._stats.setdefault(model, self._empty_stats())
+            for key, value in values.items():
+                stats[key] += value
+
+    def tier_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Counter per tier sejak proses start (latency rata-rata per panggilan berhasil/gagal)"""
+        with self._stats_lock:
+            snapshot = {model: dict(stats) for model, stats in self._stats.items()}
+        now = time.monotonic()
+        for model, stats in snapshot.items():
+            stats["avg_latency_ms"] = round(stats["latency_ms"] / stats["calls"], 1) if stats["calls"] else 0.0
+            stats["latency_ms"] = round(stats["latency_ms"], 1)
+            stats["rate_limited_now"] = self._rate_limited_until.get(model, 0) > now
+        return snapshot
+
+    def _record_usage(self, chat_completion, model: Optional[str] = None) -> Tuple[int, int]:
+        """Catat jumlah token prompt/completion ke trace request yang sedang aktif"""
+        usage = getattr(chat_completion, "usage", None)
+        if usage is None:
+            return 0, 0
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        add_event("llm_usage", model=model or self.model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        increment(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        return prompt_tokens, completion_tokens
     
     def generate_simple(self, prompt: str, max_tokens: int = MAX_TOKENS) -> str:
         """
@@ -0,0 +1,129 @@
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from backend.config.settings import INDEX_VERSIONS_TO_KEEP, VECTOR_STORE_DIR, VECTOR_STORE_ROOT
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_DIR = VECTOR_STORE_ROOT / "versions"
+CURRENT_POINTER = VECTOR_STORE_ROOT / "CURRENT"
+LEGACY_VERSION = "legacy"
+
+
+def list_index_versions() -> List[str]:
+    """Nama versi index yang ada di disk, urut dari yang paling lama."""
+    if not VERSIONS_DIR.exists():
+        return []
+    return sorted(path.name for path in VERSIONS_DIR.iterdir() if path.is_dir())
+
+
+def current_index_version() -> str:
+    """
+    Versi index yang sedang dipublikasikan lewat pointer `CURRENT`.
+
+    Jika pointer belum ada (deployment lama), kembalikan `legacy` yang
+    menunjuk ke `VECTOR_STORE_DIR`.
+    """
+    try:
+        version = CURRENT_POINTER.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return LEGACY_VERSION
+    if not version or not (VERSIONS_DIR / version).is_dir():
+        logger.warning("Pointer index CURRENT tidak valid (%r), memakai index legacy", version)
+        return LEGACY_VERSION
+    return version
+
+
+def index_dir_for(version: str) -> Path:
+    if version == LEGACY_VERSION:
+        return VECTOR_STORE_DIR
+    return VERSIONS_DIR / version
+
+
+def index_version_for(index_dir: Path) -> str:
+    """Kebalikan `index_dir_for`: nama versi dari direktori index."""
+    index_dir = Path(index_dir)
+    if index_dir.parent.resolve() == VERSIONS_DIR.resolve():
+        return index_dir.name
+    return LEGACY_VERSION
+
+
+def current_index_dir() -> Path:
+    """Direktori Chroma untuk versi index yang sedang aktif."""
+    return index_dir_for(current_index_version())
+
+
+def new_index_dir() -> Path:
+    """Buat direktori kosong untuk versi index baru (nama berbasis timestamp)."""
+    VERSIONS_DIR.mkdir(parents=True, exist_ok=True)
+    base = time.strftime("%Y%m%d-%H%M%S")
+    version = base
+    suffix = 1
+    while (VERSIONS_DIR / version).exists():
+        suffix += 1
+        version = f"{base}-{suffix}"
+    path = VERSIONS_DIR / version
+    path.mkdir()
+    return path
+
+
+def clone_index_dir(source: Path) -> Path:
+    """
+    Versi index baru berisi salinan `source`, untuk rebuild sebagian (satu shard).
+
+    Salinan dibuat dari direktori yang tidak sedang ditulis; index aktif tetap
+    melayani query dari direktori aslinya.
+    """
+    path = new_index_dir()
+    shutil.copytree(source, path, dirs_exist_ok=True)
+    return path
+
+
+def latest_unpublished_index_dir() -> Optional[Path]:
+    """Versi terbaru yang lebih baru dari versi aktif (build yang belum selesai/dipublikasikan)."""
+    current = current_index_version()
+    versions = list_index_versions()
+    if not versions:
+        return None
+    latest = versions[-1]
+    if latest == current or (current != LEGACY_VERSION and latest < current):
+        return None
+    return VERSIONS_DIR / latest
+
+
+def publish_index(index_dir: Path) -> str:
+    """
+    Jadikan `index_dir` sebagai index aktif dengan mengganti pointer secara atomik.
+
+    Returns:
+        Nama versi yang dipublikasikan.
+    """
+    index_dir = Path(index_dir)
+    if index_dir.parent.resolve() != VERSIONS_DIR.resolve():
+        raise ValueError(f"Index {index_dir} bukan bagian dari {VERSIONS_DIR}")
+
+    tmp_pointer = CURRENT_POINTER.with_suffix(".tmp")
+    tmp_pointer.write_text(index_dir.name, encoding="utf-8")
+    os.replace(tmp_pointer, CURRENT_POINTER)
+    logger.info("Index versi %s dipublikasikan", index_dir.name)
+    return index_dir.name
+
+
+def prune_index_versions(keep: int = INDEX_VERSIONS_TO_KEEP) -> List[str]:
+    """
+    Hapus versi index lama, sisakan `keep` versi terbaru dan versi aktif.
+
+    Versi sebelumnya tetap disimpan (keep >= 2) supaya proses yang masih
+    men-drain request di index lama tidak kehilangan file-nya.
+    """
+    current = current_index_version()
+    versions = list_index_versions()
+    removable = [version for version in versions[: -max(1, keep)] if version != current]
+    for version in removable:
+        shutil.rmtree(VERSIONS_DIR / version, ignore_errors=True)
+        logger.info("Index versi %s dihapus", version)
+    return removable
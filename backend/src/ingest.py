@@ -1,24 +1,85 @@
-import re
+import os
+import json
+import time
+import queue
 import logging
+import threading
 import pandas as pd
 from pathlib import Path
-from typing import List
-from langchain_core.documents import Document
+from typing import Callable, Optional
 from langchain_chroma import Chroma
 from backend.src.embed import EmbeddingModel
-from backend.config.settings import VECTOR_STORE_DIR, EMBEDDING_MODEL, PROCESSED_DATA_DIR, INGEST_BATCH_SIZE
+from backend.src.facet_index import FACET_VALUE_SEPARATOR, parse_multilabel
+from backend.src.index_versions import current_index_dir
+from backend.src.lexical_index import LexicalIndex
+from backend.src.local_embed import LocalIndex
+from backend.src.shards import LEGACY_SHARD, collection_name, load_manifest, save_manifest, shard_key
+from backend.config.settings import (
+    EMBEDDING_MODEL,
+    PROCESSED_DATA_DIR,
+    INDEX_SHARD_COLUMN,
+    INGEST_BATCH_SIZE,
+    INGEST_PIPELINE_DEPTH,
+)
 
 logger = logging.getLogger(__name__)
 
+# Kolom CSV yang dipakai -> nama kolom internal.
+COLUMN_RENAMES = {
+    "Kota": "lokasi",
+    "Akun Instagram": "source",
+    "Nama Tempat": "nama",
+    "Kategori Tempat": "kategori",
+    "deskripsi": "deskripsi",
+    "opini": "opini",
+}
+REQUIRED_COLUMNS = list(COLUMN_RENAMES)
+# Kolom opsional untuk facet browse (/api/places); CSV tanpa kolom ini tetap bisa di-ingest.
+FACET_COLUMN_RENAMES = {
+    "Kategori Multilabel List": "kategori_list",
+    "Jam Operasional": "jam_operasional",
+    "Is 24H": "is_24h",
+    "Is Overnight": "is_overnight",
+}
+METADATA_COLUMNS = [
+    "id",
+    "kategori",
+    "lokasi",
+    "source",
+    "nama",
+    "kategori_list",
+    "jam_operasional",
+    "is_24h",
+    "is_overnight",
+    "shard",
+]
+
+CHECKPOINT_FILENAME = "ingest_checkpoint.json"
+_END_OF_BATCHES = object()
+
+
+class IngestCancelled(Exception):
+    """Ingest dihentikan lewat `should_stop`; checkpoint chunk terakhir tetap tersimpan."""
+
 
 class DataIngestor:
     """Menangani loading dan ingest dokumen ke ChromaDB"""
     
-    def __init__(self):
-        """Inisialisasi data ingestor"""
+    def __init__(self, persist_directory: Optional[Path] = None, shard_column: str = INDEX_SHARD_COLUMN):
+        """
+        Inisialisasi data ingestor
+
+        Args:
+            persist_directory: Direktori Chroma tujuan. Default: versi index
+                yang sedang aktif.
+            shard_column: Kolom CSV penentu shard (satu collection per nilai).
+                Kosong = semua dokumen di satu collection.
+        """
+        self.persist_directory = Path(persist_directory) if persist_directory else current_index_dir()
+        self.shard_column = shard_column
         self.embedding_model = EmbeddingModel(EMBEDDING_MODEL)
         self.embedding_function = self._create_embedding_function()
-        VECTOR_STORE_DIR.parent.mkdir(parents=True, exist_ok=True)
+        self.persist_directory.parent.mkdir(parents=True, exist_ok=True)
     
     def _create_embedding_function(self):
         """Buat fungsi embedding yang kompatibel dengan Chroma"""
@@ -37,99 +98,369 @@ class DataIngestor:
         
         return EmbeddingWrapper(self.embedding_model)
     
-    def _clean_text(self, text: str) -> str:
-        """Membersihkan teks"""
-        if pd.isna(text):
-            return ""
-        text = str(text)
-        text = re.sub(r"\s+", " ", text)  # Hapus spasi berlebih
-        return text.strip()
+    @staticmethod
+    def _clean_series(series: pd.Series) -> pd.Series:
+        """Membersihkan teks satu kolom: NaN jadi kosong, spasi berlebih dihapus"""
+        return (
+            series.fillna("")
+            .astype(str)
+            .str.replace(r"\s+", " ", regex=True)
+            .str.strip()
+        )
     
-    def _build_content(self, row: pd.Series) -> str:
-        """Membangun content field dari baris data"""
-        return f"""Kategori: {row['kategori']}
-Lokasi: {row['lokasi']}
-Sumber: {row['source']}
+    def _build_content(self, df: pd.DataFrame) -> pd.Series:
+        """Membangun content field dari data (vektorisasi per kolom)"""
+        return (
+            "Kategori: " + df["kategori"]
+            + "\nLokasi: " + df["lokasi"]
+            + "\nSumber: " + df["source"]
+            + "\n\nDeskripsi:\n" + df["deskripsi"]
+            + "\n\nOpini:\n" + df["opini"]
+        )
 
-Deskripsi:
-{row['deskripsi']}
+    def _validate_columns(self, csv_path: Path) -> list:
+        """Cek kolom wajib hanya dari header CSV; return kolom yang akan dibaca"""
+        columns = list(pd.read_csv(csv_path, nrows=0).columns)
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+        if missing_columns:
+            raise ValueError(
+                f"Kolom yang dibutuhkan tidak ditemukan dalam CSV: {missing_columns}\n"
+                f"Kolom yang tersedia: {columns}"
+            )
+        if self.shard_column and self.shard_column not in columns:
+            raise ValueError(f"Kolom shard '{self.shard_column}' tidak ditemukan dalam CSV")
+        usecols = REQUIRED_COLUMNS + [col for col in FACET_COLUMN_RENAMES if col in columns]
+        if self.shard_column and self.shard_column not in usecols:
+            usecols.append(self.shard_column)
+        return usecols
+
+    @staticmethod
+    def _parse_flag(series: pd.Series) -> pd.Series:
+        """Kolom boolean CSV ("True"/"False", 1/0) jadi bool"""
+        return series.fillna(False).astype(str).str.strip().str.lower().isin(["true", "1", "ya", "yes"])
+
+    def _prepare_chunk(self, chunk: pd.DataFrame, first_id: int) -> pd.DataFrame:
+        """Rename, beri ID, bersihkan, dan bangun content untuk satu chunk CSV"""
+        df = chunk[REQUIRED_COLUMNS].copy()
+        df.columns = list(COLUMN_RENAMES.values())
+        df.insert(0, "id", range(first_id, first_id + len(df)))
+        for col in COLUMN_RENAMES.values():
+            df[col] = self._clean_series(df[col])
+
+        # Metadata facet; kolom yang tidak ada di CSV diisi default supaya metadata seragam.
+        facets = chunk.rename(columns=FACET_COLUMN_RENAMES)
+        empty = pd.Series("", index=df.index)
+        df["kategori_list"] = (
+            facets["kategori_list"].map(lambda value: FACET_VALUE_SEPARATOR.join(parse_multilabel(value)))
+            if "kategori_list" in facets
+            else empty
+        )
+        df["jam_operasional"] = self._clean_series(facets["jam_operasional"]) if "jam_operasional" in facets else empty
+        for col in ("is_24h", "is_overnight"):
+            df[col] = self._parse_flag(facets[col]) if col in facets else False
 
-Opini:
-{row['opini']}"""
+        if self.shard_column:
+            df["shard_value"] = self._clean_series(chunk[self.shard_column])
+            df["shard"] = df["shard_value"].map(shard_key)
+        else:
+            df["shard_value"] = ""
+            df["shard"] = LEGACY_SHARD
+
+        df["content"] = self._build_content(df)
+        return df
     
-    def load_and_ingest_csv(self, csv_path: str):
+    def load_and_ingest_csv(
+        self,
+        csv_path: str,
+        chunk_rows: int = INGEST_BATCH_SIZE,
+        resume: bool = False,
+        shard: Optional[str] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ):
         """
-        Memuat dan ingest data dari CSV Sahabat AI
+        Memuat dan ingest data dari CSV Sahabat AI secara streaming per chunk
+
+        Embedding chunk N+1 berjalan di thread producer bersamaan dengan
+        penulisan chunk N ke Chroma. Checkpoint disimpan setiap selesai
+        menulis satu chunk, sehingga kegagalan hanya mengulang satu chunk.
+        Dokumen ditulis ke collection shard-nya (`shard_column`).
         
         Args:
             csv_path: Path ke file extracted_data_sahabatai.csv
+            chunk_rows: Jumlah baris per chunk (dibaca, di-embed, lalu ditulis)
+            resume: Lanjutkan dari checkpoint terakhir jika cocok dengan CSV
+            shard: Bangun ulang satu shard saja. Collection shard lain di
+                `persist_directory` tidak disentuh dan barisnya tidak di-embed.
+            progress: Dipanggil setelah tiap chunk tersimpan dengan
+                (baris CSV diproses, dokumen di-embed pada run ini).
+            should_stop: Dicek setelah tiap chunk; True -> `IngestCancelled`.
+
+        Raises:
+            IngestCancelled: Jika `should_stop` mengembalikan True.
         """
         csv_path = Path(csv_path)
         
         if not csv_path.exists():
             raise FileNotFoundError(f"File tidak ditemukan: {csv_path}")
+        if shard is not None and not self.shard_column:
+            raise ValueError("Rebuild per shard butuh INDEX_SHARD_COLUMN")
         
         print(f"Memuat data dari: {csv_path}")
-        
-        # Load CSV
-        df = pd.read_csv(csv_path)
-        print(f"Berhasil memuat {len(df)} baris data")
-        print()
-        
-        # Validate required columns
-        required_columns = ['Kota', 'Akun Instagram', 'Kategori Tempat', 'deskripsi', 'opini']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise ValueError(
-                f"Kolom yang dibutuhkan tidak ditemukan dalam CSV: {missing_columns}\n"
-                f"Kolom yang tersedia: {list(df.columns)}"
-            )
-        
-        # Pilih kolom yang diperlukan
-        df = df[required_columns]
-        
-        # Rename kolom
-        df.columns = ['lokasi', 'source', 'kategori', 'deskripsi', 'opini']
-        
-        # Tambahkan ID
-        df.insert(0, 'id', range(1, 1 + len(df)))
-        
-        # Cleaning
-        print("Membersihkan data...")
-        for col in ["kategori", "lokasi", "source", "deskripsi", "opini"]:
-            df[col] = df[col].apply(self._clean_text)
-        
-        # Build content
-        print("Membangun content field...")
-        df["content"] = df.apply(self._build_content, axis=1)
-        
-        # Convert to LangChain Documents
-        print("Mengkonversi ke LangChain documents...")
-        documents = []
-        for _, row in df.iterrows():
-            documents.append(
-                Document(
-                    page_content=row["content"],
-                    metadata={
-                        "id": row["id"],
-                        "kategori": row["kategori"],
-                        "lokasi": row["lokasi"],
-                        "source": row["source"],
-                    },
-                )
-            )
-        
-        print(f"Total {len(documents)} dokumen siap untuk di-embed")
-        print()
-        
-        # Ingest ke Chroma
-        print("Menyimpan ke ChromaDB")
-        vectorstore = Chroma.from_documents(
-            documents=documents,
-            embedding=self.embedding_function,
-            persist_directory=str(VECTOR_STORE_DIR)
+        usecols = self._validate_columns(csv_path)
+
+        checkpoint_path = self.persist_directory / CHECKPOINT_FILENAME
+        start_row = self._resume_position(checkpoint_path, csv_path, shard) if resume else 0
+        if start_row:
+            print(f"Melanjutkan dari checkpoint: {start_row} baris sudah tersimpan")
+
+        manifest = load_manifest(self.persist_directory)
+        collections = {}
+        if shard is not None and not start_row:
+            # Shard dibangun dari nol; shard lain tetap seperti di index asal.
+            self._shard_vectorstore(shard).delete_collection()
+            manifest.pop(shard, None)
+
+        # Waktu kumulatif per tahap untuk laporan baris/detik.
+        stage_seconds = {"baca+clean": 0.0, "embed": 0.0, "tulis": 0.0}
+        total_rows = start_row
+        shard_rows = 0
+        started_at = time.perf_counter()
+
+        batches: queue.Queue = queue.Queue(maxsize=max(1, INGEST_PIPELINE_DEPTH))
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce_batches,
+            args=(csv_path, usecols, max(1, chunk_rows), start_row, batches, stop, stage_seconds, shard),
+            name="ingest-embed",
+            daemon=True,
         )
-        
+        producer.start()
+
+        try:
+            while True:
+                batch = batches.get()
+                if batch is _END_OF_BATCHES:
+                    break
+                if isinstance(batch, BaseException):
+                    raise batch
+
+                rows_read, df, texts, embeddings = batch
+                write_started = time.perf_counter()
+                df = df.reset_index(drop=True)
+                for shard_name, group in df.groupby("shard", sort=False):
+                    if shard_name not in collections:
+                        collections[shard_name] = self._shard_vectorstore(shard_name)._collection
+                    positions = group.index.tolist()
+                    collections[shard_name].upsert(
+                        ids=[str(doc_id) for doc_id in group["id"].tolist()],
+                        embeddings=[embeddings[position] for position in positions],
+                        documents=[texts[position] for position in positions],
+                        metadatas=group[METADATA_COLUMNS].to_dict("records"),
+                    )
+                    if self.shard_column:
+                        entry = manifest.setdefault(
+                            shard_name,
+                            {"collection": collection_name(shard_name), "values": [], "documents": 0},
+                        )
+                        entry["values"] = sorted(set(entry["values"]).union(group["shard_value"]) - {""})
+                stage_seconds["tulis"] += time.perf_counter() - write_started
+
+                total_rows += rows_read
+                shard_rows += len(df)
+                if self.shard_column:
+                    save_manifest(self.persist_directory, self.shard_column, manifest)
+                self._save_checkpoint(checkpoint_path, csv_path, total_rows, completed=False, shard=shard)
+                print(f"  {total_rows} baris diproses, {shard_rows} dokumen tersimpan")
+                if progress is not None:
+                    progress(total_rows, shard_rows)
+                if should_stop is not None and should_stop():
+                    raise IngestCancelled(f"Ingest dihentikan setelah {total_rows} baris")
+        finally:
+            stop.set()
+            producer.join()
+
+        if shard is not None and shard not in manifest:
+            raise ValueError(f"Shard '{shard}' tidak ada di CSV (kolom {self.shard_column})")
+        self._save_checkpoint(checkpoint_path, csv_path, total_rows, completed=True, shard=shard)
+
+        # Index pendamping dibangun dari seluruh collection (termasuk baris dari
+        # run sebelumnya saat resume dan shard lain saat rebuild per shard):
+        # embedding lokal (fallback jika Jina down) dan BM25 untuk hybrid retrieval.
+        local_started = time.perf_counter()
+        doc_ids = []
+        documents = []
+        for shard_name in manifest or [LEGACY_SHARD]:
+            collection = collections.get(shard_name) or self._shard_vectorstore(shard_name)._collection
+            shard_ids, shard_documents = self._collection_documents(collection)
+            doc_ids.extend(shard_ids)
+            documents.extend(shard_documents)
+            if shard_name in manifest:
+                manifest[shard_name]["documents"] = len(shard_ids)
+        if self.shard_column:
+            save_manifest(self.persist_directory, self.shard_column, manifest)
+        LocalIndex.build(doc_ids, documents).save(self.persist_directory)
+        LexicalIndex.build(doc_ids, documents).save(self.persist_directory)
+        stage_seconds["index lokal"] = time.perf_counter() - local_started
+        wall_seconds = time.perf_counter() - started_at
+
         # Data otomatis tersimpan ke persist_directory
-        print(f"Ingest selesai! {len(documents)} dokumen berhasil disimpan")
-        print(f"Vector store tersimpan di: {VECTOR_STORE_DIR}")
+        print(f"Ingest selesai! {len(doc_ids)} dokumen tersimpan, {shard_rows} di-embed ({wall_seconds:.2f} detik)")
+        if manifest:
+            print("  Shard: " + ", ".join(f"{name} ({entry['documents']})" for name, entry in manifest.items()))
+        for stage, seconds in stage_seconds.items():
+            rate = shard_rows / seconds if seconds > 0 else float("inf")
+            print(f"  {stage}: {rate:.1f} baris/detik ({seconds:.2f} detik)")
+        print(f"Vector store tersimpan di: {self.persist_directory}")
+
+    def _shard_vectorstore(self, shard: str) -> Chroma:
+        """Vector store Chroma untuk collection satu shard (dibuat jika belum ada)"""
+        return Chroma(
+            collection_name=collection_name(shard),
+            persist_directory=str(self.persist_directory),
+            embedding_function=self.embedding_function,
+        )
+
+    @staticmethod
+    def _collection_documents(collection, page_size: int = 5000) -> tuple:
+        """Ambil semua (ids, documents) dari collection Chroma per halaman"""
+        ids = []
+        documents = []
+        offset = 0
+        while True:
+            page = collection.get(include=["documents"], limit=page_size, offset=offset)
+            page_ids = page.get("ids") or []
+            if not page_ids:
+                break
+            ids.extend(page_ids)
+            documents.extend(document or "" for document in page["documents"])
+            offset += len(page_ids)
+        return ids, documents
+
+    def _produce_batches(
+        self,
+        csv_path: Path,
+        usecols: list,
+        chunk_rows: int,
+        start_row: int,
+        batches: queue.Queue,
+        stop: threading.Event,
+        stage_seconds: dict,
+        shard: Optional[str] = None,
+    ) -> None:
+        """Thread producer: baca, bersihkan, dan embed chunk lalu kirim ke queue"""
+        try:
+            rows_seen = 0
+            reader = pd.read_csv(csv_path, usecols=usecols, chunksize=chunk_rows)
+            while not stop.is_set():
+                started_at = time.perf_counter()
+                chunk = next(reader, None)
+                if chunk is None:
+                    break
+
+                first_id = rows_seen + 1
+                rows_seen += len(chunk)
+                if rows_seen <= start_row:
+                    continue
+                if first_id <= start_row:
+                    # Chunk yang sebagian sudah tersimpan (chunk_rows berubah sejak checkpoint).
+                    chunk = chunk.iloc[start_row - first_id + 1 :]
+                    first_id = start_row + 1
+
+                df = self._prepare_chunk(chunk, first_id=first_id)
+                if shard is not None:
+                    # Rebuild satu shard: baris shard lain tidak di-embed.
+                    df = df[df["shard"] == shard]
+                texts = df["content"].tolist()
+                stage_seconds["baca+clean"] += time.perf_counter() - started_at
+
+                started_at = time.perf_counter()
+                embeddings = self.embedding_function.embed_documents(texts) if texts else []
+                stage_seconds["embed"] += time.perf_counter() - started_at
+
+                self._put_batch(batches, (len(chunk), df, texts, embeddings), stop)
+            self._put_batch(batches, _END_OF_BATCHES, stop)
+        except BaseException as exc:  # noqa: BLE001
+            self._put_batch(batches, exc, stop)
+
+    @staticmethod
+    def _put_batch(batches: queue.Queue, item, stop: threading.Event) -> None:
+        """Masukkan item ke queue tanpa macet kalau consumer sudah berhenti"""
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    @staticmethod
+    def _csv_fingerprint(csv_path: Path) -> dict:
+        stat = csv_path.stat()
+        return {
+            "csv_path": str(csv_path.resolve()),
+            "csv_size": stat.st_size,
+            "csv_mtime": stat.st_mtime,
+        }
+
+    def _save_checkpoint(
+        self,
+        checkpoint_path: Path,
+        csv_path: Path,
+        rows: int,
+        completed: bool,
+        shard: Optional[str] = None,
+    ) -> None:
+        """Simpan checkpoint secara atomik (tulis file sementara lalu rename)"""
+        payload = {
+            **self._csv_fingerprint(csv_path),
+            "shard_column": self.shard_column,
+            "shard": shard,
+            "rows_committed": rows,
+            "completed": completed,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = checkpoint_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+        os.replace(tmp_path, checkpoint_path)
+
+    @classmethod
+    def _read_checkpoint(cls, checkpoint_path: Path, csv_path: Path) -> Optional[dict]:
+        """Checkpoint yang dibuat dari CSV ini (path/size/mtime sama), atau None"""
+        if not checkpoint_path.exists():
+            return None
+        checkpoint = json.loads(checkpoint_path.read_text(encoding="utf-8"))
+        fingerprint = cls._csv_fingerprint(csv_path)
+        if any(checkpoint.get(key) != value for key, value in fingerprint.items()):
+            return None
+        return checkpoint
+
+    @classmethod
+    def index_built_from(cls, index_dir: Path, csv_path: str, shard_column: str = INDEX_SHARD_COLUMN) -> bool:
+        """
+        Apakah index di `index_dir` dibangun lengkap dari CSV ini.
+
+        ID dokumen adalah nomor baris CSV, jadi rebuild satu shard hanya aman
+        jika CSV tidak berubah sejak index asal dibangun.
+        """
+        checkpoint = cls._read_checkpoint(Path(index_dir) / CHECKPOINT_FILENAME, Path(csv_path))
+        return (
+            checkpoint is not None
+            and bool(checkpoint.get("completed"))
+            and checkpoint.get("shard_column", "") == shard_column
+        )
+
+    def _resume_position(self, checkpoint_path: Path, csv_path: Path, shard: Optional[str] = None) -> int:
+        """Jumlah baris yang sudah tersimpan menurut checkpoint (0 jika tidak valid)"""
+        if not checkpoint_path.exists():
+            print("Checkpoint tidak ditemukan, ingest dimulai dari awal")
+            return 0
+
+        checkpoint = self._read_checkpoint(checkpoint_path, csv_path)
+        if checkpoint is None:
+            logger.warning("Checkpoint dibuat untuk CSV lain/versi lain, ingest dimulai dari awal")
+            return 0
+        if checkpoint.get("shard_column", "") != self.shard_column or checkpoint.get("shard") != shard:
+            logger.warning("Checkpoint dibuat dengan pembagian shard lain, ingest dimulai dari awal")
+            return 0
+        return int(checkpoint.get("rows_committed", 0))
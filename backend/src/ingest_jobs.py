@@ -0,0 +1,361 @@
+import contextlib
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.config.settings import (
+    INGEST_JOB_CANCEL_GRACE_SECONDS,
+    INGEST_JOB_HISTORY,
+    INGEST_JOB_NICE,
+    PROCESSED_DATA_DIR,
+)
+from backend.src.index_versions import (
+    clone_index_dir,
+    current_index_dir,
+    index_version_for,
+    latest_unpublished_index_dir,
+    new_index_dir,
+    prune_index_versions,
+    publish_index,
+)
+from backend.src.shards import load_manifest, shard_key
+
+logger = logging.getLogger(__name__)
+
+CSV_PATH = PROCESSED_DATA_DIR / "extracted_data_sahabatai.csv"
+JOB_LOG_FILENAME = "ingest_job.log"
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_CANCELLING = "cancelling"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+
+class IngestJobConflict(RuntimeError):
+    """Sudah ada job ingest yang berjalan (hanya satu job dalam satu waktu)."""
+
+
+def validate_build(csv_path: Path = CSV_PATH, shard: Optional[str] = None) -> None:
+    """
+    Cek cepat sebelum build dimulai (tanpa menyentuh index).
+
+    Raises:
+        FileNotFoundError: Jika CSV sumber tidak ada.
+        ValueError: Jika rebuild per shard tidak bisa dilakukan di index aktif.
+    """
+    from backend.src.ingest import DataIngestor
+
+    if not Path(csv_path).exists():
+        raise FileNotFoundError(f"File tidak ditemukan: {csv_path}")
+    if shard is not None:
+        active_dir = current_index_dir()
+        manifest = load_manifest(active_dir)
+        if not manifest:
+            raise ValueError("Index aktif belum di-shard, jalankan reingest penuh dulu")
+        if shard not in manifest:
+            raise ValueError(f"Shard '{shard}' tidak ada di index aktif")
+        if not DataIngestor.index_built_from(active_dir, str(csv_path)):
+            # ID dokumen = nomor baris CSV; shard lain bisa bentrok jika CSV berubah.
+            raise ValueError("CSV berubah sejak index aktif dibangun, jalankan reingest penuh")
+
+
+def prepare_index_dir(csv_path: Path = CSV_PATH, shard: Optional[str] = None, resume: bool = False) -> Path:
+    """
+    Direktori versi index untuk build berikutnya.
+
+    Build penuh memakai versi kosong baru; rebuild satu shard menyalin versi
+    aktif. Saat `resume`, versi terakhir yang belum dipublikasikan dipakai.
+
+    Raises:
+        FileNotFoundError, ValueError: Lihat `validate_build`.
+    """
+    validate_build(csv_path, shard)
+    index_dir = latest_unpublished_index_dir() if resume else None
+    if index_dir is None:
+        index_dir = clone_index_dir(current_index_dir()) if shard is not None else new_index_dir()
+    return index_dir
+
+
+def _count_csv_rows(csv_path: str) -> int:
+    import pandas as pd
+
+    first_column = list(pd.read_csv(csv_path, nrows=0).columns)[:1]
+    return sum(len(chunk) for chunk in pd.read_csv(csv_path, usecols=first_column, chunksize=50000))
+
+
+def _run_ingest_process(
+    csv_path: str,
+    shard: Optional[str],
+    resume: bool,
+    events: "multiprocessing.Queue",
+    cancel: "multiprocessing.synchronize.Event",
+    nice: int,
+) -> None:
+    """
+    Entry point proses ingest (spawn): siapkan versi index, jalankan `DataIngestor`,
+    dan laporkan progress lewat queue.
+
+    Salinan index untuk rebuild per shard juga dibuat di sini, bukan di proses
+    serving. Output print ingest ditulis ke `ingest_job.log` di direktori versi index.
+    """
+    from backend.src.ingest import DataIngestor, IngestCancelled
+
+    if nice:
+        # Proses ingest mengalah ke proses serving saat CPU rebutan.
+        with contextlib.suppress(AttributeError, OSError):
+            os.nice(nice)
+
+    try:
+        index_dir = prepare_index_dir(Path(csv_path), shard=shard, resume=resume)
+    except BaseException as exc:  # noqa: BLE001
+        events.put(("failed", {"error": f"{type(exc).__name__}: {exc}"}))
+        return
+    events.put(("index", {"index_dir": str(index_dir)}))
+
+    with open(index_dir / JOB_LOG_FILENAME, "a", encoding="utf-8") as log_file, contextlib.redirect_stdout(log_file):
+        logging.basicConfig(stream=log_file, level=logging.INFO, force=True)
+        try:
+            events.put(("total", {"rows_total": _count_csv_rows(csv_path)}))
+            ingestor = DataIngestor(persist_directory=index_dir)
+            ingestor.load_and_ingest_csv(
+                csv_path,
+                resume=resume,
+                shard=shard,
+                progress=lambda processed, embedded: events.put(
+                    ("progress", {"rows_processed": processed, "rows_embedded": embedded})
+                ),
+                should_stop=cancel.is_set,
+            )
+            events.put(("done", {}))
+        except IngestCancelled as exc:
+            print(exc)
+            events.put(("cancelled", {}))
+        except BaseException as exc:  # noqa: BLE001
+            logging.exception("Ingest gagal")
+            events.put(("failed", {"error": f"{type(exc).__name__}: {exc}"}))
+
+
+@dataclass
+class IngestJob:
+    job_id: str
+    shard: Optional[str]
+    resume: bool
+    index_version: Optional[str] = None
+    status: str = JOB_QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    rows_total: Optional[int] = None
+    rows_processed: int = 0
+    rows_embedded: int = 0
+    published_version: Optional[str] = None
+    errors: List[str] = field(default_factory=list)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Status job plus throughput (baris di-embed/detik) dan estimasi sisa waktu."""
+        data = asdict(self)
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        data["elapsed_seconds"] = round(elapsed, 2)
+        data["rows_per_second"] = round(self.rows_embedded / elapsed, 2) if elapsed > 0 else 0.0
+        data["eta_seconds"] = None
+        if self.status == JOB_RUNNING and self.rows_total and self.rows_processed and elapsed > 0:
+            # Rebuild per shard melewati baris shard lain, jadi ETA dihitung dari baris CSV yang diproses.
+            remaining = max(0, self.rows_total - self.rows_processed)
+            data["eta_seconds"] = round(remaining / (self.rows_processed / elapsed), 1)
+        return data
+
+
+class IngestJobRunner:
+    """
+    Menjalankan ingest di proses terpisah supaya GIL dan memory proses serving tidak terpakai.
+
+    Hanya satu job dalam satu waktu. Job yang selesai dipublikasikan sebagai
+    versi index baru lalu `on_published(versi)` dipanggil (mis. hot reload).
+    Job yang gagal/dibatalkan meninggalkan versi yang belum dipublikasikan,
+    yang bisa dilanjutkan dengan `resume=True`.
+    """
+
+    def __init__(
+        self,
+        on_published: Optional[Callable[[str], None]] = None,
+        csv_path: Path = CSV_PATH,
+        history: int = INGEST_JOB_HISTORY,
+        nice: int = INGEST_JOB_NICE,
+        cancel_grace_seconds: float = INGEST_JOB_CANCEL_GRACE_SECONDS,
+    ):
+        self.on_published = on_published
+        self.csv_path = Path(csv_path)
+        self.history = history
+        self.nice = nice
+        self.cancel_grace_seconds = cancel_grace_seconds
+        # spawn, bukan fork: proses serving punya banyak thread (uvicorn, thread pool, watcher).
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._active: Optional[str] = None
+        self._process = None
+        self._cancel = None
+        self._monitor: Optional[threading.Thread] = None
+
+    def start(self, shard: Optional[str] = None, resume: bool = False) -> Dict[str, Any]:
+        """
+        Mulai job ingest (build penuh, atau satu shard jika `shard` diisi).
+
+        Raises:
+            IngestJobConflict: Jika masih ada job yang berjalan.
+            FileNotFoundError, ValueError: Lihat `prepare_index_dir`.
+        """
+        with self._lock:
+            if self._active is not None:
+                raise IngestJobConflict(f"Job ingest {self._active} masih berjalan")
+            shard = shard_key(shard) if shard else None
+            validate_build(self.csv_path, shard)
+            job = IngestJob(job_id=uuid.uuid4().hex[:12], shard=shard, resume=resume)
+            events = self._context.Queue()
+            cancel = self._context.Event()
+            process = self._context.Process(
+                target=_run_ingest_process,
+                args=(str(self.csv_path), shard, resume, events, cancel, self.nice),
+                name=f"ingest-{job.job_id}",
+                daemon=True,
+            )
+            process.start()
+            self._process, self._cancel = process, cancel
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+            self._active = job.job_id
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+            self._monitor = threading.Thread(
+                target=self._watch,
+                args=(job, self._process, events),
+                name="ingest-monitor",
+                daemon=True,
+            )
+            self._monitor.start()
+            logger.info("Job ingest %s dimulai (shard=%s, resume=%s)", job.job_id, shard, resume)
+            return job.snapshot()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.snapshot() if job else None
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """Job terbaru dulu."""
+        with self._lock:
+            return [job.snapshot() for job in reversed(self._jobs.values())]
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Minta job berhenti setelah chunk yang sedang ditulis.
+
+        Proses yang tidak berhenti dalam `cancel_grace_seconds` (mis. menunggu
+        retry Jina) dihentikan paksa.
+
+        Returns:
+            Snapshot job, atau None jika job tidak dikenal.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.job_id == self._active and job.status == JOB_RUNNING:
+                job.status = JOB_CANCELLING
+                self._cancel.set()
+                process = self._process
+                timer = threading.Timer(self.cancel_grace_seconds, self._terminate, args=(process,))
+                timer.daemon = True
+                timer.start()
+            return job.snapshot()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Batalkan job aktif saat aplikasi berhenti."""
+        with self._lock:
+            active, process, monitor = self._active, self._process, self._monitor
+            if active is not None:
+                self._cancel.set()
+        if process is not None and active is not None:
+            process.join(timeout)
+            self._terminate(process)
+        if monitor is not None:
+            monitor.join(timeout)
+
+    @staticmethod
+    def _terminate(process) -> None:
+        if process.is_alive():
+            logger.warning("Proses ingest %s tidak berhenti, dihentikan paksa", process.name)
+            process.terminate()
+
+    def _watch(self, job: IngestJob, process, events) -> None:
+        """Thread monitor: terapkan event progress dari proses ingest sampai proses selesai."""
+        outcome: Optional[str] = None
+        index_dir: Optional[Path] = None
+        while outcome is None:
+            try:
+                kind, payload = events.get(timeout=0.5)
+            except queue.Empty:
+                if not process.is_alive():
+                    # Proses mati tanpa mengirim hasil (OOM kill, terminate).
+                    with self._lock:
+                        cancelled = job.status == JOB_CANCELLING
+                    outcome = JOB_CANCELLED if cancelled else JOB_FAILED
+                    if not cancelled:
+                        payload = {"error": f"Proses ingest berhenti (exit code {process.exitcode})"}
+                    else:
+                        payload = {}
+                    break
+                continue
+            with self._lock:
+                if kind == "index":
+                    index_dir = Path(payload["index_dir"])
+                    job.index_version = index_version_for(index_dir)
+                elif kind == "total":
+                    job.rows_total = payload["rows_total"]
+                elif kind == "progress":
+                    job.rows_processed = payload["rows_processed"]
+                    job.rows_embedded = payload["rows_embedded"]
+                elif kind == "done":
+                    outcome = JOB_SUCCEEDED
+                elif kind == "cancelled":
+                    outcome = JOB_CANCELLED
+                elif kind == "failed":
+                    outcome = JOB_FAILED
+        process.join(timeout=self.cancel_grace_seconds)
+
+        if outcome == JOB_SUCCEEDED:
+            try:
+                job.published_version = publish_index(index_dir)
+                removed = prune_index_versions()
+                if removed:
+                    logger.info("Versi index lama dihapus: %s", ", ".join(removed))
+            except Exception as exc:  # noqa: BLE001
+                outcome = JOB_FAILED
+                payload = {"error": f"Gagal mempublikasikan index: {exc}"}
+
+        with self._lock:
+            job.status = outcome
+            job.finished_at = time.time()
+            if payload.get("error"):
+                job.errors.append(payload["error"])
+            self._active = None
+            self._process = None
+        logger.info("Job ingest %s selesai: %s", job.job_id, outcome)
+
+        if outcome == JOB_SUCCEEDED and self.on_published is not None:
+            try:
+                self.on_published(job.published_version)
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Reload setelah job ingest %s gagal: %s", job.job_id, exc)
@@ -0,0 +1,263 @@
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LEXICAL_INDEX_FILENAME = "lexical_index.npz"
+
+# Parameter BM25 standar.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a",
+    "ada",
+    "aja",
+    "aku",
+    "and",
+    "apa",
+    "atau",
+    "bisa",
+    "buat",
+    "dan",
+    "dari",
+    "dengan",
+    "dgn",
+    "di",
+    "dong",
+    "ga",
+    "gak",
+    "gitu",
+    "gue",
+    "gw",
+    "in",
+    "ini",
+    "itu",
+    "juga",
+    "kak",
+    "kalau",
+    "kalo",
+    "kamu",
+    "ke",
+    "mana",
+    "mau",
+    "min",
+    "nggak",
+    "of",
+    "pengen",
+    "saja",
+    "saya",
+    "sih",
+    "the",
+    "tidak",
+    "tolong",
+    "untuk",
+    "utk",
+    "with",
+    "ya",
+    "yang",
+    "yg",
+}
+# Sufiks klitik yang sering menempel di pertanyaan ("kopinya", "enaklah", "bukakah").
+_CLITIC_SUFFIXES = ("nya", "lah", "kah")
+_MIN_STEM_LENGTH = 4
+
+_REDUPLICATION_DASH = re.compile(r"\b([a-z]{3,})-\1\b")
+_REDUPLICATION_DIGIT = re.compile(r"\b([a-z]{3,})2\b")
+_LONG_REPEAT = re.compile(r"([a-z])\1{2,}")
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word: str) -> str:
+    for suffix in _CLITIC_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM_LENGTH:
+            return word[: -len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokenisasi ramah bahasa Indonesia informal.
+
+    Reduplikasi dibuang ("kopi-kopi", "ngopi2"), huruf yang diulang 3+ kali
+    digabung ("enakkk"), klitik -nya/-lah/-kah dilepas, stopword dibuang.
+    Bigram kata berurutan ikut jadi term ("kopi_susu") supaya nama menu
+    dua kata lebih kuat dari kemunculan katanya secara terpisah.
+    """
+    text = text.lower()
+    text = _REDUPLICATION_DASH.sub(r"\1", text)
+    text = _REDUPLICATION_DIGIT.sub(r"\1", text)
+    text = _LONG_REPEAT.sub(r"\1", text)
+    words = [_stem(word) for word in _TOKEN.findall(text) if word not in STOPWORDS]
+    return words + [f"{left}_{right}" for left, right in zip(words, words[1:])]
+
+
+class LexicalIndex:
+    """
+    Inverted index BM25 di memory.
+
+    Posting list disimpan sebagai array numpy datar (CSR: offsets per term),
+    sehingga file npz bisa dimuat dalam hitungan milidetik.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        vocabulary: List[str],
+        offsets: np.ndarray,
+        posting_rows: np.ndarray,
+        posting_tf: np.ndarray,
+        document_lengths: np.ndarray,
+    ):
+        self.ids = ids
+        self._rows: Dict[str, int] = {doc_id: row for row, doc_id in enumerate(ids)}
+        self._terms: Dict[str, int] = {term: position for position, term in enumerate(vocabulary)}
+        self._vocabulary = vocabulary
+        self._offsets = offsets
+        self._posting_rows = posting_rows
+        self._posting_tf = posting_tf
+        self._document_lengths = document_lengths.astype(np.float32)
+        document_count = max(1, len(ids))
+        document_frequency = np.diff(offsets).astype(np.float32)
+        self._idf = np.log(1.0 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+        self._average_length = float(self._document_lengths.mean()) if len(ids) else 0.0
+
+    @classmethod
+    def build(cls, ids: Sequence[str], texts: Sequence[str]) -> "LexicalIndex":
+        postings: Dict[str, Dict[int, int]] = {}
+        lengths = np.zeros(len(texts), dtype=np.int32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text or "")
+            lengths[row] = len(tokens)
+            for token in tokens:
+                term_postings = postings.setdefault(token, {})
+                term_postings[row] = term_postings.get(row, 0) + 1
+
+        vocabulary = sorted(postings)
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        rows: List[int] = []
+        frequencies: List[int] = []
+        for position, term in enumerate(vocabulary):
+            term_postings = postings[term]
+            rows.extend(term_postings)
+            frequencies.extend(term_postings.values())
+            offsets[position + 1] = len(rows)
+        return cls(
+            list(ids),
+            vocabulary,
+            offsets,
+            np.asarray(rows, dtype=np.int32),
+            np.asarray(frequencies, dtype=np.float32),
+            lengths,
+        )
+
+    def save(self, index_dir: Path) -> Path:
+        path = Path(index_dir) / LEXICAL_INDEX_FILENAME
+        tmp_path = path.with_name(f"{path.stem}.tmp.npz")
+        np.savez(
+            tmp_path,
+            ids=np.asarray(self.ids),
+            vocabulary=np.asarray(self._vocabulary),
+            offsets=self._offsets,
+            posting_rows=self._posting_rows,
+            posting_tf=self._posting_tf,
+            document_lengths=self._document_lengths,
+        )
+        tmp_path.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, index_dir: Path) -> Optional["LexicalIndex"]:
+        path = Path(index_dir) / LEXICAL_INDEX_FILENAME
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return cls(
+                data["ids"].tolist(),
+                data["vocabulary"].tolist(),
+                data["offsets"],
+                data["posting_rows"],
+                data["posting_tf"],
+                data["document_lengths"],
+            )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def score(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Skor BM25 semua dokumen untuk query.
+
+        Returns:
+            tuple(scores, coverage). `coverage` = porsi bobot IDF kata query
+            (tanpa bigram) yang muncul di tiap dokumen; 1.0 = semua kata ada.
+            Kata yang tidak ada di korpus sama sekali ikut dihitung sebagai
+            tidak match.
+        """
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        coverage = np.zeros(len(self.ids), dtype=np.float32)
+        tokens = set(tokenize(query))
+        positions = {self._terms[token] for token in tokens if token in self._terms}
+        if not positions or not self.ids:
+            return scores, coverage
+
+        # Kata di luar vocabulary diberi IDF maksimum (muncul di 0 dokumen).
+        unknown_words = sum(1 for token in tokens if "_" not in token and token not in self._terms)
+        total_idf = unknown_words * float(np.log(1.0 + (len(self.ids) + 0.5) / 0.5))
+        for position in positions:
+            start, end = self._offsets[position], self._offsets[position + 1]
+            rows = self._posting_rows[start:end]
+            tf = self._posting_tf[start:end]
+            idf = self._idf[position]
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._document_lengths[rows] / self._average_length)
+            # Satu dokumen muncul paling banyak sekali per posting list, jadi += aman.
+            scores[rows] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+            if "_" not in self._vocabulary[position]:
+                coverage[rows] += idf
+                total_idf += idf
+        if total_idf > 0:
+            coverage /= total_idf
+        return scores, coverage
+
+    def score_ids(self, query: str, ids: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Skor BM25 dan coverage (lihat `score`) untuk dokumen tertentu saja (0 untuk id yang tidak dikenal)."""
+        scores, coverage = self.score(query)
+        rows = [self._rows.get(doc_id) for doc_id in ids]
+        return (
+            np.asarray([scores[row] if row is not None else 0.0 for row in rows], dtype=np.float32),
+            np.asarray([coverage[row] if row is not None else 0.0 for row in rows], dtype=np.float32),
+        )
+
+    def known_words(self, query: str) -> int:
+        """Jumlah kata unik di query yang ada di vocabulary (tanpa bigram)."""
+        return sum(1 for token in set(tokenize(query)) if "_" not in token and token in self._terms)
+
+    def search(self, query: str, k: int) -> Tuple[List[str], List[float], List[float]]:
+        """
+        Top-k dokumen BM25 (skor > 0).
+
+        Returns:
+            tuple(ids, scores, coverage) urut dari skor tertinggi.
+        """
+        scores, coverage = self.score(query)
+        matched = int(np.count_nonzero(scores))
+        k = min(k, matched)
+        if k <= 0:
+            return [], [], []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return (
+            [self.ids[row] for row in top],
+            [float(scores[row]) for row in top],
+            [float(coverage[row]) for row in top],
+        )
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """Gabungkan beberapa ranking id dengan Reciprocal Rank Fusion."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused, key=lambda doc_id: fused[doc_id], reverse=True)
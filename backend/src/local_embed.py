@@ -0,0 +1,252 @@
+import re
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.config.settings import LOCAL_EMBEDDING_DIM
+
+LOCAL_INDEX_FILENAME = "local_index.npz"
+# Panjang n-gram karakter (di dalam kata yang diberi padding spasi).
+NGRAM_SIZES = (3, 4, 5)
+
+_WORD = re.compile(r"\w+")
+
+
+class LocalQueryVector(list):
+    """
+    Vector query hasil `LocalEmbedder`.
+
+    Subclass `list` supaya bisa dipakai di semua tempat yang menerima
+    embedding biasa, sekaligus menandai bahwa vector ini harus dicari di
+    index lokal, bukan di Chroma (ruang vector-nya berbeda).
+    """
+
+
+@lru_cache(maxsize=200_000)
+def _bucket(feature: str, dim: int) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % dim
+
+
+def _features(text: str) -> Iterable[str]:
+    """Kata utuh plus n-gram karakter per kata, huruf kecil."""
+    for word in _WORD.findall(text.lower()):
+        yield word
+        padded = f" {word} "
+        for size in NGRAM_SIZES:
+            for start in range(len(padded) - size + 1):
+                yield padded[start : start + size]
+
+
+class SparseRows:
+    """
+    Vector dokumen sparse: CSR (per baris) plus indeks per bucket (per kolom).
+
+    Vector TF-IDF dokumen hanya mengisi sebagian kecil bucket (~500 dari
+    4096 di korpus saat ini). Layout per bucket dipakai search: query hanya
+    mengisi puluhan bucket, jadi yang dibaca hanya kolom bucket tersebut.
+    Layout per baris dipakai untuk membuat baris dense kandidat (MMR).
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, dim: int):
+        self.dim = dim
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        # Bucket < 65536 muat di uint16 (dimensi default 4096).
+        self.indices = np.asarray(indices, dtype=np.uint16 if dim <= 1 << 16 else np.int32)
+        self.data = np.asarray(data, dtype=np.float32)
+
+        owners = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind="stable")
+        self._column_indptr = np.zeros(dim + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=dim), out=self._column_indptr[1:])
+        self._column_rows = owners[order]
+        self._column_data = self.data[order]
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Tuple[np.ndarray, np.ndarray]], dim: int) -> "SparseRows":
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(indices) for indices, _ in rows])
+        if rows:
+            indices = np.concatenate([indices for indices, _ in rows])
+            data = np.concatenate([values for _, values in rows])
+        else:
+            indices, data = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        return cls(indptr, indices, data, dim)
+
+    @classmethod
+    def from_dense(cls, matrix: np.ndarray) -> "SparseRows":
+        matrix = np.asarray(matrix, dtype=np.float32)
+        rows = []
+        for row in matrix:
+            nonzero = np.flatnonzero(row)
+            rows.append((nonzero, row[nonzero]))
+        return cls.from_rows(rows, int(matrix.shape[1]))
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.indptr, self.indices, self.data, self._column_indptr, self._column_rows, self._column_data)
+        return sum(array.nbytes for array in arrays)
+
+    @staticmethod
+    def _positions(indptr: np.ndarray, segments: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Posisi nilai milik `segments` (baris/kolom) plus urutan segmen pemiliknya."""
+        starts = indptr[segments]
+        lengths = indptr[segments + 1] - starts
+        owner = np.repeat(np.arange(len(segments)), lengths)
+        offsets = np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.repeat(starts, lengths) + offsets, owner
+
+    def dot(self, query: np.ndarray, rows: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Dot product tiap baris (atau hanya `rows`) dengan vector query dense."""
+        if rows is None:
+            buckets = np.flatnonzero(query)
+            positions, owner = self._positions(self._column_indptr, buckets)
+            values = self._column_data[positions] * query[buckets][owner]
+            return np.bincount(self._column_rows[positions], weights=values, minlength=len(self)).astype(np.float32)
+        rows = np.asarray(rows, dtype=np.int64)
+        positions, owner = self._positions(self.indptr, rows)
+        values = self.data[positions] * query[self.indices[positions]]
+        return np.bincount(owner, weights=values, minlength=len(rows)).astype(np.float32)
+
+    def take(self, rows: Sequence[int]) -> np.ndarray:
+        """Baris tertentu sebagai matrix dense (len(rows) x dim)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        matrix = np.zeros((len(rows), self.dim), dtype=np.float32)
+        positions, owner = self._positions(self.indptr, rows)
+        matrix[owner, self.indices[positions]] = self.data[positions]
+        return matrix
+
+
+class LocalEmbedder:
+    """
+    Embedder offline tanpa bobot model: TF-IDF n-gram karakter yang di-hash.
+
+    Bobot IDF dihitung dari korpus saat ingest dan disimpan bersama index,
+    sehingga query dan dokumen selalu diproyeksikan dengan cara yang sama.
+    """
+
+    def __init__(self, idf: np.ndarray):
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.dim = int(self.idf.shape[0])
+
+    @classmethod
+    def fit(cls, texts: Sequence[str], dim: int = LOCAL_EMBEDDING_DIM) -> "LocalEmbedder":
+        """
+        Hitung IDF per bucket dari korpus dokumen.
+
+        Args:
+            texts: Seluruh teks dokumen.
+            dim: Jumlah bucket hash (dimensi vector).
+        """
+        document_frequency = np.zeros(dim, dtype=np.float32)
+        for text in texts:
+            buckets = {_bucket(feature, dim) for feature in _features(text)}
+            document_frequency[list(buckets)] += 1
+        idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1.0
+        return cls(idf)
+
+    def _weights(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Bucket non-zero dan bobotnya (sudah dinormalisasi) untuk satu teks.
+
+        TF memakai skala sublinear (1 + log tf) supaya kata yang diulang-ulang
+        di deskripsi tidak mendominasi.
+        """
+        buckets = np.asarray([_bucket(feature, self.dim) for feature in _features(text)], dtype=np.int32)
+        indices, counts = np.unique(buckets, return_counts=True)
+        values = (1.0 + np.log(counts.astype(np.float32))) * self.idf[indices]
+        norm = float(np.linalg.norm(values))
+        if norm > 0:
+            values /= norm
+        return indices.astype(np.int32), values.astype(np.float32)
+
+    def embed_sparse(self, texts: Sequence[str]) -> SparseRows:
+        """Embed banyak teks (dokumen) langsung ke `SparseRows` ternormalisasi."""
+        return SparseRows.from_rows([self._weights(text) for text in texts], self.dim)
+
+    def embed_matrix(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed banyak teks menjadi matrix dense (n x dim) yang sudah dinormalisasi."""
+        return self.embed_sparse(texts).take(range(len(texts)))
+
+    def embed_queries(self, queries: Sequence[str]) -> List[LocalQueryVector]:
+        return [LocalQueryVector(row.tolist()) for row in self.embed_matrix(queries)]
+
+
+class LocalIndex:
+    """Index paralel berisi vector lokal (sparse) tiap dokumen Chroma (id yang sama)."""
+
+    def __init__(self, ids: List[str], vectors: SparseRows, embedder: LocalEmbedder):
+        self.ids = ids
+        self.vectors = vectors
+        self.embedder = embedder
+        self._rows = {doc_id: row for row, doc_id in enumerate(ids)}
+
+    @classmethod
+    def build(cls, ids: List[str], texts: Sequence[str], dim: int = LOCAL_EMBEDDING_DIM) -> "LocalIndex":
+        embedder = LocalEmbedder.fit(texts, dim=dim)
+        return cls(list(ids), embedder.embed_sparse(texts), embedder)
+
+    def save(self, index_dir: Path) -> Path:
+        path = Path(index_dir) / LOCAL_INDEX_FILENAME
+        # np.savez menambahkan ".npz" kalau nama file belum berakhiran itu.
+        tmp_path = path.with_name(f"{path.stem}.tmp.npz")
+        np.savez_compressed(
+            tmp_path,
+            ids=np.asarray(self.ids),
+            indptr=self.vectors.indptr,
+            indices=self.vectors.indices,
+            data=self.vectors.data.astype(np.float16),
+            idf=self.embedder.idf,
+        )
+        tmp_path.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, index_dir: Path) -> Optional["LocalIndex"]:
+        path = Path(index_dir) / LOCAL_INDEX_FILENAME
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            embedder = LocalEmbedder(data["idf"])
+            if "vectors" in data:
+                # Format lama: matrix dense float16.
+                vectors = SparseRows.from_dense(data["vectors"])
+            else:
+                vectors = SparseRows(data["indptr"], data["indices"], data["data"], embedder.dim)
+            return cls([str(doc_id) for doc_id in data["ids"]], vectors, embedder)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def has(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+
+    def rows_for(self, ids: Sequence[str]) -> np.ndarray:
+        """Vector dense untuk id tertentu (mis. kandidat MMR)."""
+        return self.vectors.take([self._rows[doc_id] for doc_id in ids])
+
+    def similarities(self, ids: Sequence[str], query_vector: Sequence[float]) -> np.ndarray:
+        """Cosine similarity query terhadap id tertentu, tanpa membuat baris dense."""
+        query = np.asarray(query_vector, dtype=np.float32)
+        return self.vectors.dot(query, [self._rows[doc_id] for doc_id in ids])
+
+    def search(self, query_vector: Sequence[float], fetch_k: int) -> Tuple[List[str], List[float]]:
+        """
+        Cari fetch_k dokumen terdekat.
+
+        Returns:
+            tuple(ids, distances). Distance = 2 - 2 * cosine, sama dengan
+            squared L2 yang dipakai Chroma untuk vector ternormalisasi.
+        """
+        if not self.ids or fetch_k <= 0:
+            return [], []
+        similarity = self.vectors.dot(np.asarray(query_vector, dtype=np.float32))
+        fetch_k = min(fetch_k, len(self.ids))
+        top = np.argpartition(-similarity, fetch_k - 1)[:fetch_k]
+        top = top[np.argsort(-similarity[top])]
+        return [self.ids[row] for row in top], [float(2.0 - 2.0 * similarity[row]) for row in top]
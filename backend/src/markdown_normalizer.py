@@ -0,0 +1,113 @@
+import re
+from typing import List, Optional
+
+_WHITESPACE_RUN = re.compile(r"[ \t]+")
+# Satu pola untuk bullet ("*", "•", "-") dan ordered list ("1.", "2)").
+_LIST_ITEM = re.compile(r"^(?:[*•-] +(?P<bullet>.*)|\d+[.)] +(?P<ordered>.*))$")
+_DETAIL_LABEL = re.compile(r"^(Lokasi|Alasan|Menu|Fasilitas|Catatan)\s*:", re.IGNORECASE)
+
+
+class MarkdownNormalizer:
+    """
+    Normalizer Markdown jawaban LLM yang bisa diberi potongan teks (stream).
+
+    `feed()` mengembalikan baris yang sudah final (tidak akan berubah lagi),
+    `close()` mengembalikan sisa baris. Gabungan semua baris dengan "\\n" sama
+    persis dengan hasil `normalize_markdown` untuk teks utuh.
+    """
+
+    def __init__(self) -> None:
+        self._partial = ""
+        self._last: Optional[str] = None
+        self._blank_pending = False
+        self._bullet_started = False
+        self._closed = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """
+        Tambahkan potongan teks dan ambil baris normalisasi yang sudah stabil.
+
+        Args:
+            chunk: Potongan teks berikutnya dari LLM.
+
+        Returns:
+            List baris baru yang sudah final.
+        """
+        if self._closed:
+            raise ValueError("MarkdownNormalizer sudah ditutup.")
+        if not chunk:
+            return []
+
+        text = self._partial + chunk
+        # "\r" di ujung chunk bisa jadi awal "\r\n"; tunda sampai chunk berikutnya.
+        held_cr = text.endswith("\r")
+        if held_cr:
+            text = text[:-1]
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+
+        lines = text.split("\n")
+        self._partial = lines.pop() + ("\r" if held_cr else "")
+
+        emitted: List[str] = []
+        for raw in lines:
+            self._consume_line(raw, emitted)
+        return emitted
+
+    def close(self) -> List[str]:
+        """Flush baris terakhir; blank line di akhir jawaban dibuang."""
+        if self._closed:
+            return []
+        self._closed = True
+
+        emitted: List[str] = []
+        text = self._partial.replace("\r", "\n")
+        self._partial = ""
+        for raw in text.split("\n"):
+            self._consume_line(raw, emitted)
+        return emitted
+
+    def _append(self, line: str, emitted: List[str]) -> None:
+        if self._blank_pending:
+            emitted.append("")
+            self._blank_pending = False
+        emitted.append(line)
+        self._last = line
+
+    def _consume_line(self, raw: str, emitted: List[str]) -> None:
+        stripped = raw.strip()
+        if not stripped:
+            # Blank line hanya final kalau diikuti baris lain, jadi ditunda dulu.
+            if self._last:
+                self._blank_pending = True
+                self._last = ""
+            return
+
+        compact = _WHITESPACE_RUN.sub(" ", stripped)
+
+        # Normalize unordered bullet markers and ordered lists to "- ".
+        list_item = _LIST_ITEM.match(compact)
+        if list_item:
+            item = list_item.group("bullet")
+            if item is None:
+                item = list_item.group("ordered")
+            if self._last and not self._bullet_started:
+                self._blank_pending = True
+            self._append(f"- {item.strip()}", emitted)
+            self._bullet_started = True
+            return
+
+        # Keep detail lines indented under previous bullet when appropriate.
+        if self._last and self._last.startswith("- ") and _DETAIL_LABEL.match(compact):
+            self._append(f"  {compact}", emitted)
+            return
+
+        self._append(compact, emitted)
+        self._bullet_started = False
+
+
+def normalize_markdown(answer: str) -> str:
+    """Normalisasi jawaban utuh (bullet seragam, blank line rapi, detail terindentasi)."""
+    normalizer = MarkdownNormalizer()
+    lines = normalizer.feed(answer)
+    lines.extend(normalizer.close())
+    return "\n".join(lines)
@@ -0,0 +1,58 @@
+from typing import List, Sequence
+
+import numpy as np
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Normalisasi tiap baris matrix ke panjang 1 (float32).
+
+    Baris nol dibiarkan nol supaya tidak menghasilkan NaN.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def maximal_marginal_relevance(
+    query_vector: Sequence[float] | np.ndarray,
+    candidate_matrix: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+) -> List[int]:
+    """
+    Pilih k kandidat dengan Maximal Marginal Relevance secara vektorisasi.
+
+    Args:
+        query_vector: Embedding query.
+        candidate_matrix: Matrix embedding kandidat (n x dim), sebaiknya sudah
+            dinormalisasi dengan `normalize_rows`.
+        k: Jumlah kandidat yang dipilih.
+        lambda_mult: 1.0 = murni relevansi, 0.0 = murni diversity.
+
+    Returns:
+        Index baris kandidat terpilih, berurutan sesuai urutan pemilihan.
+    """
+    if k <= 0 or candidate_matrix.shape[0] == 0:
+        return []
+
+    query = normalize_rows(query_vector)[0]
+    relevance = candidate_matrix @ query
+    k = min(k, candidate_matrix.shape[0])
+
+    first = int(np.argmax(relevance))
+    selected = [first]
+    # Similarity maksimum tiap kandidat terhadap set terpilih, di-update inkremental.
+    max_similarity = candidate_matrix @ candidate_matrix[first]
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * max_similarity
+        scores[selected] = -np.inf
+        chosen = int(np.argmax(scores))
+        selected.append(chosen)
+        np.maximum(max_similarity, candidate_matrix @ candidate_matrix[chosen], out=max_similarity)
+
+    return selected
@@ -0,0 +1,300 @@
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Kata yang terlalu umum untuk dijadikan alias satu kata ("Dingo Coffee" -> "dingo").
+GENERIC_NAME_WORDS = {
+    "and",
+    "bar",
+    "cafe",
+    "coffee",
+    "coffeeshop",
+    "coworking",
+    "dan",
+    "eatery",
+    "garden",
+    "house",
+    "jogja",
+    "kafe",
+    "kedai",
+    "kitchen",
+    "kopi",
+    "resto",
+    "roastery",
+    "shop",
+    "space",
+    "studio",
+    "the",
+    "warung",
+    "yogya",
+    "yogyakarta",
+}
+# Pertanyaan pembanding ("mirip Lyon's Cafe") butuh retrieval biasa, bukan lookup langsung.
+SIMILARITY_CUES = {"seperti", "mirip", "kayak", "kyk", "selain", "alternatif", "similar"}
+
+# Alias satu kata hanya dipakai jika muncul di sedikit dokumen tempat lain.
+MAX_ALIAS_OTHER_DOCUMENTS = 2
+MIN_ALIAS_LENGTH = 4
+MIN_FUZZY_LENGTH = 5
+# Typo hanya dicari di frasa pendek; nama yang diketik panjang biasanya sudah exact.
+MAX_FUZZY_WORDS = 3
+
+_APOSTROPHE = re.compile(r"[’'`´]")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_NAME_SEPARATOR = re.compile(r"\s[-|&(]\s?|,|\(")
+_HANDLE = re.compile(r"@([a-z0-9_.]{2,})")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def normalize_name(text: str) -> str:
+    """Lowercase, buang apostrof ("Lyon's" -> "lyons"), non-alfanumerik jadi spasi."""
+    text = _APOSTROPHE.sub("", text.lower())
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def normalize_handle(handle: str) -> str:
+    return handle.strip().lower().lstrip("@").rstrip(".")
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f" {text} "
+    return {padded[start : start + 3] for start in range(len(padded) - 2)}
+
+
+def _bounded_edit_distance(left: str, right: str, limit: int) -> int:
+    """Levenshtein dengan early exit; hasil > limit berarti "terlalu jauh"."""
+    if abs(len(left) - len(right)) > limit:
+        return limit + 1
+    previous = list(range(len(right) + 1))
+    for i, left_char in enumerate(left, 1):
+        current = [i] + [0] * len(right)
+        for j, right_char in enumerate(right, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (left_char != right_char),
+            )
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _allowed_edits(text: str) -> int:
+    return 1 if len(text) <= 8 else 2
+
+
+@dataclass
+class NameMatch:
+    ids: List[str]
+    matched: List[str] = field(default_factory=list)
+    exact: bool = True
+
+
+class NameIndex:
+    """
+    Index nama tempat dan handle Instagram di memory.
+
+    Alias dicari sebagai frasa utuh di pertanyaan (terpanjang dulu), lalu
+    fuzzy (jarak edit 1-2) lewat kandidat trigram jika tidak ada yang exact.
+    """
+
+    def __init__(self) -> None:
+        self._places: Dict[str, Set[str]] = {}
+        self._aliases: Dict[str, Set[str]] = {}
+        self._handles: Dict[str, Set[str]] = {}
+        self._trigram_aliases: Dict[str, Set[str]] = {}
+        self._frequent_words: Set[str] = set()
+        self._max_alias_words = 1
+
+    @classmethod
+    def build(cls, ids: List[str], metadatas: List[dict], documents: List[str]) -> "NameIndex":
+        """
+        Bangun index dari metadata dokumen (`nama`, `source`).
+
+        Args:
+            ids: ID dokumen Chroma.
+            metadatas: Metadata per dokumen.
+            documents: Konten dokumen, dipakai untuk mengukur seberapa umum
+                sebuah kata (alias satu kata yang umum dibuang).
+        """
+        index = cls()
+        document_texts = [f" {normalize_name(document or '')} " for document in documents]
+        document_words = [set(text.split()) for text in document_texts]
+        word_frequency: Dict[str, int] = {}
+        for words in document_words:
+            for word in words:
+                word_frequency[word] = word_frequency.get(word, 0) + 1
+        index._frequent_words = {
+            word for word, frequency in word_frequency.items() if frequency > MAX_ALIAS_OTHER_DOCUMENTS
+        }
+
+        place_rows: Dict[str, List[int]] = {}
+        place_aliases: Dict[str, Set[str]] = {}
+        for row, (doc_id, metadata) in enumerate(zip(ids, metadatas)):
+            metadata = metadata or {}
+            handles = [
+                normalize_handle(handle)
+                for handle in str(metadata.get("source", "")).split(",")
+                if normalize_handle(handle)
+            ]
+            name = normalize_name(str(metadata.get("nama", "")))
+            place_key = handles[0] if handles else name
+            if not place_key:
+                continue
+            index._places.setdefault(place_key, set()).add(doc_id)
+            place_rows.setdefault(place_key, []).append(row)
+            aliases = place_aliases.setdefault(place_key, set())
+            for handle in handles:
+                index._handles.setdefault(handle, set()).add(place_key)
+                aliases.add(handle.split(".")[0].replace("_", " "))
+            aliases.update(cls._name_aliases(str(metadata.get("nama", ""))))
+
+        for place_key, aliases in place_aliases.items():
+            own_rows = place_rows[place_key]
+            for alias in aliases:
+                words = alias.split()
+                if len(alias) < MIN_ALIAS_LENGTH or not words:
+                    continue
+                if all(word in GENERIC_NAME_WORDS for word in words):
+                    continue
+                if len(words) == 1:
+                    own = sum(1 for row in own_rows if words[0] in document_words[row])
+                    others = word_frequency.get(words[0], 0) - own
+                else:
+                    # Frasa umum ("waktu luang") juga bukan penanda nama tempat.
+                    padded = f" {alias} "
+                    rare_word = min(words, key=lambda word: word_frequency.get(word, 0))
+                    others = sum(
+                        1
+                        for row, text in enumerate(document_texts)
+                        if rare_word in document_words[row] and padded in text
+                    ) - sum(1 for row in own_rows if padded in document_texts[row])
+                if others > MAX_ALIAS_OTHER_DOCUMENTS:
+                    continue
+                index._add_alias(alias, place_key)
+        return index
+
+    @staticmethod
+    def _name_aliases(raw_name: str) -> Set[str]:
+        """
+        Variasi nama yang biasa diketik user: nama lengkap, nama sebelum
+        pemisah ("Lyon's Cafe & ..."), awalan 2+ kata ("Kopi Nako ...",
+        "Bento Coffee Seturan"), dan nama tanpa kata generik.
+        """
+        name = normalize_name(raw_name)
+        if not name:
+            return set()
+        aliases = {name}
+        core = normalize_name(_NAME_SEPARATOR.split(raw_name.lower(), maxsplit=1)[0])
+        if core:
+            aliases.add(core)
+        for candidate in list(aliases):
+            words = candidate.split()
+            aliases.update(" ".join(words[:size]) for size in range(2, len(words)))
+        for candidate in list(aliases):
+            distinctive = [word for word in candidate.split() if word not in GENERIC_NAME_WORDS]
+            if distinctive:
+                aliases.add(" ".join(distinctive))
+        return aliases
+
+    def _add_alias(self, alias: str, place_key: str) -> None:
+        self._aliases.setdefault(alias, set()).add(place_key)
+        self._max_alias_words = max(self._max_alias_words, len(alias.split()))
+        if len(alias) >= MIN_FUZZY_LENGTH:
+            for trigram in _trigrams(alias):
+                self._trigram_aliases.setdefault(trigram, set()).add(alias)
+
+    def __len__(self) -> int:
+        return len(self._places)
+
+    def match(self, question: str) -> Optional[NameMatch]:
+        """
+        Cari tempat yang disebut di pertanyaan.
+
+        Returns:
+            NameMatch berisi ID dokumen tempat tersebut, atau None jika tidak
+            ada match yang cukup yakin.
+        """
+        lowered = question.lower()
+        tokens = normalize_name(question).split()
+        if not tokens or SIMILARITY_CUES.intersection(tokens):
+            return None
+
+        places: Set[str] = set()
+        matched: List[str] = []
+        for handle in _HANDLE.findall(lowered):
+            handle = normalize_handle(handle)
+            if handle in self._handles:
+                places |= self._handles[handle]
+                matched.append(f"@{handle}")
+
+        covered = [False] * len(tokens)
+        windows = list(self._windows(tokens))
+        for start, end, phrase in windows:
+            if any(covered[start:end]) or phrase not in self._aliases:
+                continue
+            places |= self._aliases[phrase]
+            matched.append(phrase)
+            covered[start:end] = [True] * (end - start)
+
+        if places:
+            return self._result(places, matched, exact=True)
+
+        fuzzy = self._fuzzy_match(windows)
+        if fuzzy is None:
+            return None
+        alias, place_keys = fuzzy
+        return self._result(place_keys, [alias], exact=False)
+
+    def _windows(self, tokens: List[str]) -> Iterable[Tuple[int, int, str]]:
+        """Semua frasa berurutan di pertanyaan, dari yang terpanjang."""
+        for size in range(min(self._max_alias_words, len(tokens)), 0, -1):
+            for start in range(len(tokens) - size + 1):
+                yield start, start + size, " ".join(tokens[start : start + size])
+
+    def _fuzzy_match(self, windows: List[Tuple[int, int, str]]) -> Optional[Tuple[str, Set[str]]]:
+        best: Optional[Tuple[int, str]] = None
+        ambiguous = False
+        for start, end, phrase in windows:
+            if end - start > MAX_FUZZY_WORDS or len(phrase) < MIN_FUZZY_LENGTH:
+                continue
+            # Typo nama hampir tidak pernah berupa angka atau kata yang umum di korpus.
+            if not any(self._may_be_misspelled_name(word) for word in phrase.split()):
+                continue
+            phrase_trigrams = _trigrams(phrase)
+            candidates = Counter(
+                chain.from_iterable(self._trigram_aliases.get(trigram, ()) for trigram in phrase_trigrams)
+            )
+            for alias, shared in candidates.items():
+                limit = _allowed_edits(alias)
+                # Satu edit merusak paling banyak 3 trigram.
+                if shared < max(len(phrase_trigrams), len(alias)) - 3 * limit:
+                    continue
+                distance = _bounded_edit_distance(phrase, alias, limit)
+                if distance > limit:
+                    continue
+                if best is None or distance < best[0]:
+                    best, ambiguous = (distance, alias), False
+                elif distance == best[0] and self._aliases[alias] != self._aliases[best[1]]:
+                    ambiguous = True
+        if best is None or ambiguous:
+            return None
+        return best[1], self._aliases[best[1]]
+
+    def _may_be_misspelled_name(self, word: str) -> bool:
+        return (
+            len(word) >= MIN_ALIAS_LENGTH
+            and not word.isdigit()
+            and word not in GENERIC_NAME_WORDS
+            and word not in self._frequent_words
+        )
+
+    def _result(self, place_keys: Set[str], matched: List[str], exact: bool) -> NameMatch:
+        ids: Set[str] = set()
+        for place_key in place_keys:
+            ids |= self._places[place_key]
+        ordered = sorted(ids, key=lambda doc_id: (len(doc_id), doc_id))
+        return NameMatch(ids=ordered, matched=matched, exact=exact)
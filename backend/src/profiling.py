@@ -0,0 +1,340 @@
+import json
+import linecache
+import logging
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from backend.config.settings import (
+    BASE_DIR,
+    PROFILE_ALLOCATION_TOP_N,
+    PROFILE_FORMAT,
+    PROFILE_OUTPUT_DIR,
+    PROFILE_SAMPLE_INTERVAL_MS,
+    PROFILE_TRACEMALLOC_FRAMES,
+)
+from backend.src.tracing import current_trace, set_attributes
+
+logger = logging.getLogger(__name__)
+
+FORMAT_SPEEDSCOPE = "speedscope"
+FORMAT_COLLAPSED = "collapsed"
+PROFILE_FORMATS = (FORMAT_SPEEDSCOPE, FORMAT_COLLAPSED)
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+_STDLIB_DIR = Path(sysconfig.get_paths()["stdlib"])
+
+# Frame = (fungsi, file, baris awal fungsi); stack diurut dari root ke frame teratas.
+Frame = Tuple[str, str, int]
+Stack = Tuple[Frame, ...]
+
+# tracemalloc global per proses; dipakai bersama oleh profile yang berjalan bersamaan.
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+
+def resolve_format(value: Optional[str]) -> str:
+    """
+    Nama format output dari flag/header ("1", "true", "" = PROFILE_FORMAT).
+
+    Raises:
+        ValueError: Jika format tidak dikenal.
+    """
+    value = (value or "").strip().lower()
+    if value in ("", "1", "true", "yes"):
+        value = PROFILE_FORMAT
+    if value not in PROFILE_FORMATS:
+        raise ValueError(f"Format profile tidak valid: {value} (pilih {', '.join(PROFILE_FORMATS)})")
+    return value
+
+
+def _short_path(filename: str) -> str:
+    """Path file relatif ke repo atau site-packages supaya nama frame tetap pendek."""
+    for marker in ("site-packages/", "dist-packages/"):
+        index = filename.rfind(marker)
+        if index >= 0:
+            return filename[index + len(marker):]
+    for root in (BASE_DIR, _STDLIB_DIR):
+        try:
+            return str(Path(filename).relative_to(root))
+        except ValueError:
+            continue
+    return filename
+
+
+def _frame_label(frame: Frame) -> str:
+    name, filename, line = frame
+    return f"{name} ({_short_path(filename)}:{line})"
+
+
+def _frame_stack(frame) -> Stack:
+    stack: List[Frame] = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def _thread_cpu_clock(thread_id: int) -> Optional[int]:
+    """Clock CPU time thread lain (Linux/macOS); None jika platform tidak mendukung."""
+    try:
+        return time.pthread_getcpuclockid(thread_id)
+    except (AttributeError, OSError):
+        return None
+
+
+def _allocation_frame(frame: tracemalloc.Frame) -> Frame:
+    # Frame tracemalloc tidak punya nama fungsi; pakai isi baris sumbernya.
+    source = linecache.getline(frame.filename, frame.lineno).strip()
+    return (source[:80] or "<unknown>", frame.filename, frame.lineno)
+
+
+class _StackSampler(threading.Thread):
+    """
+    Profiler statistik: ambil stack satu thread tiap interval lewat `sys._current_frames()`.
+
+    Tidak memasang hook per panggilan fungsi (seperti cProfile), jadi overhead
+    kira-kira konstan per sampel dan tidak menggelembungkan fungsi kecil yang
+    sering dipanggil (normalisasi regex, konversi dokumen LangChain). Tiap
+    sampel diberi bobot CPU time thread itu sejak sampel sebelumnya, sehingga
+    menunggu respons Jina/Groq tidak terhitung sebagai CPU; waktu wall dicatat terpisah.
+    """
+
+    def __init__(self, thread_id: int, interval_seconds: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval_seconds = interval_seconds
+        # (stack, CPU ms, wall ms) sejak sampel sebelumnya, urut waktu untuk timeline speedscope.
+        self.samples: List[Tuple[Stack, float, float]] = []
+        self._clock = _thread_cpu_clock(thread_id)
+        self._stopped = threading.Event()
+
+    def _cpu_ms(self) -> Optional[float]:
+        if self._clock is None:
+            return None
+        try:
+            return time.clock_gettime(self._clock) * 1000
+        except OSError:
+            return None
+
+    def run(self) -> None:
+        last_wall, last_cpu = time.perf_counter(), self._cpu_ms()
+        while not self._stopped.wait(self.interval_seconds):
+            frame = sys._current_frames().get(self.thread_id)
+            wall, cpu = time.perf_counter(), self._cpu_ms()
+            if frame is not None:
+                wall_ms = (wall - last_wall) * 1000
+                cpu_ms = cpu - last_cpu if cpu is not None and last_cpu is not None else wall_ms
+                self.samples.append((_frame_stack(frame), cpu_ms, wall_ms))
+            last_wall, last_cpu = wall, cpu
+            del frame
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+def _start_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+        tracemalloc.reset_peak()
+
+
+def _stop_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+def _allocation_snapshot() -> tracemalloc.Snapshot:
+    # Alokasi milik tracemalloc dan profiler sendiri tidak relevan untuk request.
+    return tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        )
+    )
+
+
+class RequestProfile:
+    """
+    Hasil profiling satu request: sampel CPU dan alokasi memori yang tersisa.
+
+    Alokasi = selisih snapshot tracemalloc sebelum dan sesudah request per
+    traceback, jadi yang terlihat adalah memori yang masih hidup di akhir
+    request (cache, dokumen yang disimpan session), plus puncak memori selama
+    request. Profile yang berjalan bersamaan berbagi tracemalloc, sehingga
+    angka alokasinya bisa tercampur.
+    """
+
+    def __init__(self, name: str, output_format: str, output_dir: Path):
+        trace = current_trace()
+        # Pakai trace_id jika ada supaya file profile mudah dicocokkan dengan /admin/traces.
+        suffix = trace.trace_id if trace is not None else uuid.uuid4().hex[:16]
+        self.profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{suffix}"
+        self.name = name
+        self.output_format = output_format
+        self.output_dir = Path(output_dir)
+        self.samples: List[Tuple[Stack, float, float]] = []
+        self.allocations: List[Tuple[Stack, int]] = []
+        self.peak_bytes = 0
+        self.duration_ms = 0.0
+        self.paths: List[Path] = []
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.profile_id,
+            "format": self.output_format,
+            "duration_ms": round(self.duration_ms, 2),
+            "samples": len(self.samples),
+            "cpu_ms": round(sum(cpu_ms for _, cpu_ms, _ in self.samples), 2),
+            "allocated_bytes": sum(size for _, size in self.allocations),
+            "peak_bytes": self.peak_bytes,
+            "files": [str(path) for path in self.paths],
+        }
+
+    def write(self) -> List[Path]:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self.output_format == FORMAT_SPEEDSCOPE:
+            self.paths = [self._write_speedscope()]
+        else:
+            self.paths = [
+                self._write_collapsed("cpu", self._collapsed_time(1)),
+                self._write_collapsed("wall", self._collapsed_time(2)),
+                self._write_collapsed("alloc", Counter(dict(self.allocations))),
+            ]
+        return self.paths
+
+    def _collapsed_time(self, column: int) -> Counter:
+        # flamegraph.pl/inferno butuh bobot bulat: pakai mikrodetik per stack.
+        weights: Counter = Counter()
+        for sample in self.samples:
+            weights[sample[0]] += round(sample[column] * 1000)
+        return weights
+
+    def _write_collapsed(self, kind: str, weights: Counter) -> Path:
+        path = self.output_dir / f"{self.profile_id}.{kind}.folded"
+        lines = [
+            ";".join(_frame_label(frame) for frame in stack) + f" {weight}"
+            for stack, weight in weights.most_common()
+            if stack and weight > 0
+        ]
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        return path
+
+    def _write_speedscope(self) -> Path:
+        frames: List[Dict[str, Any]] = []
+        frame_index: Dict[Frame, int] = {}
+
+        def indices(stack: Stack) -> List[int]:
+            result = []
+            for frame in stack:
+                index = frame_index.get(frame)
+                if index is None:
+                    index = frame_index[frame] = len(frames)
+                    name, filename, line = frame
+                    frames.append({"name": name, "file": _short_path(filename), "line": line})
+                result.append(index)
+            return result
+
+        def sampled(name: str, unit: str, samples: List[Tuple[Stack, float]]) -> Dict[str, Any]:
+            weights = [round(weight, 3) for _, weight in samples]
+            return {
+                "type": "sampled",
+                "name": name,
+                "unit": unit,
+                "startValue": 0,
+                "endValue": round(sum(weights), 3),
+                "samples": [indices(stack) for stack, _ in samples],
+                "weights": weights,
+            }
+
+        payload = {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": self.profile_id,
+            "exporter": "rag-coffeeshop profiling",
+            "activeProfileIndex": 0,
+            "profiles": [
+                sampled(f"{self.name} cpu", "milliseconds", [(stack, cpu_ms) for stack, cpu_ms, _ in self.samples]),
+                sampled(f"{self.name} wall", "milliseconds", [(stack, wall_ms) for stack, _, wall_ms in self.samples]),
+                sampled(f"{self.name} alloc", "bytes", [(stack, float(size)) for stack, size in self.allocations]),
+            ],
+            "shared": {"frames": frames},
+        }
+        path = self.output_dir / f"{self.profile_id}.speedscope.json"
+        path.write_text(json.dumps(payload), encoding="utf-8")
+        return path
+
+
+@contextmanager
+def profiled(
+    name: str,
+    output_format: Optional[str] = None,
+    output_dir: Optional[Path] = None,
+    interval_ms: Optional[float] = None,
+) -> Iterator[RequestProfile]:
+    """
+    Profile blok kode di thread pemanggil: sampel CPU/wall statistik + alokasi tracemalloc.
+
+    File ditulis ke `output_dir` (default PROFILE_OUTPUT_DIR) saat blok selesai,
+    juga jika blok melempar exception. Pekerjaan di thread lain (pool search
+    shard, generation paralel) terlihat sebagai waktu tunggu di thread pemanggil.
+
+    Args:
+        name: Nama profile (mis. "ask"); ikut di nama file.
+        output_format: "speedscope" (satu file JSON berisi profile cpu, wall, dan
+            alloc) atau "collapsed" (`.cpu.folded`, `.wall.folded`, `.alloc.folded`);
+            None = PROFILE_FORMAT.
+        output_dir: Direktori output.
+        interval_ms: Interval sampling CPU; None = PROFILE_SAMPLE_INTERVAL_MS.
+
+    Raises:
+        ValueError: Jika format tidak dikenal.
+    """
+    profile = RequestProfile(name, resolve_format(output_format), output_dir or PROFILE_OUTPUT_DIR)
+    interval = (interval_ms if interval_ms is not None else PROFILE_SAMPLE_INTERVAL_MS) / 1000
+    _start_tracemalloc()
+    try:
+        before = _allocation_snapshot()
+        sampler = _StackSampler(threading.get_ident(), max(interval, 0.0005))
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            yield profile
+        finally:
+            sampler.stop()
+            profile.duration_ms = (time.perf_counter() - started) * 1000
+            profile.samples = sampler.samples
+            profile.peak_bytes = tracemalloc.get_traced_memory()[1]
+            after = _allocation_snapshot()
+            diffs = after.compare_to(before, "traceback")
+            profile.allocations = [
+                (tuple(_allocation_frame(frame) for frame in diff.traceback), diff.size_diff)
+                for diff in diffs[:PROFILE_ALLOCATION_TOP_N]
+                if diff.size_diff > 0
+            ]
+            try:
+                profile.write()
+                set_attributes(profile_id=profile.profile_id)
+                logger.info("Profile %s ditulis ke %s", profile.profile_id, ", ".join(map(str, profile.paths)))
+            except OSError as exc:
+                logger.warning("Gagal menulis profile %s: %s", profile.profile_id, exc)
+    finally:
+        _stop_tracemalloc()
@@ -0,0 +1,284 @@
+import re
+from dataclasses import dataclass
+from typing import Callable, FrozenSet, List, Optional
+
+UNSAFE_PROMPT_PATTERNS = [
+    r"\bignore\b.{0,40}\b(instruction|system|aturan|perintah)\b",
+    r"\b(jailbreak|prompt injection|dan\b mode)\b",
+    r"\b(system prompt|developer message|hidden prompt)\b",
+    r"\b(reveal|bocorkan|leak)\b.{0,40}\b(prompt|token|secret|api key|kunci)\b",
+]
+
+COFFEE_DOMAIN_KEYWORDS = [
+    "kopi",
+    "coffee",
+    "coffeeshop",
+    "cafe",
+    "ngopi",
+    "wfc",
+    "nongkrong",
+    "espresso",
+    "latte",
+    "cappuccino",
+    "manual brew",
+    "v60",
+    "yogyakarta",
+    "jogja",
+    "sleman",
+    "bantul",
+    "kulon progo",
+    "gunungkidul",
+]
+
+# Slang dan variasi penulisan yang umum di pertanyaan user.
+COFFEE_SLANG_KEYWORDS = [
+    "kafe",
+    "ngafe",
+    "nyafe",
+    "kedai",
+    "warkop",
+    "kopsus",
+    "barista",
+    "roastery",
+    "americano",
+    "mocha",
+    "piccolo",
+    "cold brew",
+    "jogjakarta",
+    "yogya",
+    "djokja",
+    "nongki",
+    "nongky",
+    "nugas",
+    "ngerjain tugas",
+    "spot foto",
+    "hangout",
+]
+
+# Kata yang tidak cukup untuk dianggap domain, tapi menandakan pertanyaan
+# masih mungkin soal tempat/nongkrong sehingga tetap layak di-retrieve.
+DOMAIN_ADJACENT_KEYWORDS = [
+    "tempat",
+    "rekomendasi",
+    "rekom",
+    "buka",
+    "tutup",
+    "jam",
+    "24",
+    "menu",
+    "harga",
+    "murah",
+    "suasana",
+    "tenang",
+    "nyaman",
+    "sepi",
+    "ramai",
+    "wifi",
+    "colokan",
+    "parkir",
+    "meeting",
+    "kerja",
+    "wfh",
+    "belajar",
+    "estetik",
+    "aesthetic",
+    "outdoor",
+    "indoor",
+    "smoking",
+    "musik",
+    "dessert",
+    "kue",
+    "cake",
+    "roti",
+    "pastry",
+    "gelato",
+    "matcha",
+    "teh",
+    "tea",
+    "susu",
+    "brunch",
+    "sarapan",
+    "makan",
+    "minum",
+    "area",
+    "dekat",
+    "daerah",
+    "lokasi",
+    "alamat",
+    "ugm",
+    "uny",
+    "malioboro",
+    "kaliurang",
+    "seturan",
+    "enak",
+    "hits",
+    "view",
+    "instagram",
+    "space",
+    "lounge",
+    "resto",
+    "kota",
+]
+
+OFF_TOPIC_KEYWORDS = [
+    "politik",
+    "presiden",
+    "pemilu",
+    "saham",
+    "crypto",
+    "bitcoin",
+    "cuaca",
+    "coding",
+    "python",
+    "javascript",
+    "matematika",
+    "terjemahkan",
+    "translate",
+    "puisi",
+    "lirik",
+    "skripsi",
+    "resep masakan",
+    "zodiak",
+    "judi",
+    "togel",
+]
+
+_REPEATED_CHAR = re.compile(r"(.)\1+")
+_REDUPLICATION_DIGIT = re.compile(r"\b([a-z]{3,})2(?:an|nya)?\b")
+_REDUPLICATION_DASH = re.compile(r"\b([a-z]{3,})-\1\b")
+_TOKEN = re.compile(r"[a-z0-9@]+")
+_VOWEL = re.compile(r"[aiueo]")
+# Deretan 5+ konsonan hampir tidak pernah muncul di kata Indonesia/Inggris ("asdfgh", "qwrty").
+_KEYBOARD_MASH = re.compile(r"[b-df-hj-np-tv-z]{5,}")
+
+
+def _collapse(text: str) -> str:
+    """Lowercase, buang reduplikasi ("ngopi2", "kopi-kopi"), dan gabungkan huruf berulang."""
+    text = text.lower()
+    text = _REDUPLICATION_DASH.sub(r"\1", text)
+    text = _REDUPLICATION_DIGIT.sub(r"\1", text)
+    return _REPEATED_CHAR.sub(r"\1", text)
+
+
+def _compile_keywords(keywords: List[str], whole_word: bool) -> "re.Pattern[str]":
+    # Keyword panjang didahulukan supaya alternation tidak berhenti di prefix.
+    variants = sorted({_collapse(keyword) for keyword in keywords}, key=len, reverse=True)
+    body = "|".join(re.escape(variant) for variant in variants)
+    if whole_word:
+        return re.compile(rf"\b(?:{body})\b")
+    return re.compile(rf"\b(?:{body})")
+
+
+# Semua pola dikompilasi sekali saat import, bukan per request.
+_INJECTION_RE = re.compile("|".join(f"(?:{pattern})" for pattern in UNSAFE_PROMPT_PATTERNS))
+# Domain keyword cukup match di awal kata (mis. "kopi" di "kopikenangan", "#coffeeshopjogja").
+_DOMAIN_RE = _compile_keywords(COFFEE_DOMAIN_KEYWORDS + COFFEE_SLANG_KEYWORDS, whole_word=False)
+_ADJACENT_RE = _compile_keywords(DOMAIN_ADJACENT_KEYWORDS, whole_word=True)
+_OFF_TOPIC_RE = _compile_keywords(OFF_TOPIC_KEYWORDS, whole_word=True)
+_FUZZY_DOMAIN_WORDS: FrozenSet[str] = frozenset(
+    _collapse(keyword)
+    for keyword in COFFEE_DOMAIN_KEYWORDS + COFFEE_SLANG_KEYWORDS
+    if " " not in keyword and len(_collapse(keyword)) >= 4
+)
+
+
+def _within_one_edit(left: str, right: str) -> bool:
+    """Cek jarak Levenshtein <= 1 tanpa membangun tabel DP penuh."""
+    if abs(len(left) - len(right)) > 1:
+        return False
+    if len(left) > len(right):
+        left, right = right, left
+    i = j = 0
+    edited = False
+    while i < len(left) and j < len(right):
+        if left[i] == right[j]:
+            i += 1
+            j += 1
+            continue
+        if edited:
+            return False
+        edited = True
+        if len(left) == len(right):
+            i += 1
+        j += 1
+    return True
+
+
+@dataclass
+class QueryClassification:
+    verdict: str  # "injection" | "in_domain" | "uncertain" | "out_of_scope"
+    domain_hits: int
+    adjacent_hits: int
+    off_topic_hits: int
+
+    @property
+    def is_injection(self) -> bool:
+        return self.verdict == "injection"
+
+    @property
+    def is_in_domain(self) -> bool:
+        return self.verdict == "in_domain"
+
+    @property
+    def is_out_of_scope(self) -> bool:
+        return self.verdict == "out_of_scope"
+
+
+def looks_like_prompt_injection(question: str) -> bool:
+    return _INJECTION_RE.search(question.lower()) is not None
+
+
+def classify_query(
+    question: str,
+    is_known_place: Optional[Callable[[str], bool]] = None,
+) -> QueryClassification:
+    """
+    Klasifikasi lokal murah sebelum ada panggilan embedding/vector search/LLM.
+
+    Hanya pertanyaan yang "pasti" di luar domain yang diberi verdict
+    `out_of_scope`; sisanya (`uncertain`) tetap lewat retrieval seperti biasa.
+    Pertanyaan dengan @handle, kata adjacent, atau nama tempat yang dikenal
+    tidak pernah `out_of_scope`.
+
+    Args:
+        question: Pertanyaan user.
+        is_known_place: Cek nama tempat di korpus (mis. `Retriever.names_place`);
+            hanya dipanggil jika tidak ada keyword domain.
+    """
+    if looks_like_prompt_injection(question):
+        return QueryClassification("injection", 0, 0, 0)
+
+    normalized = _collapse(question)
+    domain_hits = len(_DOMAIN_RE.findall(normalized))
+    tokens = _TOKEN.findall(normalized)
+
+    if not domain_hits:
+        # Toleransi typo: "cofe", "nongkrng", "espreso".
+        domain_hits = sum(
+            1
+            for token in tokens
+            if len(token) >= 4
+            and any(_within_one_edit(token, keyword) for keyword in _FUZZY_DOMAIN_WORDS)
+        )
+    adjacent_hits = len(_ADJACENT_RE.findall(normalized))
+    off_topic_hits = len(_OFF_TOPIC_RE.findall(normalized))
+    if any(token.startswith("@") for token in tokens):
+        # Handle Instagram hampir selalu merujuk ke tempat.
+        adjacent_hits += 1
+
+    if domain_hits:
+        verdict = "in_domain"
+    elif is_known_place is not None and is_known_place(question):
+        # "ada slot parkir motor ga di lyons?": nama tempat di korpus.
+        verdict = "in_domain"
+    elif adjacent_hits:
+        verdict = "uncertain"
+    else:
+        words = [
+            token for token in tokens if _VOWEL.search(token) and not _KEYBOARD_MASH.search(token)
+        ]
+        # Hanya sinyal eksplisit: keyword off-topic atau teks acak (tanpa kata).
+        definitely_out = off_topic_hits > 0 or not words
+        verdict = "out_of_scope" if definitely_out else "uncertain"
+
+    return QueryClassification(verdict, domain_hits, adjacent_hits, off_topic_hits)
@@ -1,20 +1,44 @@
 import logging
-import re
-from typing import Any, Dict, List
-
-from backend.config.settings import SCORE_THRESHOLD
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import copy_context
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from backend.config.settings import (
+    BATCH_MAX_WORKERS,
+    EMBEDDING_BATCH_SIZE,
+    EXTRACTIVE_ANSWERS_ENABLED,
+    INDEX_DRAIN_TIMEOUT_SECONDS,
+    LEXICAL_FIRST_ENABLED,
+    NAME_LOOKUP_ENABLED,
+    PRE_CLASSIFIER_ENABLED,
+    RETRIEVAL_DIVERSITY,
+    SCORE_THRESHOLD,
+    TOP_K_RESULTS,
+)
+from backend.src.document_store import ScoredDocument
+from backend.src.extractive_answer import LISTING_INTENT, build_extractive_answer, detect_answer_intent
 from backend.src.generator import Generator
+from backend.src.index_versions import current_index_dir, current_index_version
+from backend.src.markdown_normalizer import normalize_markdown
+from backend.src.profiling import profiled
+from backend.src.query_classifier import (  # noqa: F401 - keyword lists re-exported
+    COFFEE_DOMAIN_KEYWORDS,
+    UNSAFE_PROMPT_PATTERNS,
+    QueryClassification,
+    classify_query,
+    looks_like_prompt_injection,
+)
+from backend.src.result_cache import CachedResult, ResultCache
 from backend.src.retriever import Retriever
+from backend.src.tracing import set_attributes, span
+from backend.src.upstreams import GROQ_UPSTREAM, JINA_UPSTREAM, upstreams
+from backend.src.session_store import Session, SessionStore, SessionTurn, follow_up_query, is_follow_up
 
 logger = logging.getLogger(__name__)
 
-UNSAFE_PROMPT_PATTERNS = [
-    r"\bignore\b.{0,40}\b(instruction|system|aturan|perintah)\b",
-    r"\b(jailbreak|prompt injection|dan\b mode)\b",
-    r"\b(system prompt|developer message|hidden prompt)\b",
-    r"\b(reveal|bocorkan|leak)\b.{0,40}\b(prompt|token|secret|api key|kunci)\b",
-]
-
 OUT_OF_SCOPE_REPLY = (
     "Maaf, saya hanya bisa membantu pertanyaan seputar rekomendasi coffee shop "
     "dan informasi terkait di wilayah Yogyakarta berdasarkan data yang tersedia."
@@ -24,26 +48,8 @@ NEED_MORE_DETAIL_REPLY = (
     "Coba tambahkan area (mis. Sleman/Kota Jogja), kebutuhan (WFC/meeting/nongkrong), "
     "atau preferensi suasana supaya rekomendasinya lebih pas."
 )
-COFFEE_DOMAIN_KEYWORDS = [
-    "kopi",
-    "coffee",
-    "coffeeshop",
-    "cafe",
-    "ngopi",
-    "wfc",
-    "nongkrong",
-    "espresso",
-    "latte",
-    "cappuccino",
-    "manual brew",
-    "v60",
-    "yogyakarta",
-    "jogja",
-    "sleman",
-    "bantul",
-    "kulon progo",
-    "gunungkidul",
-]
+# "auto": extractive answer for listing/lookup questions, "extractive": always, "generate": never.
+ANSWER_MODES = ("auto", "extractive", "generate")
 GENERIC_FOLLOW_UP_SUGGESTIONS = [
     "Rekomendasikan coffee shop untuk WFC di Sleman",
     "Rekomendasikan coffee shop yang tenang untuk meeting di Kota Jogja",
@@ -51,66 +57,805 @@ GENERIC_FOLLOW_UP_SUGGESTIONS = [
 ]
 
 
+def _elapsed_ms(started_at: float) -> float:
+    return round((time.perf_counter() - started_at) * 1000, 2)
+
+
 class RAGServiceError(Exception):
     """Base exception for RAG service errors."""
 
 
+class _RetrieverLease:
+    """A retriever plus the number of requests currently using it."""
+
+    def __init__(self, retriever: Retriever) -> None:
+        self.retriever = retriever
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self.condition:
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self.condition:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self.condition.notify_all()
+
+    def wait_drained(self, timeout: float) -> bool:
+        with self.condition:
+            return self.condition.wait_for(lambda: self.in_flight == 0, timeout=timeout)
+
+
 class RAGService:
     """Reusable service layer for RAG query orchestration."""
 
     def __init__(self) -> None:
-        self.retriever = Retriever()
+        self._lease_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._lease = _RetrieverLease(Retriever())
         self.generator = Generator()
+        self._last_reload: Dict[str, Any] = {}
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_stop = threading.Event()
+        self.sessions = SessionStore()
+        self.results = ResultCache()
+
+    @property
+    def retriever(self) -> Retriever:
+        """Retriever of the currently active index version."""
+        return self._lease.retriever
+
+    @contextmanager
+    def _use_retriever(self) -> Iterator[Retriever]:
+        """
+        Pin the active retriever for the duration of one request.
+
+        A hot reload swaps in a new retriever for later requests, while
+        requests that already hold the old one finish on it.
+        """
+        with self._lease_lock:
+            lease = self._lease
+            lease.acquire()
+        try:
+            yield lease.retriever
+        finally:
+            lease.release()
+
+    def reload_index(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Switch to the published index version without dropping requests.
+
+        The new retriever is opened (and its vectors pinned) before the swap,
+        so requests never wait on loading. The old retriever is closed once
+        its in-flight requests drain, or left to the garbage collector after
+        ``INDEX_DRAIN_TIMEOUT_SECONDS``.
+
+        Args:
+            force: Reopen the index even when the version did not change.
+
+        Returns:
+            Reload status with the previous and active version.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return {"status": "in_progress", "version": self.retriever.index_version}
+        try:
+            target_dir = current_index_dir()
+            old_lease = self._lease
+            if not force and target_dir == old_lease.retriever.persist_directory:
+                return {"status": "unchanged", "version": old_lease.retriever.index_version}
+
+            started_at = time.perf_counter()
+            new_lease = _RetrieverLease(Retriever(target_dir))
+            with self._lease_lock:
+                old_lease = self._lease
+                self._lease = new_lease
+
+            drained = old_lease.wait_drained(INDEX_DRAIN_TIMEOUT_SECONDS)
+            if drained:
+                old_lease.retriever.close()
+            else:
+                logger.warning(
+                    "Index %s still has %s in-flight requests after %ss, leaving it open",
+                    old_lease.retriever.index_version,
+                    old_lease.in_flight,
+                    INDEX_DRAIN_TIMEOUT_SECONDS,
+                )
+
+            self._last_reload = {
+                "status": "reloaded",
+                "previous_version": old_lease.retriever.index_version,
+                "version": new_lease.retriever.index_version,
+                "drained": drained,
+                "duration_ms": _elapsed_ms(started_at),
+                "finished_at": time.time(),
+            }
+            logger.info(
+                "Index reloaded: %s -> %s",
+                self._last_reload["previous_version"],
+                self._last_reload["version"],
+            )
+            return dict(self._last_reload)
+        finally:
+            self._reload_lock.release()
+
+    def start_index_watcher(self, interval_seconds: float) -> None:
+        """Poll the published index pointer and hot reload when it changes."""
+        if interval_seconds <= 0 or self._watcher is not None:
+            return
+
+        def watch() -> None:
+            while not self._watcher_stop.wait(interval_seconds):
+                try:
+                    if current_index_dir() != self.retriever.persist_directory:
+                        self.reload_index()
+                except Exception as exc:  # noqa: BLE001
+                    logger.exception("Index watcher reload failed: %s", exc)
+
+        self._watcher_stop.clear()
+        self._watcher = threading.Thread(target=watch, name="index-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_index_watcher(self) -> None:
+        if self._watcher is None:
+            return
+        self._watcher_stop.set()
+        self._watcher.join(timeout=5)
+        self._watcher = None
+
+    def index_status(self) -> Dict[str, Any]:
+        """Active index version, in-flight requests and the last reload."""
+        lease = self._lease
+        return {
+            "version": lease.retriever.index_version,
+            "published_version": current_index_version(),
+            "in_flight": lease.in_flight,
+            "reloading": self._reload_lock.locked(),
+            "embedding": lease.retriever.embedding_status(),
+            "shards": lease.retriever.shard_status(),
+            "last_reload": dict(self._last_reload) or None,
+        }
+
+    def warm_up_connections(self) -> Dict[str, int]:
+        """
+        Open pooled Jina and Groq connections before the first user request.
 
-    def ask(self, question: str) -> Dict[str, Any]:
+        Runs at startup so the first burst of requests reuses warm TCP/TLS
+        connections instead of paying the handshakes inside their latency.
+        """
+        warmed: Dict[str, int] = {}
+        embedding_model = self.retriever.embedding_model
+        if embedding_model is not None:
+            warmed[JINA_UPSTREAM] = upstreams.warm_up(JINA_UPSTREAM, embedding_model.api_url)
+        warmed[GROQ_UPSTREAM] = upstreams.warm_up(GROQ_UPSTREAM, str(self.generator.client.base_url))
+        return warmed
+
+    def ask(
+        self,
+        question: str,
+        timings: Optional[Dict[str, float]] = None,
+        session_id: Optional[str] = None,
+        answer_mode: str = "auto",
+        filters: Optional[Dict[str, List[str]]] = None,
+        profile: Optional[str] = None,
+    ) -> Dict[str, Any]:
         """
         Process a user question with retrieval and generation.
 
         Args:
             question: User query.
+            timings: Optional dict that receives per-stage latency in ms
+                (``embed_ms``, ``search_ms``, ``generate_ms``, ``total_ms``).
+            session_id: Optional conversation id. Follow-up questions in a
+                session re-rank the previous turn's candidates instead of
+                embedding and searching again, and the generator receives a
+                summary of the earlier turns.
+            answer_mode: ``"auto"`` builds listing/lookup answers straight
+                from document metadata without Groq, ``"extractive"`` always
+                does, ``"generate"`` always calls the LLM.
+            filters: Optional facet filters (``{"kota": [...], "kategori": [...],
+                "jam": [...]}``). Only places in the facet bitset can be
+                retrieved; the dense search then runs exactly over them.
+            profile: Optional output format (``"speedscope"``/``"collapsed"``).
+                Captures a sampled CPU profile and tracemalloc allocations for
+                this call under ``PROFILE_OUTPUT_DIR``; the response then
+                carries a ``profile`` summary with the written files.
 
         Returns:
-            A response dictionary with answer and sources.
+            A response dictionary with answer and sources. Answers from the
+            dense search also carry a ``result_token`` for ``more`` while
+            unshown candidates remain.
+
+        Raises:
+            ValueError: On an empty question, unknown answer mode, facet or
+                profile format.
         """
+        if profile is None:
+            return self._ask(question, timings, session_id, answer_mode, filters)
+        with profiled("ask", profile) as run:
+            result = self._ask(question, timings, session_id, answer_mode, filters)
+        return {**result, "profile": run.summary()}
+
+    def _ask(
+        self,
+        question: str,
+        timings: Optional[Dict[str, float]],
+        session_id: Optional[str],
+        answer_mode: str,
+        filters: Optional[Dict[str, List[str]]],
+    ) -> Dict[str, Any]:
+        started_at = time.perf_counter()
+        timings = timings if timings is not None else {}
+
         question = question.strip()
         if not question:
             raise ValueError("Question tidak boleh kosong.")
+        if answer_mode not in ANSWER_MODES:
+            raise ValueError("answer_mode tidak valid.")
+
+        session = self.sessions.get(session_id) if session_id else None
+        follow_up, retrieval_query = self._retrieval_query(question, session)
+        with span("classify") as stage:
+            classification = self._classify(retrieval_query)
+            early_reply = self._early_reply(classification)
+        stage["verdict"] = classification.verdict
+        if early_reply is not None:
+            set_attributes(route="early_reply", fallback_type=early_reply["fallback_type"])
+            timings["total_ms"] = _elapsed_ms(started_at)
+            return early_reply
+
+        with self._use_retriever() as retriever:
+            mask = retriever.facet_mask(filters)
+            if mask is not None:
+                set_attributes(filtered=True)
+            history = session.summary() if session is not None else None
+            if session is not None and session.index_version != retriever.index_version:
+                # Candidates from an index that has since been reloaded are stale.
+                session.candidates = []
+
+            route = "name_lookup"
+            documents = retriever.filter_documents(self._lookup_named_places(retriever, question, timings), mask)
+            kept_candidates = documents
+            if documents:
+                # Naming a place starts a new topic.
+                retrieval_query = question
+            elif follow_up:
+                route = "follow_up"
+                documents = retriever.filter_documents(
+                    self._follow_up_documents(retriever, question, session, timings), mask
+                )
+                if documents:
+                    kept_candidates = session.candidates
+                    retrieval_query = session.retrieval_query
+            if not documents:
+                route = "lexical_first"
+                documents = retriever.filter_documents(
+                    self._lexical_first_documents(retriever, retrieval_query, timings), mask
+                )
+                kept_candidates = documents
+
+            if documents:
+                # Named place, follow-up or strong keyword match: no embedding needed.
+                set_attributes(route=route, index_version=retriever.index_version)
+                if route == "follow_up" and answer_mode == "auto":
+                    # "Which of those is closest to UGM?" needs reasoning over the earlier list.
+                    answer_mode = "generate"
+                result = self._answer_from_documents(
+                    retriever, question, documents, timings, history, answer_mode
+                )
+            else:
+                set_attributes(route="dense", index_version=retriever.index_version)
+                stage_started = time.perf_counter()
+                with span("embed"):
+                    query_embedding = retriever.embed_queries([retrieval_query])[0]
+                timings["embed_ms"] = _elapsed_ms(stage_started)
+
+                stage_started = time.perf_counter()
+                fetch_k = TOP_K_RESULTS * Retriever.THRESHOLD_FETCH_FACTOR
+                with span("search", fetch_k=fetch_k) as stage:
+                    candidates = retriever.search_candidates_batch(
+                        [query_embedding],
+                        fetch_k,
+                        queries=[retrieval_query],
+                        mask=mask,
+                    )[0]
+                    stage["candidates"] = len(candidates)
+                timings["search_ms"] = _elapsed_ms(stage_started)
+
+                documents = self._select_from_candidates(
+                    retriever, question, classification, query_embedding, candidates
+                )
+                if documents:
+                    result = self._answer_from_documents(
+                        retriever, question, documents, timings, history, answer_mode
+                    )
+                    result["result_token"] = self._cache_remaining(
+                        question, candidates, documents, result, retriever.index_version
+                    )
+                else:
+                    result = self._no_documents_reply(classification)
+                kept_candidates = self._session_candidates(question, candidates)
+
+            if session_id:
+                self._remember_turn(
+                    session_id,
+                    session,
+                    question,
+                    result,
+                    kept_candidates or [],
+                    retrieval_query,
+                    retriever.index_version,
+                )
+        set_attributes(fallback_type=result["fallback_type"], sources=len(result["sources"]))
+        timings["total_ms"] = _elapsed_ms(started_at)
+        return result
+
+    def more(
+        self,
+        result_token: str,
+        timings: Optional[Dict[str, float]] = None,
+        answer_mode: str = "auto",
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Answer from the next slice of an earlier answer's ranked candidates.
+
+        ``result_token`` comes from an ``ask`` answer that went through the
+        dense search. The slice is the next ``TOP_K_RESULTS`` candidates of
+        that search (including the ones the threshold rejected) that were
+        not shown yet: no embedding and no search, only generation.
+
+        Returns:
+            A response like ``ask``, with a new ``result_token`` while
+            candidates remain, or None if the token is unknown, expired,
+            exhausted or from an index version that has since been reloaded.
+
+        Raises:
+            ValueError: On an unknown answer mode.
+        """
+        started_at = time.perf_counter()
+        timings = timings if timings is not None else {}
+        if answer_mode not in ANSWER_MODES:
+            raise ValueError("answer_mode tidak valid.")
+
+        with self._use_retriever() as retriever:
+            taken = self.results.take(result_token, TOP_K_RESULTS)
+            if taken is None:
+                return None
+            cached, documents = taken
+            if cached.index_version != retriever.index_version:
+                # Candidates from an index that has since been reloaded are stale.
+                self.results.discard(result_token)
+                return None
+            set_attributes(route="more", index_version=retriever.index_version)
+            # The earlier answer as a one-turn history, so the generator presents alternatives.
+            earlier = Session()
+            earlier.turns.append(SessionTurn(question=cached.question, sources=list(cached.shown)))
+            result = self._answer_from_documents(
+                retriever, cached.question, documents, timings, earlier.summary(), answer_mode
+            )
+        cached.shown.extend(source["nama"] for source in result["sources"])
+        result["result_token"] = result_token if cached.remaining else None
+        set_attributes(fallback_type=result["fallback_type"], sources=len(result["sources"]))
+        timings["total_ms"] = _elapsed_ms(started_at)
+        return result
+
+    def browse(
+        self,
+        filters: Optional[Dict[str, List[str]]] = None,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> Dict[str, Any]:
+        """Places matching facet filters, with per-value counts, from the in-memory facet index."""
+        if offset < 0 or limit < 1:
+            raise ValueError("offset/limit tidak valid.")
+        with self._use_retriever() as retriever:
+            result = retriever.browse(filters, offset=offset, limit=limit)
+            result["index_version"] = retriever.index_version
+        return result
+
+    def answers_locally(self, question: str, session_id: Optional[str] = None) -> bool:
+        """
+        Whether ``ask`` would reply without any Jina, Chroma or Groq work.
+
+        Used by admission control to let cheap requests skip the queue.
+        """
+        session = self.sessions.get(session_id) if session_id else None
+        _, retrieval_query = self._retrieval_query(question.strip(), session)
+        return self._early_reply(self._classify(retrieval_query)) is not None
+
+    def _retrieval_query(self, question: str, session: Optional[Session]) -> Tuple[bool, str]:
+        """(is follow-up, query used for classification and retrieval)."""
+        follow_up = session is not None and is_follow_up(question)
+        if follow_up:
+            with self._use_retriever() as retriever:
+                # "Mana yang buka 24 jam di Bantul?" after a Sleman turn is a new search.
+                follow_up = not retriever.starts_new_topic(question, session.retrieval_query)
+        # A follow-up like "yang paling dekat UGM?" inherits the domain of the conversation.
+        retrieval_query = follow_up_query(session.retrieval_query, question) if follow_up else question
+        return follow_up, retrieval_query
+
+    def ask_many(
+        self,
+        questions: List[str],
+        max_workers: int = BATCH_MAX_WORKERS,
+        answer_mode: str = "auto",
+    ) -> List[Dict[str, Any]]:
+        """
+        Process many questions with shared embedding and search calls.
+
+        Duplicate questions are answered once. Questions that name a place
+        (or strongly match keywords, see ``LEXICAL_FIRST_ENABLED``) are
+        answered without embedding. Embeddings are requested in
+        ``EMBEDDING_BATCH_SIZE`` chunks, vector search runs as one batched
+        Chroma query, and generation fans out over a bounded thread pool.
+
+        Args:
+            questions: User queries.
+            max_workers: Maximum number of concurrent generation calls.
+            answer_mode: Same as in ``ask``, applied to every question.
+
+        Returns:
+            One item per input question, in input order, with ``question``,
+            ``result`` (same shape as ``ask``), ``error`` and ``timings``.
+        """
+        if answer_mode not in ANSWER_MODES:
+            raise ValueError("answer_mode tidak valid.")
+        positions: Dict[str, int] = {}
+        stripped_questions = [question.strip() for question in questions]
+        for question in stripped_questions:
+            positions.setdefault(question, len(positions))
+        unique_questions = list(positions)
+        outcomes: List[Dict[str, Any]] = [
+            {"question": question, "result": None, "error": None, "timings": {}}
+            for question in unique_questions
+        ]
+
+        pending: List[Tuple[int, QueryClassification]] = []
+        for index, question in enumerate(unique_questions):
+            if not question:
+                outcomes[index]["error"] = "Question tidak boleh kosong."
+                continue
+            classification = self._classify(question)
+            early_reply = self._early_reply(classification)
+            if early_reply is not None:
+                outcomes[index]["result"] = early_reply
+                continue
+            pending.append((index, classification))
+
+        # One retriever for the whole batch, even if the index is reloaded meanwhile.
+        with self._use_retriever() as retriever:
+            direct_documents: Dict[int, List[ScoredDocument]] = {}
+            for index, _ in pending:
+                documents = self._direct_documents(
+                    retriever, unique_questions[index], outcomes[index]["timings"]
+                )
+                if documents:
+                    direct_documents[index] = documents
+            pending = [item for item in pending if item[0] not in direct_documents]
+
+            embeddings: Dict[int, List[float]] = {}
+            for start in range(0, len(pending), EMBEDDING_BATCH_SIZE):
+                chunk = pending[start : start + EMBEDDING_BATCH_SIZE]
+                stage_started = time.perf_counter()
+                try:
+                    with span("embed", questions=len(chunk)):
+                        vectors = retriever.embed_queries([unique_questions[index] for index, _ in chunk])
+                except Exception as exc:  # noqa: BLE001
+                    logger.exception("Batch embedding failed for %s questions: %s", len(chunk), exc)
+                    for index, _ in chunk:
+                        outcomes[index]["error"] = "Gagal mengambil embedding pertanyaan."
+                    continue
+                elapsed = _elapsed_ms(stage_started)
+                for (index, _), vector in zip(chunk, vectors):
+                    embeddings[index] = vector
+                    outcomes[index]["timings"]["embed_ms"] = elapsed
+
+            ready = [(index, classification) for index, classification in pending if index in embeddings]
+            candidates_by_index: Dict[int, List[ScoredDocument]] = {}
+            if ready:
+                stage_started = time.perf_counter()
+                try:
+                    with span("search", questions=len(ready)):
+                        batch = retriever.search_candidates_batch(
+                            [embeddings[index] for index, _ in ready],
+                            TOP_K_RESULTS * Retriever.THRESHOLD_FETCH_FACTOR,
+                            queries=[unique_questions[index] for index, _ in ready],
+                        )
+                except Exception as exc:  # noqa: BLE001
+                    logger.exception("Batch vector search failed: %s", exc)
+                    for index, _ in ready:
+                        outcomes[index]["error"] = "Gagal melakukan pencarian dokumen."
+                    ready = []
+                else:
+                    elapsed = _elapsed_ms(stage_started)
+                    for (index, _), candidates in zip(ready, batch):
+                        candidates_by_index[index] = candidates
+                        outcomes[index]["timings"]["search_ms"] = elapsed
+
+            def answer(index: int, classification: Optional[QueryClassification]) -> None:
+                outcome = outcomes[index]
+                try:
+                    if index in direct_documents:
+                        outcome["result"] = self._answer_from_documents(
+                            retriever,
+                            unique_questions[index],
+                            direct_documents[index],
+                            outcome["timings"],
+                            answer_mode=answer_mode,
+                        )
+                        return
+                    outcome["result"] = self._answer_from_candidates(
+                        retriever,
+                        unique_questions[index],
+                        classification,
+                        embeddings[index],
+                        candidates_by_index[index],
+                        outcome["timings"],
+                        answer_mode=answer_mode,
+                    )
+                except Exception as exc:  # noqa: BLE001
+                    logger.exception("Batch item failed: %s", exc)
+                    outcome["error"] = "Terjadi kesalahan saat memproses pertanyaan."
+
+            tasks = [(index, None) for index in direct_documents] + ready
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                # Copy the caller's context so generation spans land in the active trace.
+                futures = [executor.submit(copy_context().run, answer, *item) for item in tasks]
+                for future in futures:
+                    future.result()
+
+        for outcome in outcomes:
+            outcome["timings"]["total_ms"] = round(sum(outcome["timings"].values()), 2)
+
+        return [
+            {**outcomes[positions[question]], "timings": dict(outcomes[positions[question]]["timings"])}
+            for question in stripped_questions
+        ]
+
+    def _classify(self, question: str) -> QueryClassification:
+        """Local pre-classification; a place the index knows is never out of scope."""
+        with self._use_retriever() as retriever:
+            return classify_query(question, is_known_place=retriever.names_place)
 
-        if self._looks_like_prompt_injection(question):
+    @staticmethod
+    def _early_reply(classification: QueryClassification) -> Optional[Dict[str, Any]]:
+        """Reply that needs no retrieval at all, or None."""
+        if classification.is_injection:
             return {
                 "answer": OUT_OF_SCOPE_REPLY,
                 "sources": [],
                 "fallback_type": "out_of_scope",
             }
 
+        if PRE_CLASSIFIER_ENABLED and classification.is_out_of_scope:
+            # Rejected locally: no Jina, Chroma or Groq work for this request.
+            return {
+                "answer": OUT_OF_SCOPE_REPLY,
+                "sources": [],
+                "follow_up_suggestions": [],
+                "fallback_type": "out_of_scope",
+            }
+        return None
+
+    def _answer_from_candidates(
+        self,
+        retriever: Retriever,
+        question: str,
+        classification: QueryClassification,
+        query_embedding: List[float],
+        candidates: List[ScoredDocument],
+        timings: Dict[str, float],
+        history: Optional[str] = None,
+        answer_mode: str = "auto",
+    ) -> Dict[str, Any]:
+        """Apply thresholds to already-searched candidates and generate the answer."""
+        documents = self._select_from_candidates(retriever, question, classification, query_embedding, candidates)
+        if not documents:
+            return self._no_documents_reply(classification)
+        return self._answer_from_documents(retriever, question, documents, timings, history, answer_mode)
+
+    def _select_from_candidates(
+        self,
+        retriever: Retriever,
+        question: str,
+        classification: QueryClassification,
+        query_embedding: List[float],
+        candidates: List[ScoredDocument],
+    ) -> List[ScoredDocument]:
+        """Strict threshold pass, then the relaxed pass for in-domain queries."""
         adaptive_threshold = self._adaptive_threshold(question)
-        documents, _rejected_documents = self.retriever.retrieve_with_threshold_diagnostics(
-            question,
-            threshold=adaptive_threshold,
-        )
+        with span("strict_select", threshold=round(adaptive_threshold, 3)) as stage:
+            documents, _rejected_documents = retriever.select_with_threshold(
+                query_embedding,
+                candidates,
+                threshold=adaptive_threshold,
+                diversity=RETRIEVAL_DIVERSITY,
+            )
+            stage["selected"] = len(documents)
 
-        is_domain_query = self._is_coffee_domain_query(question)
-        if not documents and is_domain_query:
+        if not documents and classification.is_in_domain:
+            # The relaxed pass reuses the same candidates: no second search.
             relaxed_threshold = self._relaxed_threshold(adaptive_threshold)
-            documents, _rejected_documents = self.retriever.retrieve_with_threshold_diagnostics(
-                question,
-                threshold=relaxed_threshold,
+            with span("relaxed_select", threshold=round(relaxed_threshold, 3)) as stage:
+                documents, _rejected_documents = retriever.select_with_threshold(
+                    query_embedding,
+                    candidates,
+                    threshold=relaxed_threshold,
+                    diversity=RETRIEVAL_DIVERSITY,
+                )
+                stage["selected"] = len(documents)
+        return documents
+
+    @staticmethod
+    def _no_documents_reply(classification: QueryClassification) -> Dict[str, Any]:
+        is_domain_query = classification.is_in_domain
+        return {
+            "answer": NEED_MORE_DETAIL_REPLY if is_domain_query else OUT_OF_SCOPE_REPLY,
+            "sources": [],
+            "follow_up_suggestions": (
+                GENERIC_FOLLOW_UP_SUGGESTIONS if is_domain_query else []
+            ),
+            "fallback_type": "too_generic" if is_domain_query else "out_of_scope",
+        }
+
+    @classmethod
+    def _direct_documents(
+        cls,
+        retriever: Retriever,
+        question: str,
+        timings: Dict[str, float],
+    ) -> Optional[List[ScoredDocument]]:
+        """Documents that can be answered from without embedding the question, or None."""
+        return cls._lookup_named_places(retriever, question, timings) or cls._lexical_first_documents(
+            retriever, question, timings
+        )
+
+    @staticmethod
+    def _lookup_named_places(
+        retriever: Retriever,
+        question: str,
+        timings: Dict[str, float],
+    ) -> Optional[List[ScoredDocument]]:
+        """Documents of a place named in the question, or None."""
+        if not NAME_LOOKUP_ENABLED:
+            return None
+        stage_started = time.perf_counter()
+        with span("lookup") as stage:
+            documents = retriever.lookup_place_documents(question, k=TOP_K_RESULTS)
+            stage["hit"] = bool(documents)
+        timings["lookup_ms"] = _elapsed_ms(stage_started)
+        return documents
+
+    @staticmethod
+    def _lexical_first_documents(
+        retriever: Retriever,
+        question: str,
+        timings: Dict[str, float],
+    ) -> Optional[List[ScoredDocument]]:
+        """BM25 documents that cover every keyword of the question, or None."""
+        if not LEXICAL_FIRST_ENABLED:
+            return None
+        stage_started = time.perf_counter()
+        with span("lexical") as stage:
+            documents = retriever.lexical_first_documents(question, k=TOP_K_RESULTS)
+            stage["hit"] = bool(documents)
+        timings["lexical_ms"] = _elapsed_ms(stage_started)
+        return documents
+
+    @staticmethod
+    def _follow_up_documents(
+        retriever: Retriever,
+        question: str,
+        session: Session,
+        timings: Dict[str, float],
+    ) -> Optional[List[ScoredDocument]]:
+        """Previous turn's candidates re-ranked for a follow-up question, or None."""
+        if not session.candidates:
+            return None
+        stage_started = time.perf_counter()
+        with span("rerank") as stage:
+            documents = retriever.rerank_candidates(question, session.candidates, k=TOP_K_RESULTS)
+            stage["hit"] = bool(documents)
+        timings["rerank_ms"] = _elapsed_ms(stage_started)
+        return documents
+
+    @classmethod
+    def _session_candidates(cls, question: str, candidates: List[ScoredDocument]) -> List[ScoredDocument]:
+        """Candidates worth keeping for follow-ups: those within the relaxed threshold."""
+        threshold = cls._relaxed_threshold(cls._adaptive_threshold(question))
+        return [document for document in candidates if document.score < threshold]
+
+    def _cache_remaining(
+        self,
+        question: str,
+        candidates: List[ScoredDocument],
+        shown: List[ScoredDocument],
+        result: Dict[str, Any],
+        index_version: str,
+    ) -> Optional[str]:
+        """Cache the candidates not shown in ``result`` for ``more``; None if none are left."""
+        shown_rows = {document.row for document in shown}
+        remaining = [document for document in candidates if document.row not in shown_rows]
+        if not remaining:
+            return None
+        return self.results.put(
+            CachedResult(
+                question=question,
+                candidates=remaining,
+                index_version=index_version,
+                shown=[source["nama"] for source in result["sources"]],
             )
+        )
 
-        if not documents:
+    def _remember_turn(
+        self,
+        session_id: str,
+        session: Optional[Session],
+        question: str,
+        result: Dict[str, Any],
+        candidates: List[ScoredDocument],
+        retrieval_query: str,
+        index_version: str,
+    ) -> None:
+        session = session if session is not None else Session()
+        session.turns.append(
+            SessionTurn(question=question, sources=[source["nama"] for source in result["sources"]])
+        )
+        if candidates:
+            session.candidates = candidates
+            session.retrieval_query = retrieval_query
+            session.index_version = index_version
+        self.sessions.save(session_id, session)
+
+    def _answer_from_documents(
+        self,
+        retriever: Retriever,
+        question: str,
+        documents: List[ScoredDocument],
+        timings: Dict[str, float],
+        history: Optional[str] = None,
+        answer_mode: str = "auto",
+    ) -> Dict[str, Any]:
+        """Generate the answer for already-selected documents."""
+        sources = self._extract_sources(documents)
+        intent = self._extractive_intent(question, answer_mode)
+        if intent is not None:
+            # Listing/lookup answers are formatted metadata: no Groq call needed.
+            set_attributes(answer_mode="extractive", intent=intent)
+            with span("extract", documents=len(documents), intent=intent):
+                answer = build_extractive_answer(question, documents, intent)
+            with span("normalize"):
+                answer = self._normalize_answer_markdown(answer)
             return {
-                "answer": NEED_MORE_DETAIL_REPLY if is_domain_query else OUT_OF_SCOPE_REPLY,
-                "sources": [],
-                "follow_up_suggestions": (
-                    GENERIC_FOLLOW_UP_SUGGESTIONS if is_domain_query else []
-                ),
-                "fallback_type": "too_generic" if is_domain_query else "out_of_scope",
+                "answer": answer,
+                "sources": sources,
+                "follow_up_suggestions": [],
+                "fallback_type": None,
             }
 
-        context = self.retriever.format_context(documents)
-        answer = self.generator.generate(question, context)
-        answer = self._normalize_answer_markdown(answer)
-        sources = self._extract_sources(documents)
+        set_attributes(answer_mode="generate")
+        with span("context_build", documents=len(documents)):
+            context = retriever.format_context(documents)
+        # Names the answer must mention; a small model that names none of them gets escalated.
+        reference_names = [
+            name
+            for doc in documents
+            for name in (doc.meta("nama"), doc.meta("source"))
+            if name
+        ]
+        stage_started = time.perf_counter()
+        with span("generate", context_chars=len(context)):
+            answer = self.generator.generate(
+                question,
+                context,
+                history=history,
+                document_count=len(documents),
+                reference_names=reference_names,
+            )
+        timings["generate_ms"] = _elapsed_ms(stage_started)
+        with span("normalize"):
+            answer = self._normalize_answer_markdown(answer)
 
         return {
             "answer": answer,
@@ -119,26 +864,34 @@ class RAGService:
             "fallback_type": None,
         }
 
+    @staticmethod
+    def _extractive_intent(question: str, answer_mode: str) -> Optional[str]:
+        """Intent to answer extractively with, or None to call the LLM."""
+        if answer_mode == "generate":
+            return None
+        intent = detect_answer_intent(question)
+        if answer_mode == "extractive":
+            return intent or LISTING_INTENT
+        return intent if EXTRACTIVE_ANSWERS_ENABLED else None
+
     @staticmethod
     def _looks_like_prompt_injection(question: str) -> bool:
-        lowered = question.lower()
-        return any(re.search(pattern, lowered) for pattern in UNSAFE_PROMPT_PATTERNS)
+        return looks_like_prompt_injection(question)
 
     @staticmethod
     def _is_coffee_domain_query(question: str) -> bool:
-        lowered = question.lower()
-        return any(keyword in lowered for keyword in COFFEE_DOMAIN_KEYWORDS)
+        return classify_query(question).is_in_domain
 
     @staticmethod
-    def _adaptive_threshold(question: str) -> float:
+    def _adaptive_threshold(question: str, base_threshold: float = SCORE_THRESHOLD) -> float:
         word_count = len(question.split())
         if word_count <= 3:
-            return min(0.65, SCORE_THRESHOLD + 0.35)
+            return min(0.65, base_threshold + 0.35)
         if word_count <= 6:
-            return min(0.55, SCORE_THRESHOLD + 0.25)
+            return min(0.55, base_threshold + 0.25)
         if word_count <= 10:
-            return min(0.45, SCORE_THRESHOLD + 0.15)
-        return SCORE_THRESHOLD
+            return min(0.45, base_threshold + 0.15)
+        return base_threshold
 
     @staticmethod
     def _relaxed_threshold(current_threshold: float) -> float:
@@ -147,65 +900,16 @@ class RAGService:
 
     @staticmethod
     def _normalize_answer_markdown(answer: str) -> str:
-        text = answer.replace("\r\n", "\n").replace("\r", "\n")
-        lines = text.split("\n")
-        normalized: List[str] = []
-
-        bullet_started = False
-        for raw in lines:
-            line = raw.rstrip()
-            if not line.strip():
-                if normalized and normalized[-1] != "":
-                    normalized.append("")
-                continue
-
-            compact = re.sub(r"[ \t]+", " ", line.strip())
-
-            # Normalize unordered bullet markers to "- ".
-            if re.match(r"^(\*|•|-) +", compact):
-                item = re.sub(r"^(\*|•|-) +", "", compact).strip()
-                if normalized and normalized[-1] != "" and not bullet_started:
-                    normalized.append("")
-                normalized.append(f"- {item}")
-                bullet_started = True
-                continue
-
-            # Normalize ordered list to unordered for consistency with UI style.
-            ordered_match = re.match(r"^\d+[.)] +(.*)$", compact)
-            if ordered_match:
-                item = ordered_match.group(1).strip()
-                if normalized and normalized[-1] != "" and not bullet_started:
-                    normalized.append("")
-                normalized.append(f"- {item}")
-                bullet_started = True
-                continue
-
-            # Keep detail lines indented under previous bullet when appropriate.
-            if normalized and normalized[-1].startswith("- "):
-                if re.match(r"^(Lokasi|Alasan|Menu|Fasilitas|Catatan)\s*:", compact, re.IGNORECASE):
-                    normalized.append(f"  {compact}")
-                    continue
-
-            normalized.append(compact)
-            bullet_started = False
-
-        # Remove leading/trailing blank lines and duplicate blanks.
-        while normalized and normalized[0] == "":
-            normalized.pop(0)
-        while normalized and normalized[-1] == "":
-            normalized.pop()
-
-        return "\n".join(normalized)
+        return normalize_markdown(answer)
 
     @staticmethod
-    def _extract_sources(documents: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    def _extract_sources(documents: List[ScoredDocument]) -> List[Dict[str, str]]:
         sources: List[Dict[str, str]] = []
         for doc in documents:
-            metadata = doc.get("metadata", {})
             sources.append(
                 {
-                    "nama": metadata.get("source", "Unknown"),
-                    "lokasi": metadata.get("lokasi", "Unknown"),
+                    "nama": doc.meta("source", "Unknown"),
+                    "lokasi": doc.meta("lokasi", "Unknown"),
                 }
             )
         return sources
@@ -0,0 +1,108 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from backend.config.settings import RESULT_CACHE_MAX_ENTRIES, RESULT_TOKEN_TTL_SECONDS
+from backend.src.document_store import ScoredDocument
+
+
+@dataclass
+class CachedResult:
+    """
+    Daftar kandidat lengkap satu jawaban `/api/chat`, untuk paging "lainnya".
+
+    `candidates` urut ranking search awal (termasuk yang ditolak threshold),
+    tanpa dokumen yang sudah ditampilkan; `offset` menunjuk kandidat
+    berikutnya. Hanya valid untuk `index_version` yang sama.
+    """
+
+    question: str
+    candidates: List[ScoredDocument]
+    index_version: str
+    # Nama sumber yang sudah ditampilkan, untuk ringkasan ke Generator.
+    shown: List[str] = field(default_factory=list)
+    offset: int = 0
+    updated_at: float = 0.0
+
+    @property
+    def remaining(self) -> int:
+        return max(0, len(self.candidates) - self.offset)
+
+
+class ResultCache:
+    """
+    Cache in-memory `result_token` -> `CachedResult` dengan TTL dan batas LRU.
+
+    Seperti SessionStore, hanya untuk satu proses: token dari worker lain
+    dianggap tidak dikenal.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = RESULT_TOKEN_TTL_SECONDS,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._results: "OrderedDict[str, CachedResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, result: CachedResult) -> str:
+        """Simpan hasil dan kembalikan token acak untuk mengaksesnya."""
+        token = secrets.token_urlsafe(16)
+        now = time.monotonic()
+        result.updated_at = now
+        with self._lock:
+            self._results[token] = result
+            self._evict_expired(now)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return token
+
+    def take(self, token: str, count: int) -> Optional[Tuple[CachedResult, List[ScoredDocument]]]:
+        """
+        Ambil `count` kandidat berikutnya dan majukan offset.
+
+        Offset dimajukan di bawah lock, jadi dua request dengan token yang
+        sama tidak mendapat slice yang sama. Token yang habis dihapus.
+
+        Returns:
+            (hasil, slice kandidat), atau None jika token tidak dikenal/kedaluwarsa.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            result = self._results.get(token)
+            if result is None:
+                return None
+            page = result.candidates[result.offset : result.offset + count]
+            result.offset += len(page)
+            if result.remaining:
+                # TTL dihitung dari akses terakhir.
+                result.updated_at = now
+                self._results.move_to_end(token)
+            else:
+                del self._results[token]
+            return result, page
+
+    def discard(self, token: str) -> None:
+        with self._lock:
+            self._results.pop(token, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def _evict_expired(self, now: float) -> None:
+        # Urutan OrderedDict = urutan akses terakhir, jadi yang kedaluwarsa ada di depan.
+        while self._results:
+            oldest = next(iter(self._results.values()))
+            if now - oldest.updated_at < self.ttl_seconds:
+                break
+            self._results.popitem(last=False)
@@ -1,67 +1,467 @@
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
 from backend.config.settings import (
-    VECTOR_STORE_DIR,
+    EMBEDDING_FAILURE_THRESHOLD,
+    EMBEDDING_FALLBACK_ENABLED,
+    EMBEDDING_LATENCY_BUDGET_MS,
     EMBEDDING_MODEL,
+    EMBEDDING_RECOVERY_SECONDS,
+    FOLLOW_UP_MIN_COVERAGE,
+    HYBRID_RETRIEVAL_ENABLED,
+    LEXICAL_FIRST_MIN_COVERAGE,
+    LEXICAL_FIRST_MIN_WORDS,
+    LOCAL_EMBEDDING_SCORE_OFFSET,
+    RRF_K,
     TOP_K_RESULTS,
     SCORE_THRESHOLD,
+    SHARD_ROUTING_ENABLED,
+    SHARD_SEARCH_WORKERS,
     PROCESSED_DATA_DIR,
+    MMR_LAMBDA,
 )
 from langchain_chroma import Chroma
 
+from backend.src.circuit_breaker import CircuitBreaker
+from backend.src.document_store import DocumentStore, ScoredDocument
 from backend.src.embed import EmbeddingModel
+from backend.src.facet_index import FACET_JAM, FACET_KATEGORI, FacetIndex, facet_values
+from backend.src.index_versions import (
+    current_index_dir,
+    index_version_for,
+    new_index_dir,
+    publish_index,
+)
+from backend.src.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from backend.src.local_embed import LOCAL_INDEX_FILENAME, LocalIndex, LocalQueryVector
+from backend.src.mmr import maximal_marginal_relevance, normalize_rows
+from backend.src.name_index import NameIndex
+from backend.src.shards import LEGACY_SHARD, ShardRouter, collection_name, load_manifest
+from backend.src.tracing import add_event
 
 logger = logging.getLogger(__name__)
 
 
 class Retriever:
     """Menangani retrieval dokumen dari ChromaDB"""
+
+    # Jalur threshold mengambil k * faktor ini kandidat sebelum difilter.
+    THRESHOLD_FETCH_FACTOR = 3
     
-    def __init__(self):
-        """Inisialisasi retriever"""
+    def __init__(self, persist_directory: Optional[Path] = None):
+        """
+        Inisialisasi retriever
+
+        Args:
+            persist_directory: Direktori Chroma yang dibuka. Default: versi
+                index yang sedang aktif (pointer CURRENT).
+        """
         print("Memuat vector store...")
+        self.persist_directory = Path(persist_directory) if persist_directory else current_index_dir()
 
         self._ensure_vector_store()
 
+        self.local_index: Optional[LocalIndex] = None
+        self._embedding_breaker = CircuitBreaker(
+            "jina-embedding",
+            failure_threshold=EMBEDDING_FAILURE_THRESHOLD,
+            recovery_seconds=EMBEDDING_RECOVERY_SECONDS,
+        )
+
         # Load embedding model
-        self.embedding_model = EmbeddingModel(EMBEDDING_MODEL)
+        try:
+            self.embedding_model = EmbeddingModel(EMBEDDING_MODEL)
+        except ValueError:
+            # Tanpa JINA_API_KEY, service tetap bisa jalan dari index embedding lokal.
+            if not (EMBEDDING_FALLBACK_ENABLED and (self.persist_directory / LOCAL_INDEX_FILENAME).exists()):
+                raise
+            logger.warning("JINA_API_KEY kosong, query memakai embedding lokal sepenuhnya")
+            self.embedding_model = None
+            self._embedding_breaker.force_open()
         self.embedding_function = self._create_embedding_function()
         
-        # Load vector store
+        # Load vector store (satu collection per shard)
+        self._shard_pool: Optional[ThreadPoolExecutor] = None
+        self._hydrate_lock = threading.Lock()
         try:
-            self.vectorstore = Chroma(
-                persist_directory=str(VECTOR_STORE_DIR),
-                embedding_function=self.embedding_function
-            )
-            doc_count = self.vectorstore._collection.count()
+            doc_count = self._open_shards()
             if doc_count == 0:
                 self._rebuild_vector_store()
-                self.vectorstore = Chroma(
-                    persist_directory=str(VECTOR_STORE_DIR),
-                    embedding_function=self.embedding_function
-                )
-                doc_count = self.vectorstore._collection.count()
+                doc_count = self._open_shards()
                 if doc_count == 0:
                     raise ValueError("Vector store kosong setelah rebuild.")
-            print(f"Vector store berhasil dimuat ({doc_count} dokumen)")
+            print(f"Vector store berhasil dimuat ({doc_count} dokumen, {len(self._collections)} shard)")
         except Exception as e:
             raise RuntimeError(f"Gagal memuat vector store: {str(e)}")
 
+        self._load_documents()
+        self._load_lexical_index()
+        if EMBEDDING_FALLBACK_ENABLED:
+            self._load_local_index()
+
+    def _open_shards(self) -> int:
+        """
+        Buka collection Chroma tiap shard dari manifest index.
+
+        Index tanpa manifest (dibangun sebelum sharding) dibuka sebagai satu
+        shard berisi collection default.
+
+        Returns:
+            Jumlah dokumen di semua shard.
+        """
+        manifest = load_manifest(self.persist_directory) or {LEGACY_SHARD: {}}
+        self._collections = {
+            shard: Chroma(
+                collection_name=entry.get("collection") or collection_name(shard),
+                persist_directory=str(self.persist_directory),
+                embedding_function=self.embedding_function,
+            )._collection
+            for shard, entry in manifest.items()
+        }
+        self._shard_counts = {shard: collection.count() for shard, collection in self._collections.items()}
+        self.shard_router = ShardRouter({shard: entry.get("values", []) for shard, entry in manifest.items()})
+        if len(self._collections) > 1 and self._shard_pool is None:
+            self._shard_pool = ThreadPoolExecutor(
+                max_workers=max(1, min(SHARD_SEARCH_WORKERS, len(self._collections))),
+                thread_name_prefix="shard-search",
+            )
+        return sum(self._shard_counts.values())
+
+    def shard_status(self) -> Dict[str, int]:
+        """Jumlah dokumen per shard."""
+        return dict(self._shard_counts)
+
+    def _collection_pages(self, include: List[str], page_size: int = 5000):
+        """Iterasi halaman `collection.get` di semua shard: (shard, page)."""
+        for shard, collection in self._collections.items():
+            offset = 0
+            while True:
+                page = collection.get(include=include, limit=page_size, offset=offset)
+                page_ids = page.get("ids") or []
+                if not page_ids:
+                    break
+                yield shard, page
+                offset += len(page_ids)
+
+    def _load_local_index(self) -> None:
+        """Muat index embedding lokal (fallback saat Jina gagal/lambat)."""
+        self.local_index = LocalIndex.load(self.persist_directory)
+        if self.local_index is None:
+            # Index lama yang dibangun sebelum ada embedding lokal: bangun di memory saja.
+            logger.warning("Index embedding lokal belum ada di %s, dibangun di memory", self.persist_directory)
+            self.local_index = LocalIndex.build(list(self.documents.ids), list(self.documents.contents))
+        print(f"Index embedding lokal dimuat ({len(self.local_index)} dokumen)")
+
+    def _load_lexical_index(self) -> None:
+        """Muat index BM25 yang dibangun saat ingest."""
+        started_at = time.perf_counter()
+        self.lexical_index = LexicalIndex.load(self.persist_directory)
+        if self.lexical_index is None:
+            logger.warning("Index BM25 belum ada di %s, dibangun di memory", self.persist_directory)
+            self.lexical_index = LexicalIndex.build(list(self.documents.ids), list(self.documents.contents))
+        logger.info(
+            "Index BM25 dimuat (%s dokumen, %.1f ms)",
+            len(self.lexical_index),
+            (time.perf_counter() - started_at) * 1000,
+        )
+
+    def _load_documents(self) -> None:
+        """
+        Muat konten, metadata, dan embedding semua shard sekali saat startup.
+
+        Konten + metadata masuk `DocumentStore` (kolom, satu baris per dokumen)
+        dan embedding jadi matrix yang dipin dengan baris yang sama, dipakai
+        search exact dan MMR in-memory. Index nama dan facet dibangun dari
+        metadata yang sama, jadi query tidak perlu mengambil dokumen dari Chroma.
+        """
+        ids: List[str] = []
+        contents: List[str] = []
+        metadatas: List[dict] = []
+        vectors: List[np.ndarray] = []
+        row_shards: List[str] = []
+        for shard, page in self._collection_pages(["documents", "metadatas", "embeddings"]):
+            ids.extend(page["ids"])
+            contents.extend(page["documents"])
+            metadatas.extend(metadata or {} for metadata in page["metadatas"])
+            vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+            row_shards.extend([shard] * len(page["ids"]))
+
+        self.documents = DocumentStore.build(ids, contents, metadatas)
+        if len(self.documents) != len(ids):
+            raise ValueError("ID dokumen duplikat antar shard, index harus dibangun ulang.")
+        self._doc_vectors = normalize_rows(np.vstack(vectors)) if vectors else np.zeros((0, 0), np.float32)
+        self._row_shards = row_shards
+        self.name_index = NameIndex.build(ids, metadatas, contents)
+        self.facet_index = FacetIndex.build(ids, metadatas)
+        logger.info(
+            "%s dokumen dimuat ke memory (index nama %s tempat, facet %s dokumen)",
+            len(self.documents),
+            len(self.name_index),
+            len(self.facet_index),
+        )
+
+    def facet_mask(self, filters: Optional[Dict[str, List[str]]]) -> Optional[np.ndarray]:
+        """Bitset pre-filter untuk search, atau None jika tidak ada filter."""
+        if not filters or not any(filters.values()):
+            return None
+        return self.facet_index.mask(filters)
+
+    def filter_documents(
+        self,
+        documents: Optional[List[ScoredDocument]],
+        mask: Optional[np.ndarray],
+    ) -> Optional[List[ScoredDocument]]:
+        """Buang dokumen di luar bitset filter; None jika tidak ada yang tersisa."""
+        if mask is None or not documents:
+            return documents
+        kept = [document for document in documents if self.facet_index.allows_row(mask, document.row)]
+        return kept or None
+
+    def _hydrate(self, shard: str, ids: List[str]) -> None:
+        """Muat dokumen yang ditambahkan ke Chroma setelah startup ke store dan matrix embedding."""
+        fetched = self._collections[shard].get(ids=ids, include=["documents", "metadatas", "embeddings"])
+        with self._hydrate_lock:
+            new = [index for index, doc_id in enumerate(fetched["ids"]) if doc_id not in self.documents]
+            if not new:
+                return
+            # Vector dulu: baris baru baru terlihat lewat store setelah embedding-nya siap.
+            vectors = normalize_rows(np.asarray([fetched["embeddings"][index] for index in new], dtype=np.float32))
+            self._doc_vectors = np.vstack([self._doc_vectors, vectors]) if self._doc_vectors.size else vectors
+            self._row_shards.extend([shard] * len(new))
+            self.documents.extend(
+                [fetched["ids"][index] for index in new],
+                [fetched["documents"][index] for index in new],
+                [fetched["metadatas"][index] for index in new],
+            )
+
+    def _search_candidates(
+        self,
+        query_embedding: List[float],
+        fetch_k: int,
+        query: Optional[str] = None,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[ScoredDocument]:
+        """Similarity search berdasarkan vektor query, urut score (distance) naik."""
+        queries = [query] if query is not None else None
+        return self.search_candidates_batch([query_embedding], fetch_k, queries=queries, mask=mask)[0]
+
+    def search_candidates_batch(
+        self,
+        query_embeddings: List[List[float]],
+        fetch_k: int,
+        queries: Optional[List[str]] = None,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[List[ScoredDocument]]:
+        """
+        Similarity search untuk banyak vektor query, satu panggilan Chroma per shard.
+
+        Args:
+            queries: Teks query (urutan sama dengan `query_embeddings`). Jika
+                diberikan dan HYBRID_RETRIEVAL_ENABLED aktif, hasil dense
+                digabung dengan BM25 lewat Reciprocal Rank Fusion. Teks query
+                juga dipakai router untuk memilih shard (kota yang disebut).
+            mask: Bitset facet (`facet_mask`). Jika diberikan, search dense
+                berjalan exact di embedding yang dipin, hanya atas dokumen
+                yang lolos filter (tanpa query Chroma).
+
+        Returns:
+            List kandidat per query (sesuai urutan `query_embeddings`). Tiap
+            kandidat hanya baris store + score; konten dibaca saat dipakai.
+        """
+        if not query_embeddings:
+            return []
+
+        batch: List[Optional[List[ScoredDocument]]] = [None] * len(query_embeddings)
+        remote_positions = []
+        for position, query_embedding in enumerate(query_embeddings):
+            if mask is not None:
+                batch[position] = self._search_masked(query_embedding, fetch_k, mask)
+            elif isinstance(query_embedding, LocalQueryVector):
+                batch[position] = self._search_local(query_embedding, fetch_k)
+            else:
+                remote_positions.append(position)
+
+        routes = [self.route_shards(queries[position] if queries else None) for position in range(len(batch))]
+        if remote_positions:
+            positions_by_shard: Dict[str, List[int]] = {}
+            for position in remote_positions:
+                for shard in routes[position]:
+                    positions_by_shard.setdefault(shard, []).append(position)
+            if len(self._collections) > 1:
+                add_event("shard_search", shards=sorted(positions_by_shard))
+
+            shard_results = self._query_shards(positions_by_shard, query_embeddings, fetch_k)
+            for position in remote_positions:
+                # Gabungkan hasil shard berdasarkan distance (semua shard memakai embedding yang sama).
+                batch[position] = sorted(
+                    (document for shard in routes[position] for document in shard_results[shard].get(position, [])),
+                    key=lambda document: document.score,
+                )[:fetch_k]
+
+        if queries is not None and HYBRID_RETRIEVAL_ENABLED:
+            batch = [
+                self._fuse_lexical(query_embedding, query, fetch_k, dense, mask, shards)
+                for query_embedding, query, dense, shards in zip(query_embeddings, queries, batch, routes)
+            ]
+        return batch
+
+    def route_shards(self, query: Optional[str]) -> List[str]:
+        """Shard yang dicari untuk query (semua shard jika routing nonaktif)."""
+        if not SHARD_ROUTING_ENABLED:
+            return list(self._collections)
+        return self.shard_router.route(query)
+
+    def _query_shards(
+        self,
+        positions_by_shard: Dict[str, List[int]],
+        query_embeddings: List[List[float]],
+        fetch_k: int,
+    ) -> Dict[str, Dict[int, List[ScoredDocument]]]:
+        """
+        Query Chroma per shard, paralel jika lebih dari satu shard.
+
+        Returns:
+            {shard: {posisi query: [ScoredDocument, ...]}}
+        """
+
+        def query_shard(shard: str) -> Dict[int, List[ScoredDocument]]:
+            positions = positions_by_shard[shard]
+            n_results = min(fetch_k, self._shard_counts.get(shard, 0))
+            if n_results <= 0:
+                return {}
+            collection = self._collections[shard]
+            # Hanya id + distance dari Chroma; konten dan metadata sudah dipin di memory.
+            results = collection.query(
+                query_embeddings=[query_embeddings[position] for position in positions],
+                n_results=n_results,
+                include=["distances"],
+            )
+            store = self.documents
+            missing = [doc_id for ids in results["ids"] for doc_id in ids if doc_id not in store]
+            if missing:
+                self._hydrate(shard, missing)
+            shard_results: Dict[int, List[ScoredDocument]] = {}
+            for result_index, position in enumerate(positions):
+                documents = shard_results[position] = []
+                for doc_id, score in zip(results["ids"][result_index], results["distances"][result_index]):
+                    row = store.row_of(doc_id)
+                    if row is not None:
+                        documents.append(ScoredDocument(store, row, score))
+            return shard_results
+
+        shards = list(positions_by_shard)
+        if len(shards) == 1 or self._shard_pool is None:
+            return {shard: query_shard(shard) for shard in shards}
+        return dict(zip(shards, self._shard_pool.map(query_shard, shards)))
+
+    def _search_masked(self, query_embedding: List[float], fetch_k: int, mask: np.ndarray) -> List[ScoredDocument]:
+        """Search exact atas dokumen di bitset facet, dari embedding yang dipin."""
+        # Facet index dibangun dari urutan store yang sama: baris bitset = baris store.
+        rows = self.facet_index.rows_for(mask)
+        if not len(rows) or fetch_k <= 0:
+            return []
+        distances = self._dense_distances(query_embedding, rows)
+        fetch_k = min(fetch_k, len(rows))
+        top = np.argpartition(distances, fetch_k - 1)[:fetch_k]
+        top = top[np.argsort(distances[top])]
+        return [ScoredDocument(self.documents, int(rows[index]), float(distances[index])) for index in top]
+
+    def _fuse_lexical(
+        self,
+        query_embedding: List[float],
+        query: str,
+        fetch_k: int,
+        dense: List[ScoredDocument],
+        mask: Optional[np.ndarray] = None,
+        shards: Optional[List[str]] = None,
+    ) -> List[ScoredDocument]:
+        """
+        Gabungkan kandidat dense dengan top BM25 (RRF).
+
+        Urutan mengikuti skor RRF, sedangkan `score` tiap item tetap distance
+        dense supaya threshold yang ada tetap berlaku. Distance dokumen yang
+        hanya ditemukan BM25 dihitung dari embedding yang sudah dipin.
+        """
+        lexical_ids, _, _ = self.lexical_index.search(query, fetch_k)
+        lexical_rows = self.documents.rows_of(lexical_ids)
+        if mask is not None:
+            lexical_rows = [row for row in lexical_rows if self.facet_index.allows_row(mask, row)]
+        elif shards is not None and len(shards) < len(self._collections):
+            # BM25 global; kandidatnya ikut dibatasi ke shard hasil routing.
+            lexical_rows = [row for row in lexical_rows if self._row_shards[row] in shards]
+        if not lexical_rows:
+            return dense
+        by_row = {document.row: document for document in dense}
+        missing = [row for row in lexical_rows if row not in by_row]
+        if missing:
+            for row, distance in zip(missing, self._dense_distances(query_embedding, missing)):
+                by_row[row] = ScoredDocument(self.documents, row, float(distance))
+
+        fused_rows = reciprocal_rank_fusion([[document.row for document in dense], lexical_rows], k=RRF_K)
+        return [by_row[row] for row in fused_rows[:fetch_k]]
+
+    def _dense_distances(self, query_embedding: List[float], rows: Sequence[int]) -> np.ndarray:
+        """Distance dense (2 - 2*cosine) query terhadap baris store tertentu, dari vector yang dipin."""
+        query = normalize_rows(query_embedding)[0]
+        if isinstance(query_embedding, LocalQueryVector):
+            similarity = self.local_index.similarities([self.documents.ids[row] for row in rows], query)
+            return np.maximum(0.0, 2.0 - 2.0 * similarity - LOCAL_EMBEDDING_SCORE_OFFSET)
+        return 2.0 - 2.0 * (self._doc_vectors[rows] @ query)
+
+    def _search_local(self, query_embedding: LocalQueryVector, fetch_k: int) -> List[ScoredDocument]:
+        """Similarity search di index embedding lokal; konten dibaca dari store."""
+        ids, distances = self.local_index.search(query_embedding, fetch_k)
+        store = self.documents
+        documents = []
+        for doc_id, distance in zip(ids, distances):
+            row = store.row_of(doc_id)
+            if row is not None:
+                # Digeser supaya sebanding dengan distance Jina dan SCORE_THRESHOLD.
+                documents.append(ScoredDocument(store, row, max(0.0, distance - LOCAL_EMBEDDING_SCORE_OFFSET)))
+        return documents
+
+    def _select_diverse(
+        self,
+        query_embedding: List[float],
+        candidates: List[ScoredDocument],
+        k: int,
+        lambda_mult: float,
+    ) -> List[int]:
+        """Pilih index kandidat dengan MMR di atas embedding yang sudah dipin."""
+        if not candidates:
+            return []
+        if isinstance(query_embedding, LocalQueryVector):
+            candidate_matrix = self.local_index.rows_for([document.doc_id for document in candidates])
+        else:
+            candidate_matrix = self._doc_vectors[[document.row for document in candidates]]
+        return maximal_marginal_relevance(
+            query_embedding,
+            candidate_matrix,
+            k=k,
+            lambda_mult=lambda_mult,
+        )
+
     def _ensure_vector_store(self) -> None:
         """Pastikan vector store tersedia sebelum dipakai."""
-        if VECTOR_STORE_DIR.exists():
+        if self.persist_directory.exists():
             return
         self._rebuild_vector_store()
 
     def _rebuild_vector_store(self) -> None:
         """
-        Build ulang vector store dari CSV processed.
+        Build ulang vector store dari CSV processed ke versi index baru.
 
         Ini penting untuk environment ephemeral seperti Railway.
         """
         csv_path = PROCESSED_DATA_DIR / "extracted_data_sahabatai.csv"
         if not csv_path.exists():
             raise FileNotFoundError(
-                f"Vector store tidak ditemukan di {VECTOR_STORE_DIR}, "
+                f"Vector store tidak ditemukan di {self.persist_directory}, "
                 f"dan file sumber juga tidak ditemukan di {csv_path}."
             )
 
@@ -71,8 +471,34 @@ class Retriever:
         )
         from backend.src.ingest import DataIngestor
 
-        ingestor = DataIngestor()
+        index_dir = new_index_dir()
+        ingestor = DataIngestor(persist_directory=index_dir)
         ingestor.load_and_ingest_csv(str(csv_path))
+        publish_index(index_dir)
+        self.persist_directory = index_dir
+
+    @property
+    def index_version(self) -> str:
+        """Nama versi index yang dibuka retriever ini."""
+        return index_version_for(self.persist_directory)
+
+    def close(self) -> None:
+        """
+        Lepaskan resource index setelah retriever tidak dipakai lagi.
+
+        Koneksi Chroma ikut dilepas saat objek ini di-garbage-collect.
+        """
+        self.documents = DocumentStore()
+        self._doc_vectors = np.zeros((0, 0), np.float32)
+        self._row_shards = []
+        self.local_index = None
+        self.name_index = NameIndex()
+        self.lexical_index = LexicalIndex.build([], [])
+        self.facet_index = FacetIndex.build([], [])
+        self._collections = {}
+        if self._shard_pool is not None:
+            self._shard_pool.shutdown(wait=False)
+            self._shard_pool = None
     
     def _create_embedding_function(self):
         """Buat fungsi embedding yang kompatibel dengan Chroma"""
@@ -89,33 +515,24 @@ class Retriever:
         
         return EmbeddingWrapper(self.embedding_model)
     
-    def retrieve(self, query: str, k: int = TOP_K_RESULTS) -> list:
+    def retrieve(self, query: str, k: int = TOP_K_RESULTS, lambda_mult: float = MMR_LAMBDA) -> list:
         """
         Retrieve dokumen relevan berdasarkan query menggunakan MMR dan score threshold
         
         Args:
             query: Query dari user
             k: Jumlah dokumen yang diambil (default dari settings)
+            lambda_mult: Bobot relevansi vs diversity untuk MMR
             
         Returns:
             List dokumen relevan
         """
         # Gunakan MMR untuk diversity (ambil lebih banyak dulu)
         fetch_k = k * 2  # Ambil 2x lebih banyak untuk diversity
-        results = self.vectorstore.max_marginal_relevance_search(
-            query, 
-            k=k, 
-            fetch_k=fetch_k
-        )
-        
-        # Format ke dict untuk kompatibilitas
-        return [
-            {
-                "content": doc.page_content,
-                "metadata": doc.metadata
-            }
-            for doc in results
-        ]
+        query_embedding = self.embed_queries([query])[0]
+        candidates = self._search_candidates(query_embedding, fetch_k, query=query)
+        selected = self._select_diverse(query_embedding, candidates, k=k, lambda_mult=lambda_mult)
+        return [candidates[index] for index in selected]
     
     def retrieve_with_threshold(self, query: str, k: int = TOP_K_RESULTS, threshold: float = SCORE_THRESHOLD) -> list:
         """
@@ -129,66 +546,268 @@ class Retriever:
         Returns:
             List dokumen relevan yang lolos threshold
         """
-        # Ambil lebih banyak dokumen untuk filtering
-        fetch_k = k * 3
-        results_with_scores = self.vectorstore.similarity_search_with_score(
-            query, 
-            k=fetch_k
-        )
-        
-        # Filter berdasarkan threshold
-        filtered_results = [
-            (doc, score) for doc, score in results_with_scores 
-            if score < threshold
-        ]
-        
-        # Ambil k hasil terbaik
-        filtered_results = filtered_results[:k]
-        
-        # Format ke dict untuk kompatibilitas
-        return [
-            {
-                "content": doc.page_content,
-                "metadata": doc.metadata,
-                "score": score
-            }
-            for doc, score in filtered_results
-        ]
+        accepted, _ = self.retrieve_with_threshold_diagnostics(query, k=k, threshold=threshold)
+        return accepted
 
     def retrieve_with_threshold_diagnostics(
         self,
         query: str,
         k: int = TOP_K_RESULTS,
         threshold: float = SCORE_THRESHOLD,
+        diversity: float = 0.0,
+        query_embedding: Optional[List[float]] = None,
     ) -> tuple[list, list]:
         """
         Retrieve dokumen dengan threshold dan sertakan dokumen yang disisihkan.
 
+        Args:
+            diversity: 0 = urut murni berdasarkan score. Nilai > 0 memilih
+                dokumen yang lolos threshold dengan MMR in-memory
+                (lambda = 1 - diversity).
+            query_embedding: Embedding query yang sudah dihitung (opsional),
+                supaya tidak perlu memanggil embedding API lagi.
+
         Returns:
             tuple(accepted_docs, rejected_docs)
         """
-        fetch_k = k * 3
-        results_with_scores = self.vectorstore.similarity_search_with_score(
-            query,
-            k=fetch_k,
+        fetch_k = k * self.THRESHOLD_FETCH_FACTOR
+        if query_embedding is None:
+            query_embedding = self.embed_queries([query])[0]
+        candidates = self._search_candidates(query_embedding, fetch_k, query=query)
+        return self.select_with_threshold(
+            query_embedding,
+            candidates,
+            k=k,
+            threshold=threshold,
+            diversity=diversity,
         )
 
+    def select_with_threshold(
+        self,
+        query_embedding: List[float],
+        candidates: List[ScoredDocument],
+        k: int = TOP_K_RESULTS,
+        threshold: float = SCORE_THRESHOLD,
+        diversity: float = 0.0,
+    ) -> tuple[list, list]:
+        """
+        Pisahkan kandidat hasil search menjadi accepted/rejected tanpa search ulang.
+
+        Dipakai supaya strict pass dan relaxed pass bisa memakai kandidat yang
+        sama. Kedua list berisi record kandidat yang sama (tidak disalin).
+
+        Returns:
+            tuple(accepted_docs, rejected_docs)
+        """
+        if diversity > 0:
+            passing = [document for document in candidates if document.score < threshold]
+            selected = self._select_diverse(
+                query_embedding,
+                passing,
+                k=k,
+                lambda_mult=max(0.0, 1.0 - diversity),
+            )
+            accepted = [passing[position] for position in selected]
+            accepted_rows = {document.row for document in accepted}
+            rejected = [document for document in candidates if document.row not in accepted_rows]
+            return accepted, rejected
+
         accepted = []
         rejected = []
-        for doc, score in results_with_scores:
-            item = {
-                "content": doc.page_content,
-                "metadata": doc.metadata,
-                "score": score,
-            }
-            if score < threshold and len(accepted) < k:
-                accepted.append(item)
+        for document in candidates:
+            if document.score < threshold and len(accepted) < k:
+                accepted.append(document)
             else:
-                rejected.append(item)
+                rejected.append(document)
 
         return accepted, rejected
+
+    def lookup_place_documents(self, query: str, k: int = TOP_K_RESULTS) -> Optional[list]:
+        """
+        Ambil dokumen tempat yang disebut langsung di query (nama/handle).
+
+        Tanpa embedding dan vector search: hasilnya deterministik.
+
+        Returns:
+            List dokumen (score 0), atau None jika tidak ada nama tempat
+            yang match dengan yakin.
+        """
+        match = self.name_index.match(query)
+        if match is None:
+            return None
+
+        documents = [self.documents.document(row) for row in self.documents.rows_of(match.ids[:k])]
+        if not documents:
+            return None
+        logger.info("Lookup nama: %s -> %s dokumen (exact=%s)", match.matched, len(documents), match.exact)
+        return documents
+
+    def lexical_first_documents(self, query: str, k: int = TOP_K_RESULTS) -> Optional[list]:
+        """
+        Dokumen BM25 yang memuat semua kata query, tanpa menunggu embedding.
+
+        Hanya dipakai jika query punya minimal LEXICAL_FIRST_MIN_WORDS kata
+        yang dikenal korpus dan dokumen teratas meng-cover bobot kata query
+        minimal LEXICAL_FIRST_MIN_COVERAGE.
+
+        Returns:
+            List dokumen (score 0), atau None jika hasil lexical tidak cukup kuat.
+        """
+        if self.lexical_index.known_words(query) < LEXICAL_FIRST_MIN_WORDS:
+            return None
+        ids, _, coverage = self.lexical_index.search(query, k)
+        rows = self.documents.rows_of(
+            doc_id for doc_id, doc_coverage in zip(ids, coverage) if doc_coverage >= LEXICAL_FIRST_MIN_COVERAGE
+        )
+        return [self.documents.document(row) for row in rows] or None
+
+    def browse(
+        self,
+        filters: Optional[Dict[str, List[str]]] = None,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> Dict[str, object]:
+        """
+        Daftar tempat yang lolos filter facet, beserta hitungan per nilai facet.
+
+        Murni dari bitset dan metadata in-memory: tanpa embedding, Chroma, maupun LLM.
+
+        Raises:
+            ValueError: Jika nama facet tidak dikenal.
+        """
+        mask = self.facet_index.mask(filters)
+        rows = self.facet_index.rows_for(mask)
+        items = []
+        for row in rows[offset : offset + limit]:
+            metadata = self.documents.metadata(row)
+            values = facet_values(metadata)
+            items.append(
+                {
+                    "id": self.documents.ids[row],
+                    "nama": metadata.get("nama", ""),
+                    "source": metadata.get("source", ""),
+                    "lokasi": metadata.get("lokasi", ""),
+                    "kategori": values[FACET_KATEGORI],
+                    "jam_operasional": metadata.get("jam_operasional", ""),
+                    "jam": values[FACET_JAM],
+                }
+            )
+        return {
+            "total": len(rows),
+            "offset": offset,
+            "limit": limit,
+            "items": items,
+            "facets": self.facet_index.counts(filters),
+        }
+
+    def rerank_candidates(
+        self,
+        query: str,
+        candidates: List[ScoredDocument],
+        k: int = TOP_K_RESULTS,
+    ) -> Optional[List[ScoredDocument]]:
+        """
+        Pilih ulang kandidat turn sebelumnya untuk pertanyaan lanjutan, tanpa embedding.
+
+        Hanya kandidat yang memuat minimal FOLLOW_UP_MIN_COVERAGE bobot kata
+        kunci pertanyaan baru yang dipakai, urut BM25; kandidat lain tidak
+        ikut mengisi sisa k. Pertanyaan tanpa kata kunci yang dikenal korpus
+        ("yang mana paling oke?") memakai urutan lama.
+
+        Returns:
+            List dokumen, atau None jika tidak ada kandidat yang cukup cocok
+            (topik baru: perlu retrieval ulang).
+        """
+        if not candidates:
+            return None
+        if self.lexical_index.known_words(query) == 0:
+            return candidates[:k]
+        ids = [document.doc_id for document in candidates]
+        scores, coverage = self.lexical_index.score_ids(query, ids)
+        matched = [
+            position
+            for position in np.argsort(-scores, kind="stable")
+            if scores[position] > 0 and coverage[position] >= FOLLOW_UP_MIN_COVERAGE
+        ]
+        if not matched:
+            return None
+        return [candidates[position] for position in matched[:k]]
+
+    def names_place(self, question: str) -> bool:
+        """Apakah pertanyaan menyebut tempat yang ada di index (nama atau @handle)."""
+        return self.name_index.match(question) is not None
+
+    def starts_new_topic(self, question: str, previous_query: str) -> bool:
+        """
+        Apakah pertanyaan menyebut tempat atau kota/region yang belum ada di query sebelumnya.
+
+        "Mana yang buka 24 jam di Bantul?" setelah percakapan soal Yogyakarta
+        bukan lanjutan, walaupun diawali kata "mana".
+        """
+        if self.names_place(question):
+            return True
+        return bool(self.shard_router.mentioned(question) - self.shard_router.mentioned(previous_query))
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed banyak query sekaligus (di-batch per EMBEDDING_BATCH_SIZE).
+
+        Jika index embedding lokal tersedia, panggilan Jina (termasuk retry
+        MAX_RETRIES dan backoff-nya) dibatasi EMBEDDING_LATENCY_BUDGET_MS
+        secara total. Kegagalan atau
+        respons yang melebihi budget dicatat circuit breaker; selama breaker
+        terbuka query langsung di-embed lokal (`LocalQueryVector`).
+
+        Args:
+            queries: List query user.
+
+        Returns:
+            List vector embedding sesuai urutan query.
+        """
+        texts = [f"query: {query}" for query in queries]
+        if self.local_index is None:
+            return self.embedding_model.embed_texts(texts)
+
+        if self._embedding_breaker.allow_request():
+            started_at = time.perf_counter()
+            try:
+                vectors = self.embedding_model.embed_texts(
+                    texts,
+                    budget_seconds=EMBEDDING_LATENCY_BUDGET_MS / 1000,
+                )
+            except Exception as exc:  # noqa: BLE001
+                self._embedding_breaker.record_failure()
+                add_event("embedding_fallback", reason=type(exc).__name__)
+                logger.warning("Embedding Jina gagal, fallback ke embedding lokal: %s", exc)
+            else:
+                elapsed_ms = (time.perf_counter() - started_at) * 1000
+                if elapsed_ms > EMBEDDING_LATENCY_BUDGET_MS:
+                    # Hasil tetap dipakai, tapi dihitung gagal supaya breaker bisa terbuka.
+                    self._embedding_breaker.record_failure()
+                    add_event("embedding_over_budget", elapsed_ms=round(elapsed_ms, 2))
+                    logger.warning("Embedding Jina lambat (%.0f ms > budget)", elapsed_ms)
+                else:
+                    self._embedding_breaker.record_success()
+                return vectors
+        else:
+            add_event("embedding_fallback", reason=f"breaker_{self._embedding_breaker.state}")
+
+        return self.local_index.embedder.embed_queries(queries)
+
+    def embedding_status(self) -> Dict[str, object]:
+        """Backend embedding query yang sedang dipakai plus status circuit breaker."""
+        breaker = self._embedding_breaker.snapshot()
+        if self.local_index is None:
+            backend = "jina"
+        else:
+            backend = "jina" if breaker["state"] == "closed" else "local"
+        return {
+            "backend": backend,
+            "local_index_documents": len(self.local_index) if self.local_index is not None else None,
+            "circuit_breaker": breaker,
+        }
     
-    def format_context(self, documents: list) -> str:
+    def format_context(self, documents: List[ScoredDocument]) -> str:
         """
         Format dokumen menjadi context string
         
@@ -203,13 +822,15 @@ class Retriever:
         
         context = "Informasi Relevan:\n\n"
         for i, doc in enumerate(documents, 1):
-            metadata = doc.get("metadata", {})
-            source = metadata.get("source", "Unknown")
-            lokasi = metadata.get("lokasi", "Unknown")
+            source = doc.meta("source", "Unknown")
+            lokasi = doc.meta("lokasi", "Unknown")
+            nama = doc.meta("nama")
             context += f"--- Sumber {i} ---\n"
+            if nama:
+                context += f"Nama Tempat: {nama}\n"
             context += f"Nama Referensi: {source}\n"
             context += f"Lokasi Referensi: {lokasi}\n"
-            context += doc["content"]
+            context += doc.content
             context += f"\n(Sumber: {source})\n\n"
 
         return context
@@ -0,0 +1,146 @@
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, List, Optional
+
+from backend.config.settings import (
+    SESSION_HISTORY_TURNS,
+    SESSION_MAX_SESSIONS,
+    SESSION_SUMMARY_MAX_CHARS,
+    SESSION_TTL_SECONDS,
+)
+from backend.src.document_store import ScoredDocument
+
+# Awalan khas pertanyaan lanjutan ("yang paling dekat UGM?", "kalau yang buka 24 jam?").
+FOLLOW_UP_OPENERS = (
+    "yang",
+    "yg",
+    "kalau",
+    "kalo",
+    "klo",
+    "terus",
+    "trus",
+    "lalu",
+    "tapi",
+    "dari",
+    "di antara",
+    "diantara",
+    "mana",
+    "gimana kalau",
+    "bagaimana dengan",
+    "bandingin",
+)
+# Kata rujukan ke jawaban sebelumnya.
+FOLLOW_UP_REFERENCES = {"itu", "tadi", "tersebut", "sebelumnya", "barusan", "diatas", "tsb"}
+
+# Query retrieval turn lanjutan = query sebelumnya + pertanyaan baru, dipotong dari depan.
+MAX_RETRIEVAL_QUERY_WORDS = 40
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def is_follow_up(question: str) -> bool:
+    """
+    Heuristik murah: apakah pertanyaan merujuk ke jawaban sebelumnya.
+
+    Hanya dari teks; pertanyaan yang menyebut tempat/kota baru tetap dianggap
+    topik baru oleh `Retriever.starts_new_topic`.
+    """
+    lowered = question.lower().strip()
+    if lowered.startswith(tuple(f"{opener} " for opener in FOLLOW_UP_OPENERS)):
+        return True
+    return bool(FOLLOW_UP_REFERENCES.intersection(_WORD.findall(lowered)))
+
+
+def follow_up_query(previous_query: str, question: str) -> str:
+    """Gabungkan query retrieval sebelumnya dengan pertanyaan lanjutan."""
+    words = f"{previous_query} {question}".split()
+    return " ".join(words[-MAX_RETRIEVAL_QUERY_WORDS:])
+
+
+@dataclass
+class SessionTurn:
+    question: str
+    sources: List[str]
+
+
+@dataclass
+class Session:
+    """
+    State satu percakapan: riwayat ringkas plus kandidat dokumen turn terakhir.
+
+    `candidates` adalah record hasil retriever (`ScoredDocument`, baris store +
+    score) dan hanya valid untuk `index_version` yang sama.
+    """
+
+    turns: Deque[SessionTurn] = field(default_factory=lambda: deque(maxlen=SESSION_HISTORY_TURNS))
+    candidates: List[ScoredDocument] = field(default_factory=list)
+    retrieval_query: str = ""
+    index_version: str = ""
+    updated_at: float = 0.0
+
+    def summary(self, max_chars: int = SESSION_SUMMARY_MAX_CHARS) -> str:
+        """Ringkasan percakapan untuk prompt Generator (tanpa panggilan LLM)."""
+        lines: List[str] = []
+        for turn in self.turns:
+            lines.append(f"- User: {turn.question}")
+            if turn.sources:
+                lines.append(f"  Rekomendasi: {', '.join(turn.sources)}")
+        summary = "\n".join(lines)
+        if len(summary) > max_chars:
+            # Turn paling lama yang dipotong.
+            summary = "..." + summary[-max_chars:]
+        return summary
+
+
+class SessionStore:
+    """
+    Session store in-memory dengan TTL dan batas jumlah session (LRU).
+
+    Cukup untuk deployment satu proses, sama seperti InMemoryUsageGuard.
+    Untuk banyak worker/instance, ganti dengan Redis atau store bersama lain.
+    """
+
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS, max_sessions: int = SESSION_MAX_SESSIONS):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max(1, max_sessions)
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Session]:
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                # TTL dihitung dari akses terakhir.
+                session.updated_at = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def save(self, session_id: str, session: Session) -> None:
+        now = time.monotonic()
+        session.updated_at = now
+        with self._lock:
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            self._evict_expired(now)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _evict_expired(self, now: float) -> None:
+        # Urutan OrderedDict = urutan akses terakhir, jadi yang kedaluwarsa ada di depan.
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.updated_at < self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
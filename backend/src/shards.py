@@ -0,0 +1,104 @@
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Set
+
+from backend.config.settings import SHARD_ALIASES, SHARD_REGION_TERMS
+from backend.src.name_index import normalize_name
+
+SHARD_MANIFEST_FILENAME = "shards.json"
+# Index tanpa shard: satu collection default langchain_chroma.
+LEGACY_SHARD = "all"
+LEGACY_COLLECTION = "langchain"
+COLLECTION_PREFIX = "places-"
+# Nilai kolom shard yang terlalu umum untuk dicari di query ("ada yang lainnya?").
+UNROUTABLE_VALUES = {"lainnya", "lain", "other", "others", "unknown"}
+
+_NON_SLUG = re.compile(r"[^a-z0-9]+")
+
+
+def shard_key(value: object) -> str:
+    """Slug shard dari nilai kolom shard ("Kulon Progo" -> "kulon-progo")."""
+    slug = _NON_SLUG.sub("-", normalize_name(str(value or ""))).strip("-")
+    return slug or "lainnya"
+
+
+def collection_name(shard: str) -> str:
+    """Nama collection Chroma untuk satu shard (maks 63 karakter)."""
+    if shard == LEGACY_SHARD:
+        return LEGACY_COLLECTION
+    return f"{COLLECTION_PREFIX}{shard}"[:63]
+
+
+def load_manifest(index_dir: Path) -> Dict[str, dict]:
+    """
+    Daftar shard di direktori index: {shard: {"collection", "values", "documents"}}.
+
+    Index yang dibangun tanpa sharding tidak punya manifest -> {}.
+    """
+    path = Path(index_dir) / SHARD_MANIFEST_FILENAME
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+    return payload.get("shards", {})
+
+
+def save_manifest(index_dir: Path, column: str, shards: Mapping[str, dict]) -> None:
+    """Simpan manifest shard secara atomik (tulis file sementara lalu rename)."""
+    path = Path(index_dir) / SHARD_MANIFEST_FILENAME
+    payload = {"column": column, "shards": {shard: shards[shard] for shard in sorted(shards)}}
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+class ShardRouter:
+    """
+    Pilih shard dari query berdasarkan nama kota/region yang disebut.
+
+    "cafe WFC di Sleman" -> ["sleman"]; query tanpa sebutan kota mencari di
+    semua shard. Alias tambahan diambil dari SHARD_ALIASES. Nama region yang
+    mencakup semua shard (SHARD_REGION_TERMS, mis. "yogyakarta"/"jogja") tidak
+    dipakai untuk routing, karena tempat di UGM/Seturan ada di shard Sleman.
+    """
+
+    def __init__(
+        self,
+        shards: Mapping[str, Iterable[str]],
+        aliases: Optional[Mapping[str, str]] = None,
+        region_terms: Optional[Iterable[str]] = None,
+    ):
+        self.shards: List[str] = sorted(shards)
+        self._ignored = UNROUTABLE_VALUES | {
+            normalize_name(term) for term in (SHARD_REGION_TERMS if region_terms is None else region_terms)
+        }
+        self._terms: Dict[str, set] = {}
+        for shard, values in shards.items():
+            for value in list(values) + [shard.replace("-", " ")]:
+                self._add_term(value, shard)
+        for alias, value in (SHARD_ALIASES if aliases is None else aliases).items():
+            if shard_key(value) in shards:
+                self._add_term(alias, shard_key(value))
+        terms = sorted(self._terms, key=len, reverse=True)
+        self._pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, terms)) + r")\b") if terms else None
+
+    def _add_term(self, value: str, shard: str) -> None:
+        term = normalize_name(value)
+        if term and term not in self._ignored:
+            self._terms.setdefault(term, set()).add(shard)
+
+    def mentioned(self, query: str) -> Set[str]:
+        """Shard yang disebut eksplisit di query (kosong jika tidak ada)."""
+        if self._pattern is None:
+            return set()
+        return {
+            shard for match in self._pattern.finditer(normalize_name(query)) for shard in self._terms[match.group(0)]
+        }
+
+    def route(self, query: Optional[str]) -> List[str]:
+        """Shard yang disebut query, atau semua shard jika tidak ada yang disebut."""
+        if query is None or self._pattern is None or len(self.shards) < 2:
+            return list(self.shards)
+        return sorted(self.mentioned(query)) or list(self.shards)
@@ -0,0 +1,230 @@
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """
+    Rekaman satu request: span per tahap, event (retry, fallback), dan atribut.
+
+    Span dan event dicatat lewat fungsi modul (`span`, `add_event`, ...) yang
+    membaca trace aktif dari context variable, jadi kode di lapisan bawah
+    (embed, generator) tidak perlu menerima objek trace sebagai argumen.
+    """
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.events: List[Dict[str, Any]] = []
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    def finish(self) -> None:
+        self.duration_ms = round(self.elapsed_ms(), 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "error": self.error,
+            "attributes": dict(self.attributes),
+            "spans": list(self.spans),
+            "events": list(self.events),
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def traced(name: str, recorder: Optional["FlightRecorder"] = None, **attributes: Any) -> Iterator[Trace]:
+    """
+    Jalankan blok kode sebagai satu trace; hasilnya diserahkan ke `recorder`.
+
+    Args:
+        name: Nama trace (mis. "chat").
+        recorder: FlightRecorder tujuan; None = trace tidak disimpan.
+        **attributes: Atribut awal trace.
+    """
+    trace = Trace(name, attributes)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    except Exception as exc:
+        trace.error = f"{type(exc).__name__}: {exc}"[:300]
+        raise
+    finally:
+        _current_trace.reset(token)
+        trace.finish()
+        if recorder is not None:
+            recorder.record(trace)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Catat durasi satu tahap di trace aktif (no-op jika tidak ada trace).
+
+    Yield dict span supaya pemanggil bisa menambah atribut setelah tahu
+    hasilnya (mis. jumlah dokumen yang lolos threshold). Tanpa trace aktif,
+    dict-nya dibuang.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield {}
+        return
+    record: Dict[str, Any] = {"name": name, "start_ms": round(trace.elapsed_ms(), 2), **attributes}
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception as exc:
+        record["error"] = type(exc).__name__
+        raise
+    finally:
+        record["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        # list.append atomik, jadi aman dari thread generation paralel (ask_many).
+        trace.spans.append(record)
+
+
+def add_event(name: str, **attributes: Any) -> None:
+    """Catat kejadian sesaat (retry, sleep, fallback) di trace aktif."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.events.append({"name": name, "at_ms": round(trace.elapsed_ms(), 2), **attributes})
+
+
+def set_attributes(**attributes: Any) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+
+def question_attributes(question: str, record_text: bool = False) -> Dict[str, Any]:
+    """
+    Atribut trace untuk teks pertanyaan user.
+
+    Default hanya hash (cukup untuk mengelompokkan pertanyaan yang sama) dan
+    panjangnya, supaya /admin/traces dan file ekspor tidak menyimpan teks
+    user; teks asli hanya dicatat jika `record_text`.
+    """
+    if record_text:
+        return {"question": question, "question_chars": len(question)}
+    digest = hashlib.sha256(question.encode("utf-8")).hexdigest()[:16]
+    return {"question_sha256": digest, "question_chars": len(question)}
+
+
+def increment(**counts: float) -> None:
+    """Tambahkan angka ke atribut trace aktif (mis. total token beberapa panggilan LLM)."""
+    trace = _current_trace.get()
+    if trace is not None:
+        # Bisa dipanggil dari beberapa thread generation sekaligus (ask_many).
+        with trace._lock:
+            for key, value in counts.items():
+                trace.attributes[key] = trace.attributes.get(key, 0) + value
+
+
+class FlightRecorder:
+    """
+    Penyimpanan trace terbaru (ring buffer) plus daftar N trace paling lambat.
+
+    Trace terbaru di-sample (`sample_rate`), sedangkan daftar paling lambat
+    mempertimbangkan semua request supaya tail latency tidak terlewat.
+    Opsional: setiap trace yang disimpan juga ditulis ke file JSONL.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        slowest_n: int,
+        sample_rate: float = 1.0,
+        export_path: Optional[Path] = None,
+    ):
+        self.sample_rate = min(1.0, max(0.0, sample_rate))
+        self.slowest_n = max(0, slowest_n)
+        self.export_path = Path(export_path) if export_path else None
+        self._recent: Deque[Trace] = deque(maxlen=max(1, capacity))
+        self._slowest: List[Tuple[float, int, Trace]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._total = 0
+
+    def record(self, trace: Trace) -> None:
+        duration = trace.duration_ms or 0.0
+        sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        with self._lock:
+            self._total += 1
+            if sampled:
+                self._recent.append(trace)
+            if self.slowest_n:
+                # Min-heap: elemen pertama = trace tercepat di antara yang paling lambat.
+                entry = (duration, next(self._sequence), trace)
+                if len(self._slowest) < self.slowest_n:
+                    heapq.heappush(self._slowest, entry)
+                elif duration > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, entry)
+        if sampled and self.export_path is not None:
+            self._export(trace)
+
+    def _export(self, trace: Trace) -> None:
+        line = json.dumps(trace.to_dict(), ensure_ascii=False)
+        try:
+            with self._export_lock, self.export_path.open("a", encoding="utf-8") as handle:
+                handle.write(line + "\n")
+        except OSError as exc:
+            logger.warning("Gagal menulis trace ke %s: %s", self.export_path, exc)
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Trace terbaru, dari yang paling baru."""
+        with self._lock:
+            traces = list(self._recent)
+        traces.reverse()
+        return [trace.to_dict() for trace in traces[:limit]]
+
+    def slowest(self) -> List[Dict[str, Any]]:
+        """Trace paling lambat, dari yang paling lambat."""
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+        return [trace.to_dict() for _, _, trace in entries]
+
+    def snapshot(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        with self._lock:
+            total = self._total
+        return {
+            "total_requests": total,
+            "sample_rate": self.sample_rate,
+            "recent": self.recent(limit),
+            "slowest": self.slowest(),
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._recent.clear()
+            self._slowest = []
+            self._total = 0
@@ -0,0 +1,256 @@
+import importlib.util
+import logging
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import certifi
+import httpx
+
+from backend.config.settings import (
+    API_TIMEOUT,
+    UPSTREAM_HTTP2_ENABLED,
+    UPSTREAM_KEEPALIVE_SECONDS,
+    UPSTREAM_MAX_CONNECTIONS,
+    UPSTREAM_MAX_KEEPALIVE,
+    UPSTREAM_WARMUP_CONNECTIONS,
+)
+from backend.src.tracing import add_event
+
+logger = logging.getLogger(__name__)
+
+JINA_UPSTREAM = "jina"
+GROQ_UPSTREAM = "groq"
+
+
+def http2_available() -> bool:
+    """HTTP/2 di httpx butuh paket opsional h2 (`pip install httpx[http2]`)."""
+    return importlib.util.find_spec("h2") is not None
+
+
+class UpstreamStats:
+    """Counter satu upstream: request, koneksi baru, handshake TLS, dan saturasi pool."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        # Request yang datang saat semua koneksi sibuk dan pool sudah penuh (harus antre).
+        self.saturated = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.connect_ms = 0.0
+        self.tls_ms = 0.0
+        self.http_versions: Dict[str, int] = {}
+
+    def record_request(self, saturated: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.saturated += int(saturated)
+
+    def record_response(self, http_version: str) -> None:
+        with self._lock:
+            self.http_versions[http_version] = self.http_versions.get(http_version, 0) + 1
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    def record_connect(self, connect_ms: float) -> None:
+        with self._lock:
+            self.new_connections += 1
+            self.connect_ms += connect_ms
+
+    def record_tls(self, tls_ms: float) -> None:
+        with self._lock:
+            self.tls_handshakes += 1
+            self.tls_ms += tls_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.requests
+            return {
+                "requests": requests,
+                "errors": self.errors,
+                "saturated_requests": self.saturated,
+                "saturation_rate": round(self.saturated / requests, 4) if requests else 0.0,
+                "new_connections": self.new_connections,
+                # 1.0 = setiap request membuka koneksi baru (tidak ada reuse).
+                "new_connection_rate": round(self.new_connections / requests, 4) if requests else 0.0,
+                "avg_connect_ms": round(self.connect_ms / self.new_connections, 2) if self.new_connections else 0.0,
+                "tls_handshakes": self.tls_handshakes,
+                "avg_tls_ms": round(self.tls_ms / self.tls_handshakes, 2) if self.tls_handshakes else 0.0,
+                "http_versions": dict(self.http_versions),
+            }
+
+
+class _MeteredTransport(httpx.HTTPTransport):
+    """HTTPTransport yang mencatat saturasi pool dan koneksi baru lewat trace hook httpcore."""
+
+    def __init__(self, name: str, stats: UpstreamStats, limits: httpx.Limits, **kwargs: Any) -> None:
+        super().__init__(limits=limits, **kwargs)
+        self.name = name
+        self.stats = stats
+        self.max_connections = limits.max_connections
+
+    def pool_status(self) -> Dict[str, int]:
+        # httpx tidak mengekspos pool-nya; httpcore.ConnectionPool.connections publik.
+        connections = list(self._pool.connections)
+        return {
+            "open": len(connections),
+            "busy": sum(1 for connection in connections if not connection.is_idle()),
+            "available": sum(1 for connection in connections if connection.is_available()),
+        }
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        pool = self.pool_status()
+        self.stats.record_request(
+            saturated=pool["available"] == 0 and pool["open"] >= (self.max_connections or float("inf"))
+        )
+        request.extensions["trace"] = self._trace_hook(request.extensions.get("trace"))
+        try:
+            response = super().handle_request(request)
+        except Exception:
+            self.stats.record_error()
+            raise
+        self.stats.record_response(response.http_version)
+        return response
+
+    def _trace_hook(self, previous):
+        started: Dict[str, float] = {}
+
+        def hook(event: str, info: Dict[str, Any]) -> None:
+            if event.endswith(".started"):
+                started[event[: -len(".started")]] = time.perf_counter()
+            elif event == "connection.connect_tcp.complete":
+                connect_ms = (time.perf_counter() - started.get("connection.connect_tcp", time.perf_counter())) * 1000
+                self.stats.record_connect(connect_ms)
+                add_event("upstream_connect", upstream=self.name, connect_ms=round(connect_ms, 2))
+            elif event == "connection.start_tls.complete":
+                tls_ms = (time.perf_counter() - started.get("connection.start_tls", time.perf_counter())) * 1000
+                self.stats.record_tls(tls_ms)
+                add_event("upstream_tls", upstream=self.name, tls_ms=round(tls_ms, 2))
+            if previous is not None:
+                previous(event, info)
+
+        return hook
+
+
+class UpstreamRegistry:
+    """
+    Client HTTP bersama per upstream untuk satu proses.
+
+    Semua `EmbeddingModel` (retriever lama/baru saat hot reload, ingest) dan
+    `Generator` memakai pool koneksi yang sama, jadi koneksi keep-alive dan
+    sesi TLS-nya dipakai ulang lintas instance. Satu `SSLContext` dipakai
+    semua upstream (CA bundle dimuat sekali per proses).
+    """
+
+    def __init__(
+        self,
+        max_connections: int = UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive: int = UPSTREAM_MAX_KEEPALIVE,
+        keepalive_seconds: float = UPSTREAM_KEEPALIVE_SECONDS,
+        http2: bool = UPSTREAM_HTTP2_ENABLED,
+    ) -> None:
+        self.limits = httpx.Limits(
+            max_connections=max(1, max_connections),
+            max_keepalive_connections=max(0, min(max_keepalive, max_connections)),
+            keepalive_expiry=keepalive_seconds,
+        )
+        self.http2 = http2 and http2_available()
+        if http2 and not self.http2:
+            logger.info("Paket h2 tidak terpasang, client upstream memakai HTTP/1.1")
+        self._lock = threading.Lock()
+        self._ssl_context: Optional[ssl.SSLContext] = None
+        self._clients: Dict[str, httpx.Client] = {}
+        self._transports: Dict[str, _MeteredTransport] = {}
+        self._warmed: Dict[str, int] = {}
+
+    def _shared_ssl_context(self) -> ssl.SSLContext:
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context(cafile=certifi.where())
+        return self._ssl_context
+
+    def client(self, name: str) -> httpx.Client:
+        """Client bersama untuk upstream `name`, dibuat saat pertama diminta."""
+        with self._lock:
+            client = self._clients.get(name)
+            if client is None:
+                transport = _MeteredTransport(
+                    name,
+                    UpstreamStats(),
+                    self.limits,
+                    verify=self._shared_ssl_context(),
+                    http2=self.http2,
+                )
+                client = httpx.Client(transport=transport, timeout=API_TIMEOUT)
+                self._clients[name] = client
+                self._transports[name] = transport
+            return client
+
+    def warm_up(self, name: str, url: str, connections: int = UPSTREAM_WARMUP_CONNECTIONS) -> int:
+        """
+        Buka koneksi (TCP + TLS) ke origin `url` sebelum request pertama user.
+
+        Request HEAD paralel ke origin; status respons tidak penting, yang
+        penting koneksinya kembali ke pool. Gagal warm-up hanya dicatat.
+
+        Returns:
+            Jumlah request warm-up yang mendapat respons.
+        """
+        if connections <= 0:
+            return 0
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}/"
+        client = self.client(name)
+
+        def head(_: int) -> bool:
+            try:
+                client.head(origin, timeout=API_TIMEOUT)
+                return True
+            except httpx.HTTPError as exc:
+                logger.warning("Warm-up koneksi %s ke %s gagal: %s", name, origin, exc)
+                return False
+
+        with ThreadPoolExecutor(max_workers=connections, thread_name_prefix=f"warmup-{name}") as pool:
+            warmed = sum(pool.map(head, range(connections)))
+        with self._lock:
+            self._warmed[name] = self._warmed.get(name, 0) + warmed
+        logger.info("Warm-up %s: %s/%s koneksi ke %s", name, warmed, connections, origin)
+        return warmed
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Konfigurasi pool plus counter per upstream, dipakai `GET /admin/upstreams`."""
+        with self._lock:
+            transports = dict(self._transports)
+            warmed = dict(self._warmed)
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_seconds": self.limits.keepalive_expiry,
+            "upstreams": {
+                name: {
+                    **transport.stats.snapshot(),
+                    "pool": transport.pool_status(),
+                    "warmed_up": warmed.get(name, 0),
+                }
+                for name, transport in sorted(transports.items())
+            },
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._transports.clear()
+        for client in clients:
+            client.close()
+
+
+# Satu registry per proses (worker uvicorn, proses job ingest).
+upstreams = UpstreamRegistry()
@@ -0,0 +1,178 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterator, Optional
+
+
+@dataclass
+class AdmissionResult:
+    admitted: bool
+    detail: str
+    retry_after_seconds: int
+    queue_wait_ms: float = 0.0
+
+
+class AdmissionController:
+    """
+    Bounded concurrency for the RAG pipeline with a bounded FIFO wait queue.
+
+    Requests beyond ``max_concurrent`` wait in the queue for at most
+    ``queue_timeout_seconds`` (or the client's own budget, if shorter).
+    Requests are shed immediately when the queue is full or when the
+    expected wait already exceeds that budget, so an overload turns into
+    fast 503s instead of requests piling up behind slow upstream calls.
+
+    Cheap requests (answered locally, no Jina/Groq call) bypass the limit.
+    A request that fans out over several workers (``/api/chat/batch``) takes
+    one slot per worker, so it counts as that many concurrent requests.
+
+    Waiting requests block their worker thread, so ``max_concurrent +
+    max_queue`` should stay below the server's thread pool size. Like
+    InMemoryUsageGuard, this is per process.
+    """
+
+    # Weight of the newest sample in the service-time moving average.
+    SERVICE_TIME_ALPHA = 0.2
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout_seconds: float,
+        initial_service_seconds: float = 2.0,
+    ) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout_seconds = max(0.0, queue_timeout_seconds)
+
+        self._active = 0
+        self._waiting: Deque[object] = deque()
+        self._service_seconds = initial_service_seconds
+        self._condition = threading.Condition()
+        self._counters: Dict[str, int] = {
+            "admitted": 0,
+            "admitted_cheap": 0,
+            "queued": 0,
+            "shed_queue_full": 0,
+            "shed_over_budget": 0,
+            "shed_queue_timeout": 0,
+        }
+
+    def _expected_wait(self, position: int) -> float:
+        # A slot frees up roughly every service_time / max_concurrent seconds.
+        return (position + 1) * self._service_seconds / self.max_concurrent
+
+    def _clamp_slots(self, slots: int) -> int:
+        # A request wider than the limit would never fit; it runs alone instead.
+        return min(max(1, slots), self.max_concurrent)
+
+    def acquire(
+        self,
+        budget_seconds: Optional[float] = None,
+        cheap: bool = False,
+        slots: int = 1,
+    ) -> AdmissionResult:
+        """
+        Take a pipeline slot, waiting in the queue if needed.
+
+        Args:
+            budget_seconds: How long the client is willing to wait in total;
+                None = only ``queue_timeout_seconds`` applies.
+            cheap: Request is answered without upstream calls; admitted at once
+                and does not count against the limit.
+            slots: Pipeline slots the request occupies (its worker count),
+                capped at ``max_concurrent``. Release with the same value.
+        """
+        if cheap:
+            with self._condition:
+                self._counters["admitted_cheap"] += 1
+            return AdmissionResult(True, "OK", 0)
+
+        timeout = self.queue_timeout_seconds
+        if budget_seconds is not None:
+            # The pipeline itself needs time too; queueing only makes sense if it fits.
+            timeout = min(timeout, max(0.0, budget_seconds - self._service_seconds))
+
+        slots = self._clamp_slots(slots)
+        started_at = time.monotonic()
+        with self._condition:
+            if self._active + slots <= self.max_concurrent and not self._waiting:
+                self._active += slots
+                self._counters["admitted"] += 1
+                return AdmissionResult(True, "OK", 0)
+
+            expected_wait = self._expected_wait(len(self._waiting))
+            if len(self._waiting) >= self.max_queue:
+                return self._shed("shed_queue_full", expected_wait)
+            if expected_wait > timeout:
+                return self._shed("shed_over_budget", expected_wait)
+
+            ticket = object()
+            self._waiting.append(ticket)
+            self._counters["queued"] += 1
+            deadline = started_at + timeout
+            try:
+                while self._waiting[0] is not ticket or self._active + slots > self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return self._shed("shed_queue_timeout", self._expected_wait(self._waiting.index(ticket)))
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting.remove(ticket)
+                # The next ticket in line may be able to proceed now.
+                self._condition.notify_all()
+
+            self._active += slots
+            self._counters["admitted"] += 1
+        return AdmissionResult(True, "OK", 0, queue_wait_ms=(time.monotonic() - started_at) * 1000)
+
+    def release(self, service_seconds: Optional[float] = None, slots: int = 1, items: int = 1) -> None:
+        """
+        Free the request's slots and feed its service time into the moving average.
+
+        A multi-item request (a batch of ``items`` questions over ``slots``
+        workers) contributes its per-item time, ``service_seconds * slots /
+        items``, so one long batch does not inflate the wait estimate that
+        sheds single ``/api/chat`` requests.
+        """
+        slots = self._clamp_slots(slots)
+        with self._condition:
+            self._active = max(0, self._active - slots)
+            if service_seconds is not None:
+                sample = service_seconds * slots / max(1, items)
+                self._service_seconds += self.SERVICE_TIME_ALPHA * (sample - self._service_seconds)
+            self._condition.notify_all()
+
+    def _shed(self, reason: str, expected_wait: float) -> AdmissionResult:
+        self._counters[reason] += 1
+        return AdmissionResult(
+            admitted=False,
+            detail="Server sedang sibuk. Coba lagi sebentar.",
+            retry_after_seconds=max(1, math.ceil(expected_wait)),
+        )
+
+    @contextmanager
+    def slot(self, cheap: bool = False, slots: int = 1, items: int = 1) -> Iterator[None]:
+        """Hold admitted slots for the duration of the block and feed its service time back."""
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            if not cheap:
+                self.release(time.monotonic() - started_at, slots=slots, items=items)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._condition:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "queue_timeout_seconds": self.queue_timeout_seconds,
+                "active": self._active,
+                "queue_depth": len(self._waiting),
+                "service_time_ms": round(self._service_seconds * 1000, 1),
+                "expected_wait_ms": round(self._expected_wait(len(self._waiting)) * 1000, 1),
+                **self._counters,
+            }
@@ -1,19 +1,47 @@
 import logging
+import random
+import secrets
+import json
+import threading
 import time
-from contextlib import asynccontextmanager
-from typing import List, Optional
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from typing import Annotated, Dict, List, Literal, Optional
 
-from fastapi import FastAPI, HTTPException, Request, status
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, Field
 
 from backend.config.settings import (
+    ADMIN_API_TOKEN,
+    ADMISSION_ENABLED,
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT_SECONDS,
     ALLOWED_ORIGINS,
     API_ACCESS_TOKEN,
+    BATCH_DAILY_QUESTION_LIMIT,
+    BATCH_MAX_QUESTIONS,
+    BATCH_MAX_WORKERS,
+    BATCH_QUESTIONS_PER_MINUTE,
     DAILY_REQUEST_LIMIT_PER_IP,
+    INDEX_WATCH_INTERVAL_SECONDS,
+    PROFILE_SAMPLE_RATE,
     RATE_LIMIT_PER_MINUTE,
+    TRACE_BUFFER_SIZE,
+    TRACE_ENABLED,
+    TRACE_EXPORT_PATH,
+    TRACE_RECORD_QUESTIONS,
+    TRACE_SAMPLE_RATE,
+    TRACE_SLOWEST_N,
 )
+from backend.src.index_versions import current_index_dir
+from backend.src.ingest_jobs import IngestJobConflict, IngestJobRunner
+from backend.src.profiling import resolve_format
 from backend.src.rag_service import RAGService
+from backend.src.tracing import FlightRecorder, question_attributes, set_attributes, traced
+from backend.src.upstreams import upstreams
+from backend.web_api.admission import AdmissionController
 from backend.web_api.security import InMemoryUsageGuard
 
 logging.basicConfig(
@@ -23,6 +51,9 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 MAX_QUESTION_LENGTH = 200
+SESSION_ID_PATTERN = r"^[A-Za-z0-9_-]{8,64}$"
+RESULT_TOKEN_PATTERN = r"^[A-Za-z0-9_-]{16,64}$"
+AnswerMode = Literal["auto", "extractive", "generate"]
 
 rag_service: Optional[RAGService] = None
 startup_error: Optional[str] = None
@@ -30,10 +61,32 @@ usage_guard = InMemoryUsageGuard(
     per_minute_limit=RATE_LIMIT_PER_MINUTE,
     daily_limit_per_ip=DAILY_REQUEST_LIMIT_PER_IP,
 )
+# Batches (eval/content runs) draw from their own per-question quota, not the chat quota.
+batch_usage_guard = InMemoryUsageGuard(
+    per_minute_limit=BATCH_QUESTIONS_PER_MINUTE,
+    daily_limit_per_ip=BATCH_DAILY_QUESTION_LIMIT,
+)
+admission = AdmissionController(
+    max_concurrent=ADMISSION_MAX_CONCURRENT,
+    max_queue=ADMISSION_MAX_QUEUE,
+    queue_timeout_seconds=ADMISSION_QUEUE_TIMEOUT_SECONDS,
+)
+flight_recorder = FlightRecorder(
+    capacity=TRACE_BUFFER_SIZE,
+    slowest_n=TRACE_SLOWEST_N,
+    sample_rate=TRACE_SAMPLE_RATE,
+    export_path=TRACE_EXPORT_PATH or None,
+)
 
 
 class ChatRequest(BaseModel):
     question: str = Field(..., min_length=1, max_length=MAX_QUESTION_LENGTH)
+    # Client-generated (e.g. a UUID); enables follow-up questions within a conversation.
+    session_id: Optional[str] = Field(default=None, pattern=SESSION_ID_PATTERN)
+    # "extractive" forces the LLM-free listing answer, "generate" always calls the LLM.
+    answer_mode: AnswerMode = "auto"
+    # Facet pre-filter, same keys as GET /api/places: {"kota": [...], "kategori": [...], "jam": [...]}.
+    filters: Optional[Dict[str, List[str]]] = None
 
 
 class SourceItem(BaseModel):
@@ -46,24 +99,97 @@ class ChatResponse(BaseModel):
     sources: List[SourceItem]
     follow_up_suggestions: List[str] = Field(default_factory=list)
     fallback_type: Optional[str] = None
+    session_id: Optional[str] = None
+    # Pass to POST /api/chat/more for the next places of the same search; None when none are left.
+    result_token: Optional[str] = None
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+class MoreRequest(BaseModel):
+    result_token: str = Field(..., pattern=RESULT_TOKEN_PATTERN)
+    answer_mode: AnswerMode = "auto"
+
+
+class BatchChatRequest(BaseModel):
+    questions: List[Annotated[str, Field(min_length=1, max_length=MAX_QUESTION_LENGTH)]] = Field(
+        ...,
+        min_length=1,
+        max_length=BATCH_MAX_QUESTIONS,
+    )
+    answer_mode: AnswerMode = "auto"
+
+
+class BatchChatItem(BaseModel):
+    question: str
+    result: Optional[ChatResponse] = None
+    error: Optional[str] = None
+    timings: Dict[str, float] = Field(default_factory=dict)
+
+
+class BatchChatResponse(BaseModel):
+    results: List[BatchChatItem]
+
+
+class IngestRequest(BaseModel):
+    # City/region shard to rebuild (e.g. "Sleman"); omitted = full rebuild.
+    shard: Optional[str] = Field(default=None, min_length=1, max_length=100)
+    # Continue the latest unpublished build from its checkpoint.
+    resume: bool = False
+
+
+def initialize_rag_service() -> None:
     global rag_service, startup_error
 
     try:
         logger.info("Initializing RAG service...")
         rag_service = RAGService()
         startup_error = None
-        logger.info("RAG service initialized.")
+        logger.info("RAG service initialized (index %s).", rag_service.retriever.index_version)
+        rag_service.start_index_watcher(INDEX_WATCH_INTERVAL_SECONDS)
+        # Handshakes happen off the startup path; early requests just find fewer warm connections.
+        threading.Thread(target=rag_service.warm_up_connections, name="upstream-warmup", daemon=True).start()
     except Exception as exc:
         rag_service = None
         startup_error = str(exc)
         logger.exception("Failed to initialize RAG service: %s", exc)
 
+
+def activate_published_index(version: str) -> None:
+    """Serve an index version published by an ingest job."""
+    if rag_service is None:
+        initialize_rag_service()
+        return
+    result = rag_service.reload_index()
+    logger.info("Index reload after ingest job finished: %s", result)
+
+
+ingest_jobs = IngestJobRunner(on_published=activate_published_index)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global startup_error
+
+    validate_batch_limits()
+    if current_index_dir().exists():
+        initialize_rag_service()
+    else:
+        # Build the missing index in the ingest process instead of blocking startup;
+        # the service comes up once the job publishes it.
+        try:
+            job = ingest_jobs.start()
+            startup_error = f"Index sedang dibangun (job ingest {job['job_id']})."
+            logger.warning("No index found, building it in ingest job %s", job["job_id"])
+        except Exception as exc:
+            startup_error = str(exc)
+            logger.exception("Failed to start ingest job: %s", exc)
+
     yield
 
+    ingest_jobs.shutdown()
+    if rag_service:
+        rag_service.stop_index_watcher()
+    upstreams.close()
+
 
 app = FastAPI(
     title="Coffee Shop RAG API",
@@ -113,26 +239,52 @@ def enforce_access_token(request: Request) -> None:
         )
 
 
+def has_admin_token(request: Request) -> bool:
+    """True if X-Admin-Token matches ADMIN_API_TOKEN (constant time; never raises)."""
+    if not ADMIN_API_TOKEN:
+        return False
+    # Compare bytes: compare_digest on str raises TypeError for non-ASCII input.
+    provided = request.headers.get("x-admin-token", "").encode()
+    return secrets.compare_digest(provided, ADMIN_API_TOKEN.encode())
+
+
+def enforce_admin_token(request: Request) -> None:
+    # Admin endpoints are disabled entirely unless ADMIN_API_TOKEN is set.
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    if not has_admin_token(request):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Unauthorized.",
+        )
+
+
 @app.get("/health")
 def health():
     status = "ok" if rag_service else "error"
     return {
         "status": status,
         "service_ready": rag_service is not None,
+        "index_version": rag_service.retriever.index_version if rag_service else None,
+        "embedding_backend": (
+            rag_service.retriever.embedding_status()["backend"] if rag_service else None
+        ),
         "error": startup_error,
     }
 
 
-@app.post("/api/chat", response_model=ChatResponse)
-def chat(payload: ChatRequest, request: Request):
-    if not rag_service:
-        message = startup_error or "Service belum siap."
-        raise HTTPException(status_code=503, detail=message)
+def validate_batch_limits() -> None:
+    """Refuse to start when a full batch could never fit in the batch quota."""
+    if BATCH_MAX_QUESTIONS > min(BATCH_QUESTIONS_PER_MINUTE, BATCH_DAILY_QUESTION_LIMIT):
+        raise ValueError(
+            "BATCH_MAX_QUESTIONS tidak boleh lebih besar dari BATCH_QUESTIONS_PER_MINUTE "
+            "dan BATCH_DAILY_QUESTION_LIMIT."
+        )
 
-    enforce_access_token(request)
 
-    client_ip = get_client_ip(request)
-    limit_result = usage_guard.check_and_consume(client_ip)
+def enforce_usage_limit(client_ip: str, units: int = 1, guard: InMemoryUsageGuard = usage_guard) -> None:
+    limit_result = guard.check_and_consume(client_ip, units=units)
     if not limit_result.allowed:
         raise HTTPException(
             status_code=429,
@@ -140,16 +292,107 @@ def chat(payload: ChatRequest, request: Request):
             headers={"Retry-After": str(limit_result.retry_after_seconds)},
         )
 
+
+def get_client_budget(request: Request) -> Optional[float]:
+    """Seconds the client is willing to wait (X-Request-Timeout), or None."""
+    try:
+        budget = float(request.headers.get("x-request-timeout", ""))
+    except ValueError:
+        return None
+    return budget if budget > 0 else None
+
+
+@contextmanager
+def admitted(request: Request, cheap: bool = False, slots: int = 1, items: int = 1):
+    """Hold pipeline slots for the block, or shed the request with 503 + Retry-After."""
+    if not ADMISSION_ENABLED:
+        yield
+        return
+
+    result = admission.acquire(get_client_budget(request), cheap=cheap, slots=slots)
+    if not result.admitted:
+        set_attributes(shed=True)
+        raise HTTPException(
+            status_code=503,
+            detail=result.detail,
+            headers={"Retry-After": str(result.retry_after_seconds)},
+        )
+    set_attributes(queue_wait_ms=round(result.queue_wait_ms, 2), cheap=cheap, slots=slots)
+    with admission.slot(cheap, slots=slots, items=items):
+        yield
+
+
+def trace_request(name: str, **attributes):
+    """Record the request in the flight recorder, unless tracing is disabled."""
+    if not TRACE_ENABLED:
+        return nullcontext(None)
+    return traced(name, flight_recorder, **attributes)
+
+
+def requested_profile(request: Request) -> Optional[str]:
+    """Profile format for this request: admin-authenticated X-Profile header, else sampling."""
+    header = request.headers.get("x-profile")
+    if header is not None and has_admin_token(request):
+        try:
+            return resolve_format(header)
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=str(exc)) from exc
+    # Without a valid admin token the header is ignored rather than rejected.
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return resolve_format(None)
+    return None
+
+
+def require_rag_service() -> RAGService:
+    if not rag_service:
+        message = startup_error or "Service belum siap."
+        raise HTTPException(status_code=503, detail=message)
+    return rag_service
+
+
+@app.post("/api/chat", response_model=ChatResponse)
+def chat(payload: ChatRequest, request: Request, response: Response):
+    service = require_rag_service()
+
+    enforce_access_token(request)
+
+    client_ip = get_client_ip(request)
+    enforce_usage_limit(client_ip)
+
     question = payload.question.strip()
     if not question:
         raise HTTPException(status_code=422, detail="Question tidak boleh kosong.")
 
+    # Out-of-scope replies cost no upstream calls, so they never wait behind the RAG pipeline.
+    cheap = service.answers_locally(question, payload.session_id)
+    profile = requested_profile(request)
     started_at = time.perf_counter()
     try:
-        result = rag_service.ask(question)
+        with trace_request(
+            "chat",
+            **question_attributes(question, record_text=TRACE_RECORD_QUESTIONS),
+            session=payload.session_id is not None,
+        ) as trace:
+            with admitted(request, cheap=cheap):
+                result = service.ask(
+                    question,
+                    session_id=payload.session_id,
+                    answer_mode=payload.answer_mode,
+                    filters=payload.filters,
+                    profile=profile,
+                )
+        if "profile" in result:
+            response.headers["X-Profile-Id"] = result["profile"]["profile_id"]
         latency_ms = (time.perf_counter() - started_at) * 1000
-        logger.info("Chat processed in %.2f ms (ip=%s)", latency_ms, client_ip)
-        return result
+        logger.info(
+            "Chat processed in %.2f ms (ip=%s, trace=%s)",
+            latency_ms,
+            client_ip,
+            trace.trace_id if trace else None,
+        )
+        return {**result, "session_id": payload.session_id}
+    except HTTPException:
+        raise
     except ValueError as exc:
         raise HTTPException(status_code=422, detail=str(exc)) from exc
     except Exception as exc:
@@ -159,3 +402,190 @@ def chat(payload: ChatRequest, request: Request):
             status_code=500,
             detail="Terjadi kesalahan saat memproses pertanyaan.",
         ) from exc
+
+
+@app.post("/api/chat/more", response_model=ChatResponse)
+def chat_more(payload: MoreRequest, request: Request):
+    service = require_rag_service()
+
+    enforce_access_token(request)
+
+    client_ip = get_client_ip(request)
+    enforce_usage_limit(client_ip)
+
+    started_at = time.perf_counter()
+    try:
+        # No embedding or search, but still a generation: it queues like /api/chat.
+        with trace_request("chat_more") as trace, admitted(request):
+            result = service.more(payload.result_token, answer_mode=payload.answer_mode)
+    except HTTPException:
+        raise
+    except Exception as exc:
+        latency_ms = (time.perf_counter() - started_at) * 1000
+        logger.exception("Chat more failed after %.2f ms: %s", latency_ms, exc)
+        raise HTTPException(
+            status_code=500,
+            detail="Terjadi kesalahan saat memproses pertanyaan.",
+        ) from exc
+    if result is None:
+        raise HTTPException(status_code=404, detail="result_token tidak ditemukan atau sudah kedaluwarsa.")
+    logger.info(
+        "Chat more processed in %.2f ms (ip=%s, trace=%s)",
+        (time.perf_counter() - started_at) * 1000,
+        client_ip,
+        trace.trace_id if trace else None,
+    )
+    return result
+
+
+@app.post("/api/chat/batch", response_model=BatchChatResponse)
+def chat_batch(payload: BatchChatRequest, request: Request):
+    service = require_rag_service()
+
+    enforce_access_token(request)
+
+    # Every unique question is one unit of the separate batch quota; the whole
+    # batch is rejected when the remaining quota cannot cover it.
+    unique_questions = {question.strip() for question in payload.questions} - {""}
+    client_ip = get_client_ip(request)
+    enforce_usage_limit(client_ip, units=len(unique_questions), guard=batch_usage_guard)
+
+    # The batch runs up to `workers` generations at once, so it holds that many
+    # admission slots instead of one; its service time is fed back per question.
+    workers = max(1, min(BATCH_MAX_WORKERS, len(unique_questions)))
+    started_at = time.perf_counter()
+    with trace_request("chat_batch", questions=len(payload.questions)):
+        with admitted(request, slots=workers, items=len(unique_questions)):
+            results = service.ask_many(payload.questions, max_workers=workers, answer_mode=payload.answer_mode)
+    latency_ms = (time.perf_counter() - started_at) * 1000
+    failed = sum(1 for item in results if item["error"])
+    logger.info(
+        "Chat batch of %s processed in %.2f ms (failed=%s, ip=%s)",
+        len(results),
+        latency_ms,
+        failed,
+        client_ip,
+    )
+    return {"results": results}
+
+
+@app.get("/api/places")
+def browse_places(
+    request: Request,
+    kota: Annotated[List[str], Query()] = [],
+    kategori: Annotated[List[str], Query()] = [],
+    jam: Annotated[List[str], Query()] = [],
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=20, ge=1, le=100),
+):
+    service = require_rag_service()
+
+    # Filter chips hit this on every click; it is answered from in-memory bitsets
+    # without Jina, Chroma or Groq, so it skips the usage limit and admission.
+    enforce_access_token(request)
+
+    filters = {"kota": kota, "kategori": kategori, "jam": jam}
+    try:
+        return service.browse(filters, offset=offset, limit=limit)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+
+
+def reload_index_in_background(service: RAGService) -> None:
+    try:
+        result = service.reload_index()
+        logger.info("Index reload finished: %s", result)
+    except Exception as exc:
+        logger.exception("Index reload failed: %s", exc)
+
+
+@app.get("/admin/index")
+def admin_index_status(request: Request):
+    enforce_admin_token(request)
+    service = require_rag_service()
+    return service.index_status()
+
+
+@app.post("/admin/index/reload", status_code=status.HTTP_202_ACCEPTED)
+def admin_index_reload(request: Request, background_tasks: BackgroundTasks):
+    enforce_admin_token(request)
+    service = require_rag_service()
+
+    # Loading the new index can take a while; requests keep using the old one meanwhile.
+    background_tasks.add_task(reload_index_in_background, service)
+    return {"status": "accepted", "current_version": service.retriever.index_version}
+
+
+@app.post("/admin/ingest", status_code=status.HTTP_202_ACCEPTED)
+def admin_ingest_start(request: Request, payload: Optional[IngestRequest] = None):
+    enforce_admin_token(request)
+    payload = payload or IngestRequest()
+    try:
+        return ingest_jobs.start(shard=payload.shard, resume=payload.resume)
+    except IngestJobConflict as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    except (FileNotFoundError, ValueError) as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+
+
+@app.get("/admin/ingest")
+def admin_ingest_jobs(request: Request):
+    enforce_admin_token(request)
+    return {"jobs": ingest_jobs.jobs()}
+
+
+@app.get("/admin/ingest/{job_id}")
+def admin_ingest_status(job_id: str, request: Request):
+    enforce_admin_token(request)
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job ingest tidak ditemukan.")
+    return job
+
+
+@app.post("/admin/ingest/{job_id}/cancel", status_code=status.HTTP_202_ACCEPTED)
+def admin_ingest_cancel(job_id: str, request: Request):
+    enforce_admin_token(request)
+    job = ingest_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job ingest tidak ditemukan.")
+    return job
+
+
+@app.get("/admin/admission")
+def admin_admission(request: Request):
+    enforce_admin_token(request)
+    return {"enabled": ADMISSION_ENABLED, **admission.snapshot()}
+
+
+@app.get("/admin/generation")
+def admin_generation(request: Request):
+    enforce_admin_token(request)
+    service = require_rag_service()
+    return {"tiers": service.generator.tiers, "stats": service.generator.tier_stats()}
+
+
+@app.get("/admin/upstreams")
+def admin_upstreams(request: Request):
+    # Process-wide pools, so this works before the service is ready too.
+    enforce_admin_token(request)
+    return upstreams.snapshot()
+
+
+@app.get("/admin/traces")
+def admin_traces(
+    request: Request,
+    limit: int = Query(default=50, ge=1, le=1000),
+    format: str = Query(default="json", pattern="^(json|jsonl)$"),
+):
+    enforce_admin_token(request)
+    snapshot = flight_recorder.snapshot(limit=limit)
+    if format == "jsonl":
+        # One trace per line (recent first, then the slowest list) for offline analysis.
+        lines = [
+            json.dumps({"list": name, **trace}, ensure_ascii=False)
+            for name in ("recent", "slowest")
+            for trace in snapshot[name]
+        ]
+        return PlainTextResponse("\n".join(lines) + "\n", media_type="application/x-ndjson")
+    return snapshot
@@ -29,7 +29,21 @@ class InMemoryUsageGuard:
         self._daily_counts: Dict[Tuple[str, dt.date], int] = defaultdict(int)
         self._lock = threading.Lock()
 
-    def check_and_consume(self, client_ip: str) -> RateLimitResult:
+    def check_and_consume(self, client_ip: str, units: int = 1) -> RateLimitResult:
+        """
+        Consume `units` of the client's quota, or none if they do not all fit.
+
+        A batch of N questions costs N units, so it cannot do more work than
+        N single requests would be allowed to.
+        """
+        units = max(1, units)
+        if units > self.per_minute_limit:
+            return RateLimitResult(
+                allowed=False,
+                detail=f"Maksimal {self.per_minute_limit} pertanyaan per menit; pecah batch menjadi lebih kecil.",
+                retry_after_seconds=60,
+            )
+
         now = time.time()
         today = dt.date.today()
 
@@ -40,8 +54,10 @@ class InMemoryUsageGuard:
             while window and window[0] < cutoff:
                 window.popleft()
 
-            if len(window) >= self.per_minute_limit:
-                retry_after = int(max(1, 60 - (now - window[0])))
+            overflow = len(window) + units - self.per_minute_limit
+            if overflow > 0:
+                # Wait until enough of the oldest requests leave the window.
+                retry_after = int(max(1, 60 - (now - window[overflow - 1])))
                 return RateLimitResult(
                     allowed=False,
                     detail="Rate limit tercapai. Coba lagi sebentar.",
@@ -50,7 +66,7 @@ class InMemoryUsageGuard:
 
             # Daily cap per IP.
             day_key = (client_ip, today)
-            if self._daily_counts[day_key] >= self.daily_limit_per_ip:
+            if self._daily_counts[day_key] + units > self.daily_limit_per_ip:
                 return RateLimitResult(
                     allowed=False,
                     detail="Batas harian penggunaan API tercapai.",
@@ -58,8 +74,8 @@ class InMemoryUsageGuard:
                 )
 
             # Consume request.
-            window.append(now)
-            self._daily_counts[day_key] += 1
+            window.extend([now] * units)
+            self._daily_counts[day_key] += units
 
         return RateLimitResult(
             allowed=True,
@@ -4,11 +4,21 @@ const BACKEND_API_URL =
   process.env.BACKEND_API_URL ?? "http://127.0.0.1:8000/api/chat";
 const BACKEND_API_TOKEN = process.env.BACKEND_API_TOKEN ?? "";
 const MAX_QUESTION_LENGTH = 200;
+const ANSWER_MODES = ["auto", "extractive", "generate"];
 
 export async function POST(req: NextRequest) {
   try {
-    const body = (await req.json()) as { question?: string };
+    const body = (await req.json()) as {
+      question?: string;
+      session_id?: string;
+      answer_mode?: string;
+    };
     const question = (body.question ?? "").trim();
+    const sessionId = body.session_id || undefined;
+    // Unknown values fall back to the backend default ("auto").
+    const answerMode = ANSWER_MODES.includes(body.answer_mode ?? "")
+      ? body.answer_mode
+      : undefined;
 
     if (!question) {
       return NextResponse.json(
@@ -35,7 +45,11 @@ export async function POST(req: NextRequest) {
     const upstream = await fetch(BACKEND_API_URL, {
       method: "POST",
       headers,
-      body: JSON.stringify({ question }),
+      body: JSON.stringify({
+        question,
+        session_id: sessionId,
+        answer_mode: answerMode,
+      }),
       cache: "no-store",
     });
 
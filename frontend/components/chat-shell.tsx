@@ -94,6 +94,8 @@ export default function ChatShell() {
   const [initialSuggestions, setInitialSuggestions] = useState<string[]>([]);
 
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  // One backend session per conversation, so follow-up questions keep their context.
+  const sessionIdRef = useRef<string>(crypto.randomUUID());
   const shouldReduceMotion = useReducedMotion();
 
   const remainingChars = useMemo(
@@ -138,7 +140,7 @@ export default function ChatShell() {
     setIsLoading(true);
 
     try {
-      const result = await askChat(sanitized);
+      const result = await askChat(sanitized, sessionIdRef.current);
       const assistantMessage: Message = {
         id: crypto.randomUUID(),
         role: "assistant",
@@ -174,6 +176,7 @@ export default function ChatShell() {
     setMessages([]);
     setQuestion("");
     setError(null);
+    sessionIdRef.current = crypto.randomUUID();
   }, [isLoading]);
 
   const applySuggestion = useCallback((suggestion: string) => {
@@ -1,12 +1,20 @@
-import type { ChatResponse } from "@/types/chat";
+import type { AnswerMode, ChatResponse } from "@/types/chat";
 
-export async function askChat(question: string): Promise<ChatResponse> {
+export async function askChat(
+  question: string,
+  sessionId?: string,
+  answerMode?: AnswerMode,
+): Promise<ChatResponse> {
   const response = await fetch("/api/chat", {
     method: "POST",
     headers: {
       "Content-Type": "application/json",
     },
-    body: JSON.stringify({ question }),
+    body: JSON.stringify({
+      question,
+      session_id: sessionId,
+      answer_mode: answerMode,
+    }),
   });
 
   if (!response.ok) {
@@ -3,11 +3,14 @@ export type SourceItem = {
   lokasi: string;
 };
 
+export type AnswerMode = "auto" | "extractive" | "generate";
+
 export type ChatResponse = {
   answer: string;
   sources: SourceItem[];
   follow_up_suggestions?: string[];
   fallback_type?: "too_generic" | "out_of_scope" | null;
+  session_id?: string | null;
 };
 
 export type Message = {
@@ -2,14 +2,21 @@ import os
 from dotenv import load_dotenv
 
 import sys
+import json
+import time
+import argparse
 import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import redirect_stdout
 from pathlib import Path
+from typing import Dict, Iterator, Optional, Set, TextIO
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 load_dotenv(ROOT_DIR / ".env")
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
+from backend.src.profiling import PROFILE_FORMATS
 from backend.src.rag_service import RAGService
 
 import warnings
@@ -48,19 +55,20 @@ class RAGApp:
         
         print()
     
-    def query(self, question: str) -> dict:
+    def query(self, question: str, profile: Optional[str] = None) -> dict:
         """
         Query ke sistem RAG
         
         Args:
             question: Pertanyaan dari user
+            profile: Format profile (speedscope/collapsed); None = tanpa profiling
             
         Returns:
             Dictionary dengan jawaban dan sumber
         """
         print(f"Query: {question}")
         print("-" * 60)
-        return self.rag_service.ask(question)
+        return self.rag_service.ask(question, profile=profile)
     
     def print_response(self, response: dict):
         """
@@ -82,9 +90,215 @@ class RAGApp:
                 print(f"{i}. {source['nama']} - {source['lokasi']}")
         print()
 
+        if response.get("profile"):
+            profile = response["profile"]
+            print(f"Profile ({profile['cpu_ms']} ms CPU, {profile['samples']} sampel):")
+            for path in profile["files"]:
+                print(f"  {path}")
+            print()
+
+
+MAX_QUESTION_LENGTH = 500
+
+
+def iter_batch_questions(source: TextIO) -> Iterator[Dict[str, str]]:
+    """
+    Baca pertanyaan batch: satu pertanyaan per baris, atau JSONL
+    dengan field `question` (dan `id` opsional).
+
+    Args:
+        source: File/stdin yang berisi pertanyaan
+
+    Yields:
+        Dictionary dengan `id` dan `question`; baris JSONL yang rusak
+        menghasilkan item dengan `error` (tidak menghentikan batch)
+    """
+    for line_number, line in enumerate(source, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield {"id": str(line_number), "question": line, "error": f"JSONL tidak valid: {e}"}
+                continue
+            yield {
+                "id": str(record.get("id", line_number)),
+                "question": str(record.get("question", "")).strip(),
+            }
+        else:
+            yield {"id": str(line_number), "question": line}
+
+
+def load_completed_ids(output_path: Path) -> Set[str]:
+    """
+    Ambil id yang sudah sukses di file output (untuk --resume).
+
+    Record dengan `error` tidak dihitung selesai, jadi dicoba lagi saat resume.
+    """
+    completed: Set[str] = set()
+    if not output_path.exists():
+        return completed
+    with output_path.open(encoding="utf-8") as output_file:
+        for line in output_file:
+            try:
+                record = json.loads(line)
+                record_id = str(record["id"])
+            except (ValueError, KeyError, TypeError):
+                # Baris terakhir bisa terpotong kalau run sebelumnya dihentikan paksa.
+                continue
+            if not record.get("error"):
+                completed.add(record_id)
+    return completed
+
+
+def answer_batch_item(rag_service: RAGService, item: Dict[str, str], profile: Optional[str] = None) -> dict:
+    """Jawab satu item batch dan bentuk record JSONL."""
+    record = {"id": item["id"], "question": item["question"]}
+    timings: Dict[str, float] = {}
+    started_at = time.perf_counter()
+    try:
+        if item.get("error"):
+            raise ValueError(item["error"])
+        if len(item["question"]) > MAX_QUESTION_LENGTH:
+            raise ValueError(f"Pertanyaan terlalu panjang. Maksimal {MAX_QUESTION_LENGTH} karakter.")
+        response = rag_service.ask(item["question"], timings=timings, profile=profile)
+        record.update(
+            answer=response["answer"],
+            sources=response["sources"],
+            fallback_type=response.get("fallback_type"),
+            error=None,
+        )
+        if response.get("profile"):
+            record["profile"] = response["profile"]
+    except Exception as e:
+        logger.error(f"Error saat memproses id={item['id']}: {e}")
+        record.update(answer=None, sources=[], fallback_type=None, error=str(e))
+    timings.setdefault("total_ms", round((time.perf_counter() - started_at) * 1000, 2))
+    record["timings"] = timings
+    return record
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    concurrency: int,
+    resume: bool,
+    profile: Optional[str] = None,
+) -> None:
+    """
+    Mode batch non-interaktif: proses pertanyaan dari file/stdin dan tulis
+    hasil JSONL ke stdout/file sesegera setiap item selesai.
+
+    Args:
+        input_path: Path file input, atau "-" untuk stdin
+        output_path: Path file output, atau "-" untuk stdout
+        concurrency: Jumlah pertanyaan yang diproses paralel
+        resume: Lewati id yang sudah ada di file output
+        profile: Format profile per pertanyaan; None = tanpa profiling
+    """
+    if resume and output_path == "-":
+        raise ValueError("--resume membutuhkan --output berupa file.")
+
+    completed = load_completed_ids(Path(output_path)) if resume else set()
+
+    # Log inisialisasi dicetak ke stderr supaya stdout tetap JSONL murni.
+    with redirect_stdout(sys.stderr):
+        rag_service = RAGService()
+
+    source = sys.stdin if input_path == "-" else open(input_path, encoding="utf-8")
+    if output_path == "-":
+        sink = sys.stdout
+    else:
+        sink = open(output_path, "a" if resume else "w", encoding="utf-8")
+        if resume and sink.tell() > 0:
+            with open(output_path, "rb") as existing:
+                existing.seek(-1, os.SEEK_END)
+                if existing.read(1) != b"\n":
+                    # Tutup baris yang terpotong agar record baru tidak tergabung.
+                    sink.write("\n")
+
+    concurrency = max(1, concurrency)
+    processed = failed = skipped = 0
+    started_at = time.perf_counter()
+
+    def write(record: dict) -> None:
+        nonlocal processed, failed
+        sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+        sink.flush()
+        processed += 1
+        failed += 1 if record["error"] else 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            in_flight = set()
+            for item in iter_batch_questions(source):
+                if item["id"] in completed:
+                    skipped += 1
+                    continue
+                # Batasi item yang sedang jalan supaya input besar tidak dimuat semua ke memory.
+                if len(in_flight) >= concurrency * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        write(future.result())
+                in_flight.add(executor.submit(answer_batch_item, rag_service, item, profile))
+            for future in wait(in_flight).done:
+                write(future.result())
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    elapsed = time.perf_counter() - started_at
+    print(
+        f"Batch selesai: {processed} diproses, {failed} gagal, {skipped} dilewati "
+        f"dalam {elapsed:.1f} detik",
+        file=sys.stderr,
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="CLI Sistem RAG Coffee Shop")
+    parser.add_argument(
+        "--batch",
+        metavar="INPUT",
+        help="Mode batch: file pertanyaan (teks per baris atau JSONL), '-' untuk stdin",
+    )
+    parser.add_argument(
+        "--output",
+        default="-",
+        help="File output JSONL untuk mode batch (default: stdout)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Jumlah pertanyaan yang diproses paralel di mode batch (default: 4)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Lanjutkan file output yang sudah ada, lewati id yang sudah sukses (id dengan error diulang)",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        choices=("",) + PROFILE_FORMATS,
+        metavar="FORMAT",
+        help=(
+            "Profile CPU + alokasi tiap pertanyaan ke PROFILE_OUTPUT_DIR "
+            "(speedscope atau collapsed; default PROFILE_FORMAT)"
+        ),
+    )
+    return parser.parse_args()
+
 
 def main():
-    """Fungsi utama - Mode interaktif"""
+    """Fungsi utama - Mode interaktif atau batch"""
+    args = parse_args()
     
     if not os.getenv("GROQ_API_KEY"):
         print("ERROR: GROQ_API_KEY tidak ditemukan!")
@@ -96,6 +310,15 @@ def main():
         print("Dapatkan API key dari: https://console.groq.com/")
         sys.exit(1)
 
+    if args.batch:
+        try:
+            run_batch(args.batch, args.output, args.concurrency, args.resume, args.profile)
+        except Exception as e:
+            logger.error(f"Error mode batch: {e}", exc_info=True)
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        return
+
     try:
         app = RAGApp()
     except FileNotFoundError as e:
@@ -124,11 +347,11 @@ def main():
                 continue
             
             # Input sanitization
-            if len(question) > 500:
-                print("Pertanyaan terlalu panjang. Maksimal 500 karakter.")
+            if len(question) > MAX_QUESTION_LENGTH:
+                print(f"Pertanyaan terlalu panjang. Maksimal {MAX_QUESTION_LENGTH} karakter.")
                 continue
             
-            response = app.query(question)
+            response = app.query(question, args.profile)
             app.print_response(response)
             
         except KeyboardInterrupt:
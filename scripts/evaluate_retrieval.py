@@ -0,0 +1,339 @@
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections import Counter
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from backend.config.settings import (
+    EMBEDDING_MODEL,
+    LEXICAL_FIRST_ENABLED,
+    NAME_LOOKUP_ENABLED,
+    RETRIEVAL_DIVERSITY,
+    SCORE_THRESHOLD,
+    TOP_K_RESULTS,
+)
+from backend.src.document_store import ScoredDocument
+from backend.src.local_embed import LocalQueryVector
+from backend.src.query_classifier import classify_query
+from backend.src.rag_service import RAGService
+from backend.src.retriever import Retriever
+
+# Urutan route RAGService._ask sebelum embedding; sisanya lewat dense search.
+ROUTE_EARLY_REPLY = "early_reply"
+ROUTE_NAME_LOOKUP = "name_lookup"
+ROUTE_LEXICAL_FIRST = "lexical_first"
+ROUTE_DENSE = "dense"
+
+
+def parse_float_grid(value: str) -> List[float]:
+    return [float(item) for item in value.split(",") if item.strip()]
+
+
+def parse_int_grid(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def normalize_handle(handle: str) -> str:
+    return handle.strip().lower().rstrip(".")
+
+
+def document_handles(document: ScoredDocument) -> Set[str]:
+    """Handle Instagram di metadata `source` (bisa lebih dari satu, dipisah koma)."""
+    source = document.meta("source", "")
+    return {normalize_handle(handle) for handle in source.split(",") if handle.strip()}
+
+
+def load_labelled_queries(path: Path) -> List[dict]:
+    """
+    Baca query set berlabel (JSONL).
+
+    Format per baris: {"question": "...", "expected": ["@handle", ...]}
+    """
+    queries = []
+    with path.open(encoding="utf-8") as source:
+        for line_number, line in enumerate(source, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            expected = record.get("expected") or []
+            if isinstance(expected, str):
+                expected = expected.split(",")
+            expected = {normalize_handle(handle) for handle in expected if handle.strip()}
+            if not record.get("question") or not expected:
+                raise ValueError(f"Baris {line_number}: butuh field 'question' dan 'expected'.")
+            queries.append({"question": record["question"].strip(), "expected": expected})
+    return queries
+
+
+def load_query_embeddings(retriever: Retriever, questions: List[str], cache_path: Path) -> Dict[str, list]:
+    """
+    Ambil embedding query dari cache file; hanya query baru yang di-embed lewat API.
+
+    Cache di-key per model embedding supaya tidak tercampur saat model diganti.
+    """
+    cache: Dict[str, Dict[str, list]] = {}
+    if cache_path.exists():
+        cache = json.loads(cache_path.read_text(encoding="utf-8"))
+    model_cache = cache.setdefault(EMBEDDING_MODEL, {})
+
+    missing = sorted({question for question in questions if question not in model_cache})
+    fallback_vectors: Dict[str, list] = {}
+    if missing:
+        print(f"Embedding {len(missing)} query baru (cache: {len(model_cache)})", file=sys.stderr)
+        for question, vector in zip(missing, retriever.embed_queries(missing)):
+            if isinstance(vector, LocalQueryVector):
+                # Hasil fallback lokal tidak boleh masuk cache milik model Jina.
+                fallback_vectors[question] = vector
+            else:
+                model_cache[question] = vector
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(json.dumps(cache), encoding="utf-8")
+        if fallback_vectors:
+            print(f"Peringatan: {len(fallback_vectors)} query memakai embedding lokal", file=sys.stderr)
+    return {question: fallback_vectors.get(question) or model_cache[question] for question in questions}
+
+
+def route_query(retriever: Retriever, question: str, k: int) -> Tuple[str, Optional[List[ScoredDocument]]]:
+    """
+    Route yang diambil RAGService.ask untuk pertanyaan tunggal (tanpa session).
+
+    Returns:
+        (route, dokumen) untuk early_reply/name_lookup/lexical_first, atau
+        ("dense", None) jika pertanyaan diteruskan ke embedding + threshold.
+    """
+    classification = classify_query(question, is_known_place=retriever.names_place)
+    if RAGService._early_reply(classification) is not None:
+        return ROUTE_EARLY_REPLY, []
+    if NAME_LOOKUP_ENABLED:
+        documents = retriever.lookup_place_documents(question, k=k)
+        if documents:
+            return ROUTE_NAME_LOOKUP, documents
+    if LEXICAL_FIRST_ENABLED:
+        documents = retriever.lexical_first_documents(question, k=k)
+        if documents:
+            return ROUTE_LEXICAL_FIRST, documents
+    return ROUTE_DENSE, None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def evaluate_config(
+    retriever: Retriever,
+    queries: List[dict],
+    embeddings: Dict[str, list],
+    candidates: Dict[str, List[ScoredDocument]],
+    routed: Dict[str, Tuple[str, Optional[List[ScoredDocument]]]],
+    base_threshold: float,
+    k: int,
+    diversity: float,
+) -> dict:
+    """
+    Jalankan route RAGService.ask untuk satu konfigurasi.
+
+    Query yang dijawab early reply, lookup nama, atau lexical-first memakai
+    dokumen route itu (tidak bergantung threshold); sisanya strict/relaxed
+    pass atas kandidat dense.
+    """
+    recall_sum = 0.0
+    reciprocal_rank_sum = 0.0
+    strict_hits = relaxed_hits = empty = 0
+    route_counts = {ROUTE_EARLY_REPLY: 0, ROUTE_NAME_LOOKUP: 0, ROUTE_LEXICAL_FIRST: 0, ROUTE_DENSE: 0}
+
+    for query in queries:
+        question = query["question"]
+        route, documents = routed[question]
+        route_counts[route] += 1
+        if route == ROUTE_DENSE:
+            adaptive_threshold = RAGService._adaptive_threshold(question, base_threshold)
+            documents, _ = retriever.select_with_threshold(
+                embeddings[question], candidates[question], k=k, threshold=adaptive_threshold, diversity=diversity
+            )
+            if documents:
+                strict_hits += 1
+            elif classify_query(question, is_known_place=retriever.names_place).is_in_domain:
+                documents, _ = retriever.select_with_threshold(
+                    embeddings[question],
+                    candidates[question],
+                    k=k,
+                    threshold=RAGService._relaxed_threshold(adaptive_threshold),
+                    diversity=diversity,
+                )
+                relaxed_hits += 1 if documents else 0
+
+        if not documents:
+            empty += 1
+            continue
+
+        found: Set[str] = set()
+        first_rank = None
+        for rank, document in enumerate(documents, 1):
+            matched = document_handles(document) & query["expected"]
+            if matched and first_rank is None:
+                first_rank = rank
+            found |= matched
+        recall_sum += len(found) / len(query["expected"])
+        reciprocal_rank_sum += 1 / first_rank if first_rank else 0.0
+
+    total = len(queries)
+    return {
+        "threshold": base_threshold,
+        "k": k,
+        "recall_at_k": recall_sum / total,
+        "mrr": reciprocal_rank_sum / total,
+        "empty_rate": empty / total,
+        "strict_hit_rate": strict_hits / total,
+        "relaxed_hit_rate": relaxed_hits / total,
+        "route_rates": {route: count / total for route, count in route_counts.items()},
+    }
+
+
+def run_evaluation(args: argparse.Namespace) -> dict:
+    queries = load_labelled_queries(Path(args.queries))
+    if not queries:
+        raise ValueError("Query set kosong.")
+
+    # Log inisialisasi Retriever diarahkan ke stderr supaya laporan tetap bersih.
+    with redirect_stdout(sys.stderr):
+        retriever = Retriever()
+    questions = [query["question"] for query in queries]
+
+    def routed_for(k: int) -> Dict[str, Tuple[str, Optional[List[ScoredDocument]]]]:
+        if args.no_routing:
+            return {question: (ROUTE_DENSE, None) for question in questions}
+        return {question: route_query(retriever, question, k) for question in questions}
+
+    # Hanya query yang sampai ke dense search yang butuh embedding.
+    routes = {question: route for question, (route, _) in routed_for(TOP_K_RESULTS).items()}
+    dense_questions = [question for question in questions if routes[question] == ROUTE_DENSE]
+    embeddings = load_query_embeddings(retriever, dense_questions, Path(args.embedding_cache))
+
+    report = {"queries": len(queries), "routes": routes, "fetch": [], "results": []}
+    for fetch_factor in parse_int_grid(args.fetch_factors):
+        for k in parse_int_grid(args.k):
+            fetch_k = k * fetch_factor
+            routed = routed_for(k)
+            latencies: List[float] = []
+            candidates: Dict[str, List[ScoredDocument]] = {}
+            for question in dense_questions:
+                started_at = time.perf_counter()
+                # Tanpa teks query, search hanya dense (untuk membandingkan dengan hybrid).
+                queries_text = None if args.dense_only else [question]
+                candidates[question] = retriever.search_candidates_batch(
+                    [embeddings[question]], fetch_k, queries=queries_text
+                )[0]
+                latencies.append((time.perf_counter() - started_at) * 1000)
+
+            report["fetch"].append(
+                {
+                    "k": k,
+                    "fetch_k": fetch_k,
+                    "search_p50_ms": percentile(latencies, 50),
+                    "search_p95_ms": percentile(latencies, 95),
+                    "search_p99_ms": percentile(latencies, 99),
+                    "search_mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+                }
+            )
+            for threshold in parse_float_grid(args.thresholds):
+                result = evaluate_config(
+                    retriever, queries, embeddings, candidates, routed, threshold, k, args.diversity
+                )
+                result["fetch_k"] = fetch_k
+                report["results"].append(result)
+    return report
+
+
+def print_report(report: dict) -> None:
+    print("=" * 60)
+    print(f"Evaluasi retrieval ({report['queries']} query)")
+    print("=" * 60)
+    print()
+    print("Route per query (seperti RAGService.ask):")
+    for route, count in Counter(report["routes"].values()).most_common():
+        print(f"  {route:<14} {count:>5}")
+    for question, route in report["routes"].items():
+        if route != ROUTE_DENSE:
+            print(f"  - [{route}] {question}")
+    print()
+    print("Latency search dense (ms):")
+    print(f"{'k':>4} {'fetch_k':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for row in report["fetch"]:
+        print(
+            f"{row['k']:>4} {row['fetch_k']:>8} {row['search_p50_ms']:>8.2f} "
+            f"{row['search_p95_ms']:>8.2f} {row['search_p99_ms']:>8.2f}"
+        )
+    print()
+    print("Kualitas per konfigurasi:")
+    print(
+        f"{'threshold':>9} {'k':>4} {'fetch_k':>8} {'recall@k':>9} {'MRR':>7} "
+        f"{'empty':>7} {'lookup':>7} {'lexical':>8} {'strict':>7} {'relaxed':>8}"
+    )
+    for row in report["results"]:
+        routes = row["route_rates"]
+        print(
+            f"{row['threshold']:>9.2f} {row['k']:>4} {row['fetch_k']:>8} {row['recall_at_k']:>9.3f} "
+            f"{row['mrr']:>7.3f} {row['empty_rate']:>7.1%} {routes[ROUTE_NAME_LOOKUP]:>7.1%} "
+            f"{routes[ROUTE_LEXICAL_FIRST]:>8.1%} {row['strict_hit_rate']:>7.1%} {row['relaxed_hit_rate']:>8.1%}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Evaluasi kualitas dan latency retrieval")
+    parser.add_argument("queries", help="File JSONL berisi question dan expected (handle Instagram)")
+    parser.add_argument(
+        "--thresholds",
+        default=str(SCORE_THRESHOLD),
+        help="Grid SCORE_THRESHOLD dasar, dipisah koma (mis. 0.2,0.3,0.4)",
+    )
+    parser.add_argument("--k", default=str(TOP_K_RESULTS), help="Grid k, dipisah koma (mis. 3,5,8)")
+    parser.add_argument(
+        "--fetch-factors",
+        default=str(Retriever.THRESHOLD_FETCH_FACTOR),
+        help="Grid faktor fetch_k = k * faktor, dipisah koma (mis. 2,3)",
+    )
+    parser.add_argument("--diversity", type=float, default=RETRIEVAL_DIVERSITY, help="Diversity MMR")
+    parser.add_argument(
+        "--embedding-cache",
+        default=str(ROOT_DIR / "data" / "eval" / "query_embeddings.json"),
+        help="File cache embedding query supaya sweep berikutnya tanpa panggilan API",
+    )
+    parser.add_argument(
+        "--dense-only",
+        action="store_true",
+        help="Matikan fusion BM25 (bandingkan dengan retrieval hybrid default)",
+    )
+    parser.add_argument(
+        "--no-routing",
+        action="store_true",
+        help="Semua query lewat dense search (tanpa early reply, lookup nama, dan lexical-first)",
+    )
+    parser.add_argument("--json", dest="json_output", help="Simpan laporan lengkap ke file JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = run_evaluation(args)
+    print_report(report)
+    if args.json_output:
+        Path(args.json_output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print()
+        print(f"Laporan disimpan di: {args.json_output}")
+
+
+if __name__ == "__main__":
+    main()
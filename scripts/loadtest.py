@@ -0,0 +1,616 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+DEFAULT_QUESTIONS = [
+    "Rekomendasi coffee shop untuk WFC di Sleman",
+    "Cafe yang tenang untuk nugas dekat UGM",
+    "Kopi susu enak di Jogja",
+    "Coffee shop 24 jam di Kota Jogja",
+    "Tempat meeting yang nyaman di Seturan",
+    "Cafe dengan wifi kencang dan colokan banyak",
+    "Coffee shop dengan area outdoor di Bantul",
+    "Manual brew V60 yang enak di Jogja",
+    "Cafe buat nongkrong rame-rame malam minggu",
+    "Coffee shop dengan live music di Jogja",
+]
+# Baris identitas tempat di context (Retriever.format_context); stub menyebut tempat pertama.
+CONTEXT_PLACE = re.compile(r"^Nama (?:Tempat|Referensi): (.+)$", re.MULTILINE)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def parse_grid(value: str) -> List[float]:
+    return [float(item) for item in value.split(",") if item.strip()]
+
+
+class UpstreamLatency:
+    """Latency dan error rate stub upstream (Jina/Groq)."""
+
+    def __init__(self, latency_ms: float, jitter: float, error_rate: float):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+    def wait(self) -> bool:
+        """Tidur selama latency simulasi; False jika request ini harus gagal."""
+        spread = self.latency_ms * self.jitter
+        time.sleep(max(0.0, random.uniform(self.latency_ms - spread, self.latency_ms + spread)) / 1000)
+        return random.random() >= self.error_rate
+
+
+class StubUpstreams:
+    """
+    Pengganti lokal Jina Embeddings API dan Groq chat completions.
+
+    Berjalan di ThreadingHTTPServer (satu thread per request), sehingga
+    latency simulasi tidak saling antre seperti upstream sungguhan.
+    """
+
+    def __init__(self, jina: UpstreamLatency, groq: UpstreamLatency, completion_tokens: int):
+        self.jina = jina
+        self.groq = groq
+        self.completion_tokens = completion_tokens
+        # Diisi setelah app start: fungsi teks -> vector dengan dimensi index aktif.
+        self.vector_for: Optional[Callable[[str], List[float]]] = None
+        self.calls: Counter = Counter()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+
+    def _handler(self):
+        stubs = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive seperti Jina/Groq asli, supaya reuse pool koneksi ikut teruji.
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):  # noqa: D401 - server log dimatikan
+                return
+
+            def do_HEAD(self):
+                # Warm-up koneksi (UpstreamRegistry.warm_up).
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.endswith("/embeddings"):
+                    stubs.calls["jina"] += 1
+                    if not stubs.jina.wait():
+                        return self._reply(503, {"detail": "stub jina error"})
+                    data = [
+                        {"index": index, "embedding": stubs.vector_for(text)}
+                        for index, text in enumerate(body.get("input", []))
+                    ]
+                    return self._reply(200, {"data": data})
+                if self.path.endswith("/chat/completions"):
+                    stubs.calls["groq"] += 1
+                    stubs.calls[f"groq:{body.get('model', 'stub')}"] += 1
+                    if not stubs.groq.wait():
+                        return self._reply(503, {"error": {"message": "stub groq error"}})
+                    return self._reply(200, stubs.completion(body))
+                return self._reply(404, {"detail": "Not Found"})
+
+            def _reply(self, status: int, payload: dict):
+                encoded = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+        return Handler
+
+    @staticmethod
+    def answer_for(prompt: str) -> str:
+        """
+        Jawaban stub yang lolos cek confidence cascade.
+
+        Panjangnya di atas CASCADE_MIN_ANSWER_CHARS dan menyebut tempat dari
+        context, jadi tier kecil tidak eskalasi dan satu generation = satu
+        panggilan Groq seperti jawaban yang baik di produksi.
+        """
+        match = CONTEXT_PLACE.search(prompt)
+        place = match.group(1).strip() if match else "Tempat dari context"
+        return (
+            "## Rekomendasi Coffee Shop\n\n"
+            f"- {place}\n"
+            "  Alasan: jawaban stub load test, cukup panjang dan menyebut tempat dari context "
+            "supaya tidak dianggap kurang yakin oleh cascade model."
+        )
+
+    def completion(self, body: dict) -> dict:
+        messages = body.get("messages", [])
+        prompt = "\n".join(message.get("content", "") for message in messages)
+        prompt_chars = len(prompt)
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": self.answer_for(prompt)},
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": prompt_chars // 4 + self.completion_tokens,
+            },
+        }
+
+
+def near_document_vectors(document_vectors) -> Callable[[str], List[float]]:
+    """
+    Vector query stub: embedding dokumen (dipilih dari hash teks) plus noise kecil.
+
+    Vector acak akan ditolak threshold sehingga generation tidak pernah
+    dipanggil; vector di dekat dokumen menjalankan pipeline penuh.
+    """
+    import numpy as np
+
+    def vector_for(text: str) -> List[float]:
+        seed = zlib.crc32(text.encode("utf-8"))
+        row = document_vectors[seed % len(document_vectors)]
+        noise = np.random.default_rng(seed).normal(0, 0.01, row.shape[0]).astype(np.float32)
+        vector = row + noise
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    return vector_for
+
+
+class InProcessServer:
+    """App FastAPI di bawah uvicorn pada thread terpisah dengan event loop milik sendiri."""
+
+    def __init__(self, port: int, thread_pool_size: Optional[int]):
+        import uvicorn
+
+        from backend.web_api.main import app
+
+        self.port = port
+        self.thread_pool_size = thread_pool_size
+        self.loop = asyncio.new_event_loop()
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+    def start(self, timeout: float = 120.0) -> None:
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self._thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Server uvicorn gagal start.")
+            time.sleep(0.05)
+        if self.thread_pool_size:
+            self._call(self._set_pool_size(self.thread_pool_size))
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self._thread.join(timeout=10)
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout=5)
+
+    @staticmethod
+    async def _set_pool_size(size: int) -> None:
+        import anyio.to_thread
+
+        anyio.to_thread.current_default_thread_limiter().total_tokens = size
+
+    @staticmethod
+    async def _pool_usage():
+        import anyio.to_thread
+
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        return limiter.borrowed_tokens, limiter.total_tokens
+
+    def pool_usage(self):
+        """(thread terpakai, ukuran pool) thread pool AnyIO yang menjalankan handler sync."""
+        return self._call(self._pool_usage())
+
+
+class PoolSampler:
+    """Sampling okupansi thread pool server secara periodik selama satu run."""
+
+    def __init__(self, server: Optional[InProcessServer], interval: float = 0.1):
+        self.server = server
+        self.interval = interval
+        self.samples: List[int] = []
+        self.size = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        if self.server is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self.server is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                busy, self.size = self.server.pool_usage()
+            except Exception:  # noqa: BLE001 - server sedang sibuk/berhenti
+                continue
+            self.samples.append(busy)
+
+    def summary(self) -> Dict[str, float]:
+        if not self.samples:
+            return {}
+        return {
+            "pool_size": self.size,
+            "pool_busy_mean": statistics.fmean(self.samples),
+            "pool_busy_max": max(self.samples),
+            "pool_saturated_pct": 100 * sum(1 for busy in self.samples if busy >= self.size) / len(self.samples),
+        }
+
+
+class LoadClient:
+    """Pengirim request `/api/chat`; satu requests.Session per thread."""
+
+    def __init__(self, base_url: str, questions: List[str], clients: int, timeout: float, token: str):
+        self.url = f"{base_url}/api/chat"
+        self.questions = questions
+        self.timeout = timeout
+        # IP palsu lewat X-Forwarded-For supaya rate limit per IP meniru banyak user.
+        self.client_ips = [f"10.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}" for n in range(1, clients + 1)]
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self._local = threading.local()
+        self._sequence = itertools.count()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def send(self, scheduled_at: Optional[float] = None) -> Dict[str, float]:
+        number = next(self._sequence)
+        headers = {**self.headers, "X-Forwarded-For": self.client_ips[number % len(self.client_ips)]}
+        started_at = time.perf_counter()
+        try:
+            response = self._session().post(
+                self.url,
+                json={"question": self.questions[number % len(self.questions)]},
+                headers=headers,
+                timeout=self.timeout,
+            )
+            status = str(response.status_code)
+        except requests.Timeout:
+            status = "timeout"
+        except requests.RequestException:
+            status = "connection_error"
+        finished_at = time.perf_counter()
+        return {
+            "status": status,
+            "latency_ms": (finished_at - started_at) * 1000,
+            # Open loop: latency dihitung dari jadwal kirim (menghindari coordinated omission).
+            "scheduled_latency_ms": (finished_at - (scheduled_at or started_at)) * 1000,
+            "finished_at": finished_at,
+        }
+
+
+def run_open_loop(client: LoadClient, rate: float, duration: float, max_in_flight: int) -> List[dict]:
+    """Arrival rate konstan: request dikirim sesuai jadwal, tidak menunggu respons sebelumnya."""
+    results: List[dict] = []
+    total = int(rate * duration)
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = []
+        start = time.perf_counter()
+        for number in range(total):
+            scheduled_at = start + number / rate
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(executor.submit(client.send, scheduled_at))
+        for future in futures:
+            results.append(future.result())
+    return results
+
+
+def run_closed_loop(client: LoadClient, concurrency: int, duration: float) -> List[dict]:
+    """N user virtual: tiap user kirim request berikutnya setelah respons diterima."""
+    deadline = time.perf_counter() + duration
+    results: List[dict] = []
+    lock = threading.Lock()
+
+    def user() -> None:
+        while time.perf_counter() < deadline:
+            result = client.send()
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=user) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def summarize(results: List[dict], started_at: float, offered: str) -> Dict[str, object]:
+    total = len(results)
+    statuses = Counter(result["status"] for result in results)
+    ok_latencies = [result["scheduled_latency_ms"] for result in results if result["status"] == "200"]
+    elapsed = max((result["finished_at"] for result in results), default=started_at) - started_at
+    return {
+        "offered": offered,
+        "requests": total,
+        "throughput_rps": statuses["200"] / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(ok_latencies, 50),
+        "p90_ms": percentile(ok_latencies, 90),
+        "p99_ms": percentile(ok_latencies, 99),
+        "max_ms": max(ok_latencies, default=0.0),
+        "rate_429": statuses["429"] / total if total else 0.0,
+        "rate_503": statuses["503"] / total if total else 0.0,
+        "rate_500": statuses["500"] / total if total else 0.0,
+        "rate_other_error": (
+            sum(count for status, count in statuses.items() if status not in {"200", "429", "503", "500"}) / total
+            if total
+            else 0.0
+        ),
+        "statuses": dict(statuses),
+    }
+
+
+def configure_environment(args: argparse.Namespace, stubs: StubUpstreams) -> None:
+    """Arahkan Jina/Groq ke stub; harus dipanggil sebelum modul backend di-import."""
+    os.environ["JINA_EMBEDDING_URL"] = f"{stubs.base_url}/v1/embeddings"
+    os.environ["GROQ_BASE_URL"] = stubs.base_url
+    # Key dummy cukup untuk stub; key asli tidak pernah dikirim ke mana pun.
+    os.environ["JINA_API_KEY"] = "loadtest"
+    os.environ["GROQ_API_KEY"] = "loadtest"
+    if args.rate_limit_per_minute is not None:
+        os.environ["RATE_LIMIT_PER_MINUTE"] = str(args.rate_limit_per_minute)
+    if args.daily_limit is not None:
+        os.environ["DAILY_REQUEST_LIMIT_PER_IP"] = str(args.daily_limit)
+    # Dipin supaya jumlah panggilan Groq per generation tidak bergantung pada .env.
+    os.environ["MODEL_CASCADE_ENABLED"] = "true" if args.model_cascade == "on" else "false"
+    if args.trace is not None:
+        # Untuk mengukur overhead flight recorder (p50 dengan trace on vs off).
+        os.environ["TRACE_ENABLED"] = "true" if args.trace == "on" else "false"
+    os.environ["ANONYMIZED_TELEMETRY"] = "False"
+
+
+def start_in_process(args: argparse.Namespace):
+    stubs = StubUpstreams(
+        UpstreamLatency(args.jina_latency_ms, args.latency_jitter, args.jina_error_rate),
+        UpstreamLatency(args.groq_latency_ms, args.latency_jitter, args.groq_error_rate),
+        completion_tokens=args.completion_tokens,
+    )
+    stubs.start()
+    configure_environment(args, stubs)
+
+    server = InProcessServer(args.port, args.thread_pool_size)
+    print("Memuat index dan menjalankan server...", file=sys.stderr)
+    server.start()
+
+    from backend.web_api import main as web_main
+
+    if web_main.rag_service is None:
+        raise RuntimeError(f"RAG service gagal start: {web_main.startup_error}")
+    stubs.vector_for = near_document_vectors(web_main.rag_service.retriever._doc_vectors)
+    if not args.verbose:
+        # Log per request dari app/httpx menenggelamkan tabel hasil.
+        logging.getLogger().setLevel(logging.WARNING)
+    return stubs, server
+
+
+def fetch_generation_stats(base_url: str, admin_token: str) -> Optional[dict]:
+    """Statistik per tier dari `/admin/generation` (None jika admin API tidak tersedia)."""
+    if not admin_token:
+        return None
+    try:
+        response = requests.get(f"{base_url}/admin/generation", headers={"X-Admin-Token": admin_token}, timeout=10)
+    except requests.RequestException:
+        return None
+    return response.json() if response.status_code == 200 else None
+
+
+def load_questions(path: Optional[str]) -> List[str]:
+    if not path:
+        return DEFAULT_QUESTIONS
+    with open(path, encoding="utf-8") as source:
+        questions = [line.strip() for line in source if line.strip()]
+    if not questions:
+        raise ValueError("File pertanyaan kosong.")
+    return questions
+
+
+def run(args: argparse.Namespace) -> dict:
+    stubs = server = None
+    if args.target:
+        base_url = args.target.rstrip("/")
+    else:
+        stubs, server = start_in_process(args)
+        base_url = server.base_url
+
+    client = LoadClient(
+        base_url,
+        load_questions(args.questions),
+        clients=args.clients,
+        timeout=args.timeout,
+        token=args.token or os.getenv("API_ACCESS_TOKEN", ""),
+    )
+    report = {"mode": args.mode, "duration_s": args.duration, "runs": []}
+    try:
+        if args.warmup:
+            run_closed_loop(client, concurrency=2, duration=args.warmup)
+        levels = parse_grid(args.rates if args.mode == "open" else args.concurrency)
+        for level in levels:
+            started_at = time.perf_counter()
+            with PoolSampler(server) as sampler:
+                if args.mode == "open":
+                    results = run_open_loop(client, level, args.duration, args.max_in_flight)
+                    offered = f"{level:g} rps"
+                else:
+                    results = run_closed_loop(client, int(level), args.duration)
+                    offered = f"{int(level)} users"
+            summary = summarize(results, started_at, offered)
+            summary.update(sampler.summary())
+            report["runs"].append(summary)
+            print_run(summary)
+    finally:
+        if stubs is not None:
+            from backend.src.upstreams import upstreams
+            from backend.web_api import main as web_main
+
+            # Sama dengan isi /admin/generation, dibaca langsung karena server in-process.
+            generator = web_main.rag_service.generator
+            report["generation"] = {"tiers": generator.tiers, "stats": generator.tier_stats()}
+
+            report["upstream_calls"] = dict(stubs.calls)
+            report["upstream_pools"] = upstreams.snapshot()["upstreams"]
+        else:
+            generation = fetch_generation_stats(base_url, args.admin_token or os.getenv("ADMIN_API_TOKEN", ""))
+            if generation is not None:
+                report["generation"] = generation
+        if server is not None:
+            server.stop()
+        if stubs is not None:
+            stubs.stop()
+    return report
+
+
+def print_header() -> None:
+    print(
+        f"{'offered':>12} {'req':>6} {'rps':>7} {'p50':>8} {'p90':>8} {'p99':>8} "
+        f"{'429':>6} {'503':>6} {'500':>6} {'other':>6} {'pool':>11}"
+    )
+
+
+def print_run(summary: dict) -> None:
+    pool = (
+        f"{summary['pool_busy_mean']:.1f}/{summary['pool_size']}"
+        if "pool_busy_mean" in summary
+        else "-"
+    )
+    print(
+        f"{summary['offered']:>12} {summary['requests']:>6} {summary['throughput_rps']:>7.1f} "
+        f"{summary['p50_ms']:>8.0f} {summary['p90_ms']:>8.0f} {summary['p99_ms']:>8.0f} "
+        f"{summary['rate_429']:>6.1%} {summary['rate_503']:>6.1%} {summary['rate_500']:>6.1%} "
+        f"{summary['rate_other_error']:>6.1%} {pool:>11}",
+        flush=True,
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Load test /api/chat dengan stub Jina/Groq untuk mencari titik saturasi"
+    )
+    parser.add_argument("--mode", choices=["open", "closed"], default="open", help="Open loop (rate) atau closed loop (user)")
+    parser.add_argument("--rates", default="2,5,10,20", help="Open loop: arrival rate (request/detik), dipisah koma")
+    parser.add_argument("--concurrency", default="1,4,16,32", help="Closed loop: jumlah user virtual, dipisah koma")
+    parser.add_argument("--duration", type=float, default=20.0, help="Durasi tiap level (detik)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Warm-up sebelum pengukuran (detik, 0 = tanpa)")
+    parser.add_argument("--questions", help="File teks, satu pertanyaan per baris (default: set bawaan)")
+    parser.add_argument("--clients", type=int, default=500, help="Jumlah IP client palsu (X-Forwarded-For)")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Open loop: batas request bersamaan di sisi load generator")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Timeout per request (detik)")
+    parser.add_argument("--target", help="URL server yang sudah berjalan (tanpa stub dan tanpa data thread pool)")
+    parser.add_argument("--token", help="API_ACCESS_TOKEN untuk header Authorization")
+    parser.add_argument("--admin-token", help="ADMIN_API_TOKEN untuk membaca statistik tier dari --target")
+    parser.add_argument("--port", type=int, default=8765, help="Port server in-process")
+    parser.add_argument("--thread-pool-size", type=int, help="Ukuran thread pool AnyIO (default AnyIO: 40)")
+    parser.add_argument("--jina-latency-ms", type=float, default=150.0, help="Latency stub Jina")
+    parser.add_argument("--groq-latency-ms", type=float, default=1500.0, help="Latency stub Groq")
+    parser.add_argument("--latency-jitter", type=float, default=0.3, help="Jitter latency stub (fraksi, 0.3 = +-30%%)")
+    parser.add_argument("--jina-error-rate", type=float, default=0.0, help="Porsi request Jina yang gagal (503)")
+    parser.add_argument("--groq-error-rate", type=float, default=0.0, help="Porsi request Groq yang gagal (503)")
+    parser.add_argument("--completion-tokens", type=int, default=250, help="Jumlah completion token yang dilaporkan stub Groq")
+    parser.add_argument(
+        "--model-cascade",
+        choices=["on", "off"],
+        default="on",
+        help="MODEL_CASCADE_ENABLED untuk server in-process (default on, seperti produksi)",
+    )
+    parser.add_argument("--trace", choices=["on", "off"], help="Override TRACE_ENABLED untuk server in-process")
+    parser.add_argument("--rate-limit-per-minute", type=int, help="Override RATE_LIMIT_PER_MINUTE untuk server in-process")
+    parser.add_argument("--daily-limit", type=int, help="Override DAILY_REQUEST_LIMIT_PER_IP untuk server in-process")
+    parser.add_argument("--verbose", action="store_true", help="Tampilkan log INFO app selama load test")
+    parser.add_argument("--json", dest="json_output", help="Simpan laporan lengkap ke file JSON")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print("=" * 60)
+    print(f"Load test /api/chat ({args.mode} loop, {args.duration:g} detik per level)")
+    print("=" * 60)
+    print_header()
+    report = run(args)
+    if "upstream_calls" in report:
+        print()
+        print(f"Panggilan upstream stub: {report['upstream_calls']}")
+        for name, pool in report["upstream_pools"].items():
+            print(
+                f"Pool {name}: {pool['requests']} request, {pool['new_connections']} koneksi baru "
+                f"(rate {pool['new_connection_rate']:.3f}), saturasi {pool['saturation_rate']:.3f}"
+            )
+    if "generation" in report:
+        print()
+        for model, stats in report["generation"]["stats"].items():
+            print(
+                f"Tier {model}: {stats['calls']} panggilan, {stats['escalations']} eskalasi, "
+                f"rata-rata {stats['avg_latency_ms']:.0f} ms"
+            )
+    if args.json_output:
+        Path(args.json_output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Laporan disimpan di: {args.json_output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import shutil
+import argparse
 import sys
 from pathlib import Path
 
@@ -7,34 +7,54 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
 from backend.src.ingest import DataIngestor
-from backend.config.settings import VECTOR_STORE_DIR, PROCESSED_DATA_DIR
+from backend.src.ingest_jobs import CSV_PATH, prepare_index_dir
+from backend.src.index_versions import prune_index_versions, publish_index
+from backend.src.shards import shard_key
 
 
-def reingest_data():
-    """Ingest data Sahabat AI"""
+def reingest_data(resume: bool = False, shard: str = None):
+    """
+    Ingest data Sahabat AI
+
+    Index dibangun di direktori versi baru lalu dipublikasikan setelah
+    selesai, jadi API yang sedang berjalan tetap melayani index lama
+    sampai reload.
+
+    Args:
+        resume: Lanjutkan build versi terakhir yang belum dipublikasikan
+        shard: Bangun ulang satu shard saja (nama/slug kota). Shard lain
+            disalin dari index aktif tanpa embedding ulang.
+    """
     
     print("=" * 60)
     print("Ingest Data Sahabat AI ke ChromaDB")
     print("=" * 60)
     print()
     
-    # 1. Hapus vector store lama (optional)
-    if VECTOR_STORE_DIR.exists():
-        print(f"Menghapus vector store lama...")
-        shutil.rmtree(VECTOR_STORE_DIR)
-        print("Vector store lama berhasil dihapus")
-        print()
-    
-    # 2. Ingest data
-    csv_path = PROCESSED_DATA_DIR / "extracted_data_sahabatai.csv"
+    csv_path = CSV_PATH
+    shard = shard_key(shard) if shard else None
     
-    if not csv_path.exists():
-        print(f"File tidak ditemukan: {csv_path}")
+    # 1. Tentukan direktori versi index (build yang terputus dilanjutkan saat resume,
+    #    rebuild per shard menyalin index aktif)
+    try:
+        index_dir = prepare_index_dir(csv_path, shard=shard, resume=resume)
+    except (FileNotFoundError, ValueError) as e:
+        print(e)
         return
+    print(f"Membangun index versi: {index_dir.name}" + (f" (shard {shard})" if shard else ""))
+    print()
     
+    # 2. Ingest data
     try:
-        ingestor = DataIngestor()
-        ingestor.load_and_ingest_csv(str(csv_path))
+        ingestor = DataIngestor(persist_directory=index_dir)
+        ingestor.load_and_ingest_csv(str(csv_path), resume=resume, shard=shard)
+        
+        # 3. Publikasikan versi baru dan bersihkan versi lama
+        publish_index(index_dir)
+        removed = prune_index_versions()
+        print(f"Index versi {index_dir.name} aktif")
+        if removed:
+            print(f"Versi lama dihapus: {', '.join(removed)}")
         
         print()
         print("=" * 60)
@@ -45,4 +65,15 @@ def reingest_data():
 
 
 if __name__ == "__main__":
-    reingest_data()
+    parser = argparse.ArgumentParser(description="Rebuild vector store dari CSV processed")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Lanjutkan ingest yang terputus dari checkpoint terakhir",
+    )
+    parser.add_argument(
+        "--shard",
+        help="Bangun ulang satu shard saja (mis. Sleman); shard lain disalin dari index aktif",
+    )
+    args = parser.parse_args()
+    reingest_data(resume=args.resume, shard=args.shard)
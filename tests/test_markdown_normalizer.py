@@ -0,0 +1,63 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from backend.src.markdown_normalizer import MarkdownNormalizer, normalize_markdown
+
+GOLDEN_DIR = Path(__file__).parent / "golden" / "markdown"
+CASES = sorted(path.name[: -len(".input.md")] for path in GOLDEN_DIR.glob("*.input.md"))
+# Ukuran 1 memotong di setiap karakter, termasuk di antara "\r" dan "\n".
+CHUNK_SIZES = [1, 2, 3, 5, 8, 64]
+
+
+def _read(path: Path) -> str:
+    # newline="" supaya CRLF/CR di input golden tidak diubah saat dibaca.
+    with path.open(encoding="utf-8", newline="") as handle:
+        return handle.read()
+
+
+def _golden(name: str):
+    return _read(GOLDEN_DIR / f"{name}.input.md"), _read(GOLDEN_DIR / f"{name}.expected.md")
+
+
+def _feed_chunks(text: str, size: int) -> str:
+    normalizer = MarkdownNormalizer()
+    lines: List[str] = []
+    for start in range(0, len(text), size):
+        lines.extend(normalizer.feed(text[start : start + size]))
+    lines.extend(normalizer.close())
+    return "\n".join(lines)
+
+
+def test_golden_corpus_not_empty():
+    assert CASES
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_normalize_markdown_one_shot(name):
+    source, expected = _golden(name)
+    assert normalize_markdown(source) == expected
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+@pytest.mark.parametrize("name", CASES)
+def test_normalizer_chunked_feed(name, size):
+    source, expected = _golden(name)
+    assert _feed_chunks(source, size) == expected
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_normalizer_every_split_point(name):
+    source, expected = _golden(name)
+    for cut in range(len(source) + 1):
+        normalizer = MarkdownNormalizer()
+        lines = normalizer.feed(source[:cut]) + normalizer.feed(source[cut:]) + normalizer.close()
+        assert "\n".join(lines) == expected, f"split di posisi {cut}"
+
+
+def test_feed_after_close_rejected():
+    normalizer = MarkdownNormalizer()
+    normalizer.close()
+    with pytest.raises(ValueError):
+        normalizer.feed("- item")